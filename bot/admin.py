@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from bot.models import TgUser
+from bot.models import TgUpdate, TgUser
 
 
 @admin.register(TgUser)
@@ -14,3 +14,11 @@ class TgUserAdmin(admin.ModelAdmin):
             return obj.user.username
         else:
             return None
+
+
+@admin.register(TgUpdate)
+class TgUpdateAdmin(admin.ModelAdmin):
+    list_display = ('update_id', 'chat_id', 'status', 'attempts', 'created')
+    list_filter = ('status',)
+    search_fields = ('chat_id',)
+    readonly_fields = ('payload', 'error')
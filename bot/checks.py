@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from goals.checks import PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_state_cache(app_configs, **kwargs) -> list[Error]:
+    # Every bot process would keep its own dialogues, a reply handled by another one loses the stage
+    if settings.BOT_STATE_STORE != 'bot.state.CacheConversationStore':
+        return []
+    backend = settings.CACHES[settings.BOT_STATE_CACHE]['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f'The bot state cache {settings.BOT_STATE_CACHE!r} ({backend}) is not shared between bot processes.',
+            hint='Use bot.state.DatabaseConversationStore, a shared cache such as '
+            'django.core.cache.backends.redis.RedisCache, or bot.state.LocalConversationStore for a single process.',
+            id='bot.E001',
+        )
+    ]
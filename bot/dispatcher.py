@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from bot.tasks import MAX_RETRY_DELAY
+from bot.tg.schemas import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDispatcher:
+    """
+    Handles updates on a pool of worker threads. Updates of different chats run in
+    parallel, updates of one chat run one after another in the order they came.
+
+    ``offset`` is the getUpdates offset that acknowledges only handled updates: the
+    oldest update still in progress, so Telegram redelivers it after a crash. Updates
+    seen before are skipped by ``submit``. While one chat is busy, polling from there
+    returns updates seen already at once, so runbot calls ``wait_for_progress`` then
+    instead of polling again. A failing update is retried with backoff up to
+    BOT_UPDATE_MAX_ATTEMPTS times before it is acknowledged.
+    """
+
+    retry_backoff = 1.0
+
+    def __init__(
+        self,
+        handler: Callable[[UpdateObj], None],
+        workers: int,
+        max_pending: int | None = None,
+        max_attempts: int | None = None,
+    ) -> None:
+        self.handler = handler
+        self.max_pending = max_pending or workers * 10
+        self.max_attempts = max_attempts or settings.BOT_UPDATE_MAX_ATTEMPTS
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='update')
+        self.condition = threading.Condition()
+        # Chats with an update in progress and the updates waiting behind it
+        self.chats: dict[int, deque[UpdateObj]] = {}
+        self.pending: set[int] = set()
+        self.last_update_id: int | None = None
+        self.handled = 0
+
+    @property
+    def offset(self) -> int:
+        with self.condition:
+            if self.pending:
+                return min(self.pending)
+            return 0 if self.last_update_id is None else self.last_update_id + 1
+
+    def submit_many(self, updates: list[UpdateObj]) -> int:
+        """Queues the updates, returns how many of them were not seen before."""
+        return sum(self.submit(update) for update in updates)
+
+    def submit(self, update: UpdateObj) -> bool:
+        """Queues the update, waits while ``max_pending`` updates are not handled yet. False if seen before."""
+        with self.condition:
+            if self.last_update_id is not None and update.update_id <= self.last_update_id:
+                return False
+            if update.message is None:
+                self.last_update_id = update.update_id
+                return True
+            chat_id = update.message.chat.id
+            self.condition.wait_for(lambda: len(self.pending) < self.max_pending)
+            self.pending.add(update.update_id)
+            self.last_update_id = update.update_id
+            queue = self.chats.get(chat_id)
+            if queue is not None:
+                queue.append(update)
+                return True
+            self.chats[chat_id] = deque()
+        self.executor.submit(self.run_chat, chat_id, update)
+        return True
+
+    def wait_for_progress(self, timeout: float) -> bool:
+        """Waits until an update in progress is handled, False after ``timeout`` seconds."""
+        with self.condition:
+            handled = self.handled
+            return self.condition.wait_for(lambda: self.handled != handled, timeout)
+
+    def run_chat(self, chat_id: int, update: UpdateObj | None) -> None:
+        while update is not None:
+            self.handle(update)
+            with self.condition:
+                self.pending.discard(update.update_id)
+                self.handled += 1
+                self.condition.notify_all()
+                queue = self.chats[chat_id]
+                if queue:
+                    update = queue.popleft()
+                else:
+                    del self.chats[chat_id]
+                    update = None
+
+    def handle(self, update: UpdateObj) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            # Worker threads keep their connections between updates, like requests do
+            close_old_connections()
+            try:
+                self.handler(update)
+                return
+            except Exception:
+                logger.exception(f'Update {update.update_id} failed, attempt {attempt}')
+            finally:
+                close_old_connections()
+            if attempt < self.max_attempts:
+                time.sleep(min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_DELAY))
+        # Acknowledged after the last attempt, otherwise it would be redelivered forever
+
+    def shutdown(self) -> None:
+        """Waits for the submitted updates to be handled and stops the workers."""
+        self.executor.shutdown(wait=True)
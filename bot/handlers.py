@@ -0,0 +1,108 @@
+from functools import partial
+
+from django.db import transaction
+
+from bot.models import TgUser
+from bot.state import ConversationStore, get_conversation_store
+from bot.tg.client import TgClient, get_tg_client
+from bot.tg.schemas import Message, UpdateObj
+from goals.membership import get_user_board_roles
+from goals.models import Goal, GoalCategory
+from todolist.db_router import PrimaryPins
+
+
+class UpdateHandler:
+    """Replies to bot messages, used by runbot (polling) and process_updates (webhook)."""
+
+    def __init__(self, tg_client: TgClient | None = None, states: ConversationStore | None = None) -> None:
+        self.tg_client = tg_client or get_tg_client()
+        # Stage of the /create dialogue per chat, shared by replicas with a shared store
+        self.states = states or get_conversation_store()
+        # Users whose goals were created here a moment ago, their listings skip the replicas
+        self.pins = PrimaryPins()
+
+    def handle_update(self, update: UpdateObj) -> None:
+        # Only messages are handled, other updates (edits, callbacks) are acknowledged and dropped
+        if update.message is not None:
+            # The dialogue state changes with the goals, the replies go out once both are committed
+            with transaction.atomic():
+                self.handle_message(update.message)
+
+    def reply(self, chat_id: int, text: str) -> None:
+        # Not sent from inside the transaction, TgClient may wait out retries while rows are locked.
+        # A failing reply is logged, the update is handled already.
+        transaction.on_commit(partial(self.tg_client.send_message, chat_id=chat_id, text=text), robust=True)
+
+    def handle_message(self, msg: Message):
+        tg_user, created = TgUser.objects.get_or_create(chat_id=msg.chat.id)
+
+        if tg_user.user:
+            self.handle_authorized_user(tg_user, msg)
+        else:
+            self.handle_unauthorized_user(tg_user, msg)
+
+    def handle_authorized_user(self, tg_user: TgUser, msg: Message):
+        commands: list = ['/goals', '/create', '/cancel']
+        create_chat: dict | None = self.states.get(msg.chat.id)
+
+        if msg.text == '/cancel':
+            self.states.delete(msg.chat.id)
+            create_chat = None
+            self.reply(chat_id=msg.chat.id, text='Operation was canceled')
+
+        if msg.text in commands and not create_chat:
+            if msg.text == '/goals':
+                # Explicit alias, the router keeps reads inside the update's transaction on the primary
+                qs = (
+                    Goal.objects.using(self.pins.get_read_alias(tg_user.user.id))
+                    .only('id', 'title')
+                    .filter(board_id__in=list(get_user_board_roles(tg_user.user.id)), category__is_deleted=False)
+                    .exclude(status=Goal.Status.archived)
+                )
+                goals = [f'{goal.id} - {goal.title}' for goal in qs]
+                self.reply(chat_id=msg.chat.id, text='No goals' if not goals else '\n'.join(goals))
+
+            if msg.text == '/create':
+                categories_qs = GoalCategory.objects.filter(
+                    board_id__in=list(get_user_board_roles(tg_user.user.id)), is_deleted=False
+                )
+
+                categories = []
+                categories_id = []
+                for category in categories_qs:
+                    categories.append(f'{category.id} - {category.title}')
+                    categories_id.append(str(category.id))
+
+                state = {'categories': categories, 'categories_id': categories_id, 'stage': 1}
+                if self.states.transition(msg.chat.id, None, state):
+                    self.reply(chat_id=msg.chat.id, text=f'Choose number of category:\n' + '\n'.join(categories))
+        if msg.text not in commands and create_chat:
+            # The transition fails when another replica has just handled the same step
+            if create_chat['stage'] == 2 and self.states.transition(msg.chat.id, 2, None):
+                Goal.objects.create(
+                    user_id=tg_user.user.id,
+                    category_id=int(create_chat['category_id']),
+                    title=msg.text,
+                )
+                self.pins.pin(tg_user.user.id)
+                self.reply(chat_id=msg.chat.id, text='Goal save')
+
+            elif create_chat['stage'] == 1:
+                if msg.text in create_chat.get('categories_id', []):
+                    if self.states.transition(msg.chat.id, 1, {'category_id': msg.text, 'stage': 2}):
+                        self.reply(chat_id=msg.chat.id, text='Enter title for goal')
+                else:
+                    self.reply(
+                        chat_id=msg.chat.id,
+                        text='Enter correct number of category\n' + '\n'.join(create_chat.get('categories', [])),
+                    )
+
+        if msg.text not in commands and not create_chat:
+            self.reply(chat_id=msg.chat.id, text=f'Unknown command!')
+
+    def handle_unauthorized_user(self, tg_user: TgUser, msg: Message):
+        code = tg_user.generate_verification_code()
+        tg_user.verification_code = code
+        tg_user.save()
+
+        self.reply(chat_id=msg.chat.id, text=f'Hello! Verification code: {code}')
@@ -0,0 +1,33 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.tg.client import get_tg_client
+
+
+class Command(BaseCommand):
+    help = (
+        'Registers the webhook (bot/webhook) with Telegram, removes it or shows its status. '
+        'Delete the webhook before going back to polling with runbot'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['set', 'delete', 'info'])
+        parser.add_argument('--url', help='Public HTTPS URL of the webhook, e.g. https://example.com/api/bot/webhook')
+        parser.add_argument('--drop-pending-updates', action='store_true')
+
+    def handle(self, *args, **options):
+        client = get_tg_client()
+        if options['action'] == 'set':
+            if not options['url']:
+                raise CommandError('--url is required')
+            if not settings.TG_WEBHOOK_SECRET:
+                raise CommandError('Set TG_WEBHOOK_SECRET first, the webhook endpoint is disabled without it')
+            client.set_webhook(options['url'], settings.TG_WEBHOOK_SECRET, options['drop_pending_updates'])
+            self.stdout.write(self.style.SUCCESS(f'Webhook set to {options["url"]}'))
+        elif options['action'] == 'delete':
+            client.delete_webhook(options['drop_pending_updates'])
+            self.stdout.write(self.style.SUCCESS('Webhook deleted'))
+        else:
+            self.stdout.write(json.dumps(client.get_webhook_info(), indent=2, ensure_ascii=False))
@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from bot.handlers import UpdateHandler
+from bot.models import TgUpdate
+from bot.tasks import process_next_update, prune_updates
+
+
+class Command(BaseCommand):
+    help = (
+        'Handles updates queued by the webhook (bot/webhook). Several workers can run at once, '
+        'updates of one chat are handled in order'
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stopping = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when there is nothing to do')
+        parser.add_argument('--once', action='store_true', help='Exit when there are no pending updates')
+        parser.add_argument('--prune-interval', type=float, default=3600, help='Seconds between deleting old updates')
+
+    def handle(self, *args, **options):
+        handler = UpdateHandler()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+
+        pruned_at = 0.0
+        while not self.stopping:
+            update = process_next_update(handler.handle_update)
+            if update is not None:
+                if update.status == TgUpdate.Status.failed:
+                    self.stderr.write(f'Update {update.update_id} failed after {update.attempts} attempts')
+                continue
+            if options['once']:
+                return
+            if time.monotonic() - pruned_at >= options['prune_interval']:
+                self.stdout.write(
+                    f'{prune_updates()} old updates and {handler.states.prune()} expired dialogues deleted'
+                )
+                pruned_at = time.monotonic()
+            time.sleep(options['sleep'])
+
+    def stop(self, signum: int, frame) -> None:
+        # The update in progress is finished and committed first
+        self.stopping = True
@@ -1,97 +1,81 @@
-from django.core.management.base import BaseCommand
-
-from bot.models import TgUser
-from bot.tg.client import TgClient
-from bot.tg.schemas import Message
-from goals.models import Goal, GoalCategory
+import signal
+import time
 
+from django.core.management.base import BaseCommand
 
-class Command(BaseCommand):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.tg_client = TgClient()
-        self._wait_list = {}
-
-    def handle(self, *args, **options):
-        offset = 0
-        while True:
-            res = self.tg_client.get_updates(offset=offset)
-            for item in res.result:
-                offset = item.update_id + 1
-                self.handle_message(item.message)
+from bot.dispatcher import UpdateDispatcher
+from bot.handlers import UpdateHandler
+from bot.tg.client import get_tg_client
 
-    def handle_message(self, msg: Message):
-        tg_user, created = TgUser.objects.get_or_create(chat_id=msg.chat.id)
 
-        if tg_user.user:
-            self.handle_authorized_user(tg_user, msg)
-        else:
-            self.handle_unauthorized_user(tg_user, msg)
+# Seconds runbot waits for a busy chat before polling for the same updates again
+PROGRESS_WAIT = 1.0
 
-    def handle_authorized_user(self, tg_user: TgUser, msg: Message):
-        commands: list = ['/goals', '/create', '/cancel']
-        create_chat: dict | None = self._wait_list.get(msg.chat.id, None)
 
-        if msg.text == '/cancel':
-            self._wait_list.pop(msg.chat.id, None)
-            create_chat = None
-            self.tg_client.send_message(chat_id=msg.chat.id, text='Operation was canceled')
+class Stopped(Exception):
+    pass
 
-        if msg.text in commands and not create_chat:
-            if msg.text == '/goals':
-                qs = Goal.objects.filter(
-                    category__is_deleted=False, category__board__participants__user_id=tg_user.user.id
-                ).exclude(status=Goal.Status.archived)
-                goals = [f'{goal.id} - {goal.title}' for goal in qs]
-                self.tg_client.send_message(chat_id=msg.chat.id, text='No goals' if not goals else '\n'.join(goals))
 
-            if msg.text == '/create':
-                categories_qs = GoalCategory.objects.filter(
-                    board__participants__user_id=tg_user.user.id, is_deleted=False
-                )
+class Command(BaseCommand):
+    help = 'Polls Telegram for updates and handles chats in parallel, updates of one chat in order'
 
-                categories = []
-                categories_id = []
-                for category in categories_qs:
-                    categories.append(f'{category.id} - {category.title}')
-                    categories_id.append(str(category.id))
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tg_client = get_tg_client()
+        self.handler = UpdateHandler(self.tg_client)
+        self.stopping = False
+        self.polling = False
 
-                self.tg_client.send_message(
-                    chat_id=msg.chat.id, text=f'Choose number of category:\n' + '\n'.join(categories)
-                )
-                self._wait_list[msg.chat.id] = {
-                    'categories': categories,
-                    'categories_id': categories_id,
-                    'category_id': '',
-                    'goal_title': '',
-                    'stage': 1,
-                }
-        if msg.text not in commands and create_chat:
-            if create_chat['stage'] == 2:
-                Goal.objects.create(
-                    user_id=tg_user.user.id,
-                    category_id=int(self._wait_list[msg.chat.id]['category_id']),
-                    title=msg.text,
-                )
-                self.tg_client.send_message(chat_id=msg.chat.id, text='Goal save')
-                self._wait_list.pop(msg.chat.id, None)
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Threads handling updates')
+        parser.add_argument('--poll-timeout', type=int, default=30, help='getUpdates long poll timeout, seconds')
+        parser.add_argument('--stats-interval', type=float, default=60, help='Seconds between throughput reports')
+        parser.add_argument('--prune-interval', type=float, default=3600, help='Seconds between deleting old dialogues')
 
-            elif create_chat['stage'] == 1:
-                if msg.text in create_chat.get('categories_id', []):
-                    self.tg_client.send_message(chat_id=msg.chat.id, text='Enter title for goal')
-                    self._wait_list[msg.chat.id] = {'category_id': msg.text, 'stage': 2}
-                else:
-                    self.tg_client.send_message(
-                        chat_id=msg.chat.id,
-                        text='Enter correct number of category\n' + '\n'.join(create_chat.get('categories', [])),
+    def handle(self, *args, **options):
+        dispatcher = UpdateDispatcher(self.handler.handle_update, options['workers'])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+
+        started = reported_at = time.monotonic()
+        pruned_at = 0.0
+        reported = 0
+        try:
+            while not self.stopping:
+                self.polling = True
+                try:
+                    res = self.tg_client.get_updates(offset=dispatcher.offset, timeout=options['poll_timeout'])
+                finally:
+                    self.polling = False
+                # Only updates seen already come back while a chat holds the offset, wait for it to move
+                if res.result and not dispatcher.submit_many(res.result):
+                    dispatcher.wait_for_progress(PROGRESS_WAIT)
+
+                now = time.monotonic()
+                if now - pruned_at >= options['prune_interval']:
+                    self.stdout.write(f'{self.handler.states.prune()} expired dialogues deleted')
+                    pruned_at = now
+                if now - reported_at >= options['stats_interval']:
+                    handled = dispatcher.handled
+                    self.stdout.write(
+                        f'{(handled - reported) / (now - reported_at):.1f} updates/s, '
+                        f'{handled} handled, {len(dispatcher.pending)} pending'
                     )
-
-        if msg.text not in commands and not create_chat:
-            self.tg_client.send_message(chat_id=msg.chat.id, text=f'Unknown command!')
-
-    def handle_unauthorized_user(self, tg_user: TgUser, msg: Message):
-        code = tg_user.generate_verification_code()
-        tg_user.verification_code = code
-        tg_user.save()
-
-        self.tg_client.send_message(chat_id=msg.chat.id, text=f'Hello! Verification code: {code}')
+                    reported_at, reported = now, handled
+        except Stopped:
+            pass
+        finally:
+            self.stdout.write(f'Stopping, waiting for {len(dispatcher.pending)} updates')
+            dispatcher.shutdown()
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{dispatcher.handled} updates in {elapsed:.0f} s ({dispatcher.handled / elapsed:.1f}/s)')
+
+        # Acknowledge the handled updates, otherwise Telegram sends them again to the next run
+        if dispatcher.last_update_id is not None:
+            self.tg_client.get_updates(offset=dispatcher.offset, timeout=0)
+
+    def stop(self, signum: int, frame) -> None:
+        self.stopping = True
+        # Interrupts the long poll, the updates in progress are finished by dispatcher.shutdown()
+        if self.polling:
+            raise Stopped
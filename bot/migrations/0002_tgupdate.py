@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 20:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('update_id', models.BigIntegerField(unique=True)),
+                ('chat_id', models.BigIntegerField()),
+                ('payload', models.JSONField()),
+                (
+                    'status',
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, 'В очереди'), (2, 'Обработано'), (3, 'Ошибка')], default=1
+                    ),
+                ),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tgupdate',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['update_id'], name='tgupdate_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tgupdate',
+            index=models.Index(
+                condition=models.Q(('status', 1)), fields=['chat_id', 'update_id'], name='tgupdate_pending_chat_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bot', '0002_tgupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TgConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(unique=True)),
+                ('state', models.JSONField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
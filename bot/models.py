@@ -1,6 +1,8 @@
 import secrets
 
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from core.models import User
 
@@ -13,3 +15,36 @@ class TgUser(models.Model):
     @staticmethod
     def generate_verification_code():
         return str(secrets.token_urlsafe(32))
+
+
+# Updates received by the webhook, handled by `manage.py process_updates`
+class TgUpdate(models.Model):
+    class Status(models.IntegerChoices):
+        pending = 1, 'В очереди'
+        done = 2, 'Обработано'
+        failed = 3, 'Ошибка'
+
+    # Telegram resends an update until the webhook answers, the unique id drops the copies
+    update_id = models.BigIntegerField(unique=True)
+    chat_id = models.BigIntegerField()
+    payload = models.JSONField()
+    status = models.PositiveSmallIntegerField(choices=Status.choices, default=Status.pending)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Pending status is 1, see Status
+            models.Index(fields=['update_id'], condition=Q(status=1), name='tgupdate_pending_idx'),
+            models.Index(fields=['chat_id', 'update_id'], condition=Q(status=1), name='tgupdate_pending_chat_idx'),
+        ]
+
+
+# Dialogue state of a chat, see bot.state.DatabaseConversationStore
+class TgConversation(models.Model):
+    chat_id = models.BigIntegerField(unique=True)
+    state = models.JSONField()
+    expires_at = models.DateTimeField()
@@ -0,0 +1,182 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from functools import cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from bot.models import TgConversation
+
+
+class ConversationStore:
+    """
+    Dialogue state of bot chats, e.g. the stage of /create. Entries expire BOT_STATE_TTL
+    seconds after the last write. ``transition`` changes the state only if the chat
+    is still at the expected stage, so a message handled twice does not repeat a step.
+    """
+
+    def __init__(self, ttl: int | None = None) -> None:
+        self.ttl = ttl or settings.BOT_STATE_TTL
+
+    def get(self, chat_id: int) -> dict | None:
+        raise NotImplementedError
+
+    def delete(self, chat_id: int) -> None:
+        raise NotImplementedError
+
+    def transition(self, chat_id: int, stage: int | None, state: dict | None) -> bool:
+        """Replaces the state (deletes it when None) if its stage is ``stage``, None for no dialogue."""
+        raise NotImplementedError
+
+    def prune(self) -> int:
+        """Deletes expired entries the store does not drop by itself, returns how many."""
+        return 0
+
+    @staticmethod
+    def get_stage(state: dict | None) -> int | None:
+        return state['stage'] if state else None
+
+
+class LocalConversationStore(ConversationStore):
+    """In-process store for a single bot process, at most BOT_STATE_MAX_ENTRIES chats."""
+
+    def __init__(self, ttl: int | None = None, max_entries: int | None = None) -> None:
+        super().__init__(ttl)
+        self.max_entries = max_entries or settings.BOT_STATE_MAX_ENTRIES
+        self.lock = threading.Lock()
+        # Ordered by last write, so the expired entries are at the front
+        self.entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+
+    def get(self, chat_id: int) -> dict | None:
+        with self.lock:
+            return self._get(chat_id)
+
+    def delete(self, chat_id: int) -> None:
+        with self.lock:
+            self.entries.pop(chat_id, None)
+
+    def transition(self, chat_id: int, stage: int | None, state: dict | None) -> bool:
+        with self.lock:
+            if self.get_stage(self._get(chat_id)) != stage:
+                return False
+            self.entries.pop(chat_id, None)
+            if state is not None:
+                self.entries[chat_id] = (time.monotonic() + self.ttl, state)
+                self._evict()
+            return True
+
+    def _get(self, chat_id: int) -> dict | None:
+        entry = self.entries.get(chat_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at <= time.monotonic():
+            del self.entries[chat_id]
+            return None
+        return state
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self.entries:
+            chat_id, (expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_entries:
+                break
+            del self.entries[chat_id]
+
+
+class CacheConversationStore(ConversationStore):
+    """
+    Store in the BOT_STATE_CACHE cache, shared by bot processes when the cache is shared
+    (Redis, Memcached or a DatabaseCache table), see bot.checks. Transitions hold a
+    per-chat lock taken with cache.add().
+    """
+
+    key_prefix = 'bot-state'
+    lock_timeout = 10
+    lock_wait = 2.0
+
+    def __init__(self, ttl: int | None = None, alias: str | None = None) -> None:
+        super().__init__(ttl)
+        self.cache = caches[alias or settings.BOT_STATE_CACHE]
+
+    def get(self, chat_id: int) -> dict | None:
+        return self.cache.get(f'{self.key_prefix}:{chat_id}')
+
+    def delete(self, chat_id: int) -> None:
+        self.cache.delete(f'{self.key_prefix}:{chat_id}')
+
+    def transition(self, chat_id: int, stage: int | None, state: dict | None) -> bool:
+        key, lock_key, token = f'{self.key_prefix}:{chat_id}', f'{self.key_prefix}:lock:{chat_id}', uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(lock_key, token, timeout=self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        try:
+            if self.get_stage(self.cache.get(key)) != stage:
+                return False
+            if state is None:
+                self.cache.delete(key)
+            else:
+                self.cache.set(key, state, timeout=self.ttl)
+            return True
+        finally:
+            # The lock may have expired and been taken by another process meanwhile
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+
+class DatabaseConversationStore(ConversationStore):
+    """
+    Store in the TgConversation table, shared by all bot processes. Transitions lock the
+    chat's row and run in the caller's transaction, so a state change is rolled back with
+    the writes of a failed update. There is one row per chat, expired rows are overwritten
+    and deleted by ``prune``, which runbot and process_updates call periodically.
+    """
+
+    def prune(self) -> int:
+        return TgConversation.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+    def get(self, chat_id: int) -> dict | None:
+        return (
+            TgConversation.objects.filter(chat_id=chat_id, expires_at__gt=timezone.now())
+            .values_list('state', flat=True)
+            .first()
+        )
+
+    def delete(self, chat_id: int) -> None:
+        TgConversation.objects.filter(chat_id=chat_id).delete()
+
+    def transition(self, chat_id: int, stage: int | None, state: dict | None) -> bool:
+        now = timezone.now()
+        with transaction.atomic():
+            row = TgConversation.objects.select_for_update().filter(chat_id=chat_id).first()
+            current = row.state if row is not None and row.expires_at > now else None
+            if self.get_stage(current) != stage:
+                return False
+            if state is None:
+                if row is not None:
+                    row.delete()
+                return True
+            expires_at = now + timedelta(seconds=self.ttl)
+            if row is not None:
+                TgConversation.objects.filter(pk=row.pk).update(state=state, expires_at=expires_at)
+                return True
+            try:
+                with transaction.atomic():
+                    TgConversation.objects.create(chat_id=chat_id, state=state, expires_at=expires_at)
+            except IntegrityError:
+                # Another process has just started a dialogue in this chat
+                return False
+            return True
+
+
+@cache
+def get_conversation_store() -> ConversationStore:
+    return import_string(settings.BOT_STATE_STORE)()
@@ -0,0 +1,82 @@
+import logging
+import traceback
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from bot.models import TgUpdate
+from bot.tg.schemas import UpdateObj
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 300
+
+
+def enqueue_update(update: UpdateObj) -> None:
+    """Stores a webhook update once, copies with the same update_id are ignored."""
+    if update.message is None:
+        return
+    TgUpdate.objects.bulk_create(
+        [TgUpdate(update_id=update.update_id, chat_id=update.message.chat.id, payload=update.dict())],
+        ignore_conflicts=True,
+    )
+
+
+def process_next_update(handler: Callable[[UpdateObj], None]) -> TgUpdate | None:
+    """
+    Handles the oldest pending update whose chat has no earlier pending update.
+
+    The row stays locked while it is handled and its status is committed with the
+    handler's writes, so a killed worker leaves it pending. Rows locked by other
+    workers are skipped and an earlier pending update blocks the rest of its chat,
+    so several workers can run at once and each chat is still handled in order.
+    A failing update is retried with backoff up to BOT_UPDATE_MAX_ATTEMPTS times.
+    Telegram calls of the handler belong in transaction.on_commit(), see
+    UpdateHandler.reply, so they run after the row is unlocked.
+    """
+    with transaction.atomic():
+        earlier = TgUpdate.objects.filter(
+            chat_id=OuterRef('chat_id'), status=TgUpdate.Status.pending, update_id__lt=OuterRef('update_id')
+        )
+        update = (
+            TgUpdate.objects.select_for_update(skip_locked=True)
+            .filter(status=TgUpdate.Status.pending, available_at__lte=timezone.now())
+            .exclude(Exists(earlier))
+            .order_by('update_id')
+            .first()
+        )
+        if update is None:
+            return None
+
+        update.attempts += 1
+        try:
+            with transaction.atomic():
+                handler(UpdateObj(**update.payload))
+        except Exception:
+            logger.exception('Update %s failed, attempt %s', update.update_id, update.attempts)
+            update.error = traceback.format_exc()
+            if update.attempts >= settings.BOT_UPDATE_MAX_ATTEMPTS:
+                update.status = TgUpdate.Status.failed
+            else:
+                delay = min(2**update.attempts, MAX_RETRY_DELAY)
+                update.available_at = timezone.now() + timedelta(seconds=delay)
+        else:
+            update.status = TgUpdate.Status.done
+        update.save()
+    return update
+
+
+def prune_updates(batch_size: int = 10000) -> int:
+    """Deletes handled and failed updates older than BOT_UPDATE_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=settings.BOT_UPDATE_RETENTION_DAYS)
+    finished = TgUpdate.objects.exclude(status=TgUpdate.Status.pending).filter(created__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += TgUpdate.objects.filter(id__in=ids).delete()[0]
@@ -1,3 +1,350 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from typing import Any
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from bot.dispatcher import UpdateDispatcher
+from bot.handlers import UpdateHandler
+from bot.models import TgConversation, TgUpdate, TgUser
+from bot.checks import check_state_cache
+from bot.state import CacheConversationStore, DatabaseConversationStore, LocalConversationStore
+from bot.tasks import enqueue_update, process_next_update
+from bot.tg.client import AsyncTgClient, TgClient
+from bot.tg.schemas import Message, UpdateObj
+from core.models import User
+from goals.models import Board, BoardParticipant, Goal, GoalCategory
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        server: StandInServer = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server.requests.append((self.path, body, self.client_address[1]))
+        status, payload = server.responses.pop(0) if server.responses else (200, None)
+        if payload is None:
+            payload = {'ok': True, 'result': {'chat': {'id': body.get('chat_id', 0)}, 'text': body.get('text')}}
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.requests: list[tuple[str, dict, int]] = []
+        self.responses: list[tuple[int, dict | None]] = []
+
+
+@override_settings(TG_RETRY_BACKOFF=0, TG_MAX_RETRIES=2)
+class TgClientTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.server = StandInServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = TgClient(token='token', base_url=f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_and_keep_alive(self) -> None:
+        self.server.responses = [
+            (429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0}}),
+            (502, {'ok': False}),
+        ]
+        with self.assertLogs('bot.tg.client', 'WARNING'):
+            response = self.client.send_message(chat_id=1, text='Hello')
+        self.client.send_message(chat_id=1, text='Again')
+
+        self.assertEqual(response.result.text, 'Hello')
+        self.assertEqual([path for path, _, _ in self.server.requests], ['/bottoken/sendMessage'] * 4)
+        # Every request went over the same connection
+        self.assertEqual(len({port for _, _, port in self.server.requests}), 1)
+
+    def test_client_error_is_not_retried(self) -> None:
+        self.server.responses = [(400, {'ok': False, 'description': 'Bad Request: chat not found'})] * 3
+        with self.assertRaises(RuntimeError), self.assertLogs('bot.tg.client', 'ERROR'):
+            self.client.send_message(chat_id=1, text='Hello')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_gives_up_after_max_retries(self) -> None:
+        self.server.responses = [(503, {'ok': False})] * 3
+        with self.assertRaises(RuntimeError), self.assertLogs('bot.tg.client', 'WARNING'):
+            self.client.send_message(chat_id=1, text='Hello')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_async_client(self) -> None:
+        response = async_to_sync(AsyncTgClient(self.client).send_message)(chat_id=2, text='Hello')
+        self.assertEqual(response.result.chat.id, 2)
+        self.assertEqual(self.server.requests[0][1], {'chat_id': 2, 'text': 'Hello'})
+
+
+class UpdateDispatcherTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.handled: list[tuple[int, int]] = []
+        self.release = threading.Event()
+        self.dispatcher = UpdateDispatcher(self.handle, workers=4, max_attempts=2)
+        self.dispatcher.retry_backoff = 0
+
+    def handle(self, update: UpdateObj) -> None:
+        if update.update_id == 1:
+            self.release.wait(5)
+        if update.update_id == 5:
+            raise ValueError('Broken update')
+        time.sleep(0.01)
+        self.handled.append((update.message.chat.id, update.update_id))
+
+    @staticmethod
+    def update(update_id: int, chat_id: int) -> UpdateObj:
+        return UpdateObj(update_id=update_id, message={'chat': {'id': chat_id}, 'text': str(update_id)})
+
+    def test_chats_in_parallel_and_in_order(self) -> None:
+        with self.assertLogs('bot.dispatcher', 'ERROR') as logs:
+            for update_id, chat_id in ((1, 10), (2, 20), (3, 10), (4, 20), (5, 30), (6, 20)):
+                self.dispatcher.submit(self.update(update_id, chat_id))
+            # Redelivered updates are skipped
+            self.dispatcher.submit(self.update(2, 20))
+
+            deadline = time.monotonic() + 5
+            while self.dispatcher.handled < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # Chat 10 waits for its first update, the others go on and the offset stays at the update in progress
+            self.assertEqual(self.handled, [(20, 2), (20, 4), (20, 6)])
+            self.assertEqual(self.dispatcher.offset, 1)
+
+            self.release.set()
+            self.dispatcher.shutdown()
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('Update 5 failed, attempt 2', logs.output[1])
+        self.assertEqual([item for item in self.handled if item[0] == 10], [(10, 1), (10, 3)])
+        self.assertEqual(self.dispatcher.handled, 6)
+        self.assertEqual(self.dispatcher.offset, 7)
+
+    def test_blocked_chat_does_not_spin_polling(self) -> None:
+        updates = [self.update(1, 10), *(self.update(update_id, update_id % 5) for update_id in range(1000, 1150))]
+        polls = []
+
+        def poll() -> None:
+            # runbot's loop, getUpdates returns at most 100 updates
+            polls.append(self.dispatcher.offset)
+            result = [update for update in updates if update.update_id >= polls[-1]][:100]
+            if result and not self.dispatcher.submit_many(result):
+                self.dispatcher.wait_for_progress(0.2)
+
+        def wait_handled(count: int) -> None:
+            deadline = time.monotonic() + 5
+            while self.dispatcher.handled < count and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        poll()
+        wait_handled(99)
+        # Chat 10 holds the offset, the same updates come back and the loop waits instead of polling again
+        started = time.monotonic()
+        poll()
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(self.dispatcher.pending, {1})
+
+        # Handling the update wakes the loop up
+        threading.Timer(0.05, self.release.set).start()
+        poll()
+        wait_handled(100)
+        poll()
+        wait_handled(151)
+        self.assertEqual(polls, [0, 1, 1, 1099])
+        self.assertEqual(self.dispatcher.offset, 1150)
+        self.dispatcher.shutdown()
+
+
+@override_settings(TG_WEBHOOK_SECRET='secret')
+class WebhookTest(APITestCase):
+    def post(self, data: dict, secret: str = 'secret') -> Any:
+        return self.client.post(
+            reverse('bot:webhook'), data, format='json', HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret
+        )
+
+    def test_enqueue_once(self) -> None:
+        update = {'update_id': 1, 'message': {'chat': {'id': 10}, 'text': '/goals'}}
+        self.assertEqual(self.post(update).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post(update).status_code, status.HTTP_200_OK)
+        # Other update types are accepted and dropped
+        self.assertEqual(self.post({'update_id': 2, 'edited_message': {}}).status_code, status.HTTP_200_OK)
+
+        queued = TgUpdate.objects.get()
+        self.assertEqual((queued.update_id, queued.chat_id, queued.status), (1, 10, TgUpdate.Status.pending))
+        self.assertEqual(queued.payload['message']['text'], '/goals')
+
+    def test_rejected(self) -> None:
+        self.assertEqual(self.post({'update_id': 1}, secret='wrong').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post({'message': {}}).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(TG_WEBHOOK_SECRET=''):
+            self.assertEqual(self.post({'update_id': 1}, secret='').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(TgUpdate.objects.exists())
+
+
+class ProcessUpdatesTest(TestCase):
+    def setUp(self) -> None:
+        self.handled: list[int] = []
+        self.fail = {1}
+        for update_id, chat_id in ((1, 10), (2, 20), (3, 10)):
+            enqueue_update(UpdateObj(update_id=update_id, message={'chat': {'id': chat_id}, 'text': 'text'}))
+
+    def handle(self, update: UpdateObj) -> None:
+        if update.update_id in self.fail:
+            self.fail.discard(update.update_id)
+            raise ValueError('Telegram is down')
+        self.handled.append(update.update_id)
+
+    def test_chat_order_and_retry(self) -> None:
+        with self.assertLogs('bot.tasks', 'ERROR'):
+            failed = process_next_update(self.handle)
+        self.assertEqual((failed.update_id, failed.status, failed.attempts), (1, TgUpdate.Status.pending, 1))
+        self.assertGreater(failed.available_at, timezone.now())
+
+        # Update 1 waits for its retry and holds back update 3 of the same chat
+        self.assertEqual(process_next_update(self.handle).update_id, 2)
+        self.assertIsNone(process_next_update(self.handle))
+
+        TgUpdate.objects.filter(update_id=1).update(available_at=timezone.now())
+        while process_next_update(self.handle):
+            pass
+        self.assertEqual(self.handled, [2, 1, 3])
+        self.assertEqual(set(TgUpdate.objects.values_list('status', flat=True)), {TgUpdate.Status.done})
+
+
+class ConversationStoreTest(TestCase):
+    def test_transitions(self) -> None:
+        for store in (
+            LocalConversationStore(ttl=60),
+            CacheConversationStore(ttl=60),
+            DatabaseConversationStore(ttl=60),
+        ):
+            with self.subTest(store=type(store).__name__):
+                self.assertTrue(store.transition(1, None, {'stage': 1}))
+                self.assertFalse(store.transition(1, None, {'stage': 1}))
+                self.assertFalse(store.transition(1, 2, None))
+                self.assertTrue(store.transition(1, 1, {'stage': 2, 'category_id': '5'}))
+                self.assertEqual(store.get(1), {'stage': 2, 'category_id': '5'})
+                self.assertTrue(store.transition(1, 2, None))
+                self.assertIsNone(store.get(1))
+
+    def test_local_eviction(self) -> None:
+        store = LocalConversationStore(ttl=60, max_entries=2)
+        with mock.patch('bot.state.time.monotonic', return_value=1000):
+            for chat_id in (1, 2, 3):
+                store.transition(chat_id, None, {'stage': 1})
+            self.assertEqual(list(store.entries), [2, 3])
+        with mock.patch('bot.state.time.monotonic', return_value=1061):
+            self.assertIsNone(store.get(2))
+            store.transition(4, None, {'stage': 1})
+            self.assertEqual(list(store.entries), [4])
+
+    def test_database_expiry(self) -> None:
+        store = DatabaseConversationStore(ttl=60)
+        store.transition(1, None, {'stage': 1})
+        with mock.patch('bot.state.timezone.now', return_value=timezone.now() + timedelta(seconds=61)):
+            self.assertIsNone(store.get(1))
+            # The expired row is taken over by a new dialogue
+            self.assertTrue(store.transition(1, None, {'stage': 1}))
+        self.assertEqual(TgConversation.objects.count(), 1)
+
+    def test_database_prune(self) -> None:
+        store = DatabaseConversationStore(ttl=60)
+        store.transition(1, None, {'stage': 1})
+        with mock.patch('bot.state.timezone.now', return_value=timezone.now() - timedelta(seconds=61)):
+            store.transition(2, None, {'stage': 1})
+        self.assertEqual(store.prune(), 1)
+        self.assertEqual(list(TgConversation.objects.values_list('chat_id', flat=True)), [1])
+
+    def test_process_local_cache_refused(self) -> None:
+        with override_settings(BOT_STATE_STORE='bot.state.CacheConversationStore'):
+            self.assertEqual([error.id for error in check_state_cache(None)], ['bot.E001'])
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+                self.assertEqual(check_state_cache(None), [])
+        self.assertEqual(check_state_cache(None), [])
+
+
+class UpdateHandlerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = User.objects.create_user(username='owner', password='password')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=user)
+        cls.category = GoalCategory.objects.create(board=board, title='Category', user=user)
+        TgUser.objects.create(chat_id=10, user=user)
+
+    def test_create_across_replicas(self) -> None:
+        # Two handlers with their own clients and stores, like two bot workers sharing only the database
+        replicas = [UpdateHandler(mock.Mock(), DatabaseConversationStore()) for _ in range(2)]
+        for number, text in enumerate(['/create', str(self.category.id), 'Goal from bot', 'Goal from bot']):
+            with self.captureOnCommitCallbacks(execute=True):
+                replicas[number % 2].handle_message(Message(chat={'id': 10}, text=text))
+
+        self.assertEqual(list(Goal.objects.values_list('title', flat=True)), ['Goal from bot'])
+        replies = [call.kwargs['text'] for handler in replicas for call in handler.tg_client.send_message.mock_calls]
+        self.assertIn('Goal save', replies)
+        self.assertIn('Unknown command!', replies)
+        self.assertIsNone(replicas[0].states.get(10))
+        self.assertFalse(TgConversation.objects.exists())
+
+    def test_replies_after_commit(self) -> None:
+        handler = UpdateHandler(mock.Mock(), DatabaseConversationStore())
+        enqueue_update(UpdateObj(update_id=1, message={'chat': {'id': 10}, 'text': '/create'}))
+        with self.captureOnCommitCallbacks() as callbacks:
+            process_next_update(handler.handle_update)
+            # The update row is still locked here
+            handler.tg_client.send_message.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertIn('Choose number of category', handler.tg_client.send_message.call_args.kwargs['text'])
+
+    def test_failed_update_keeps_state(self) -> None:
+        handler = UpdateHandler(mock.Mock(), DatabaseConversationStore())
+        handler.states.transition(10, None, {'category_id': str(self.category.id), 'stage': 2})
+        enqueue_update(UpdateObj(update_id=1, message={'chat': {'id': 10}, 'text': 'Goal from bot'}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(Goal.objects, 'create', side_effect=ValueError('Database is down')):
+                with self.assertLogs('bot.tasks', 'ERROR'):
+                    process_next_update(handler.handle_update)
+        # The dialogue is rolled back with the goal and nothing was sent
+        self.assertEqual(handler.states.get(10)['stage'], 2)
+        handler.tg_client.send_message.assert_not_called()
+
+        TgUpdate.objects.update(available_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_next_update(handler.handle_update).status, TgUpdate.Status.done)
+        self.assertEqual(list(Goal.objects.values_list('title', flat=True)), ['Goal from bot'])
+        self.assertEqual(handler.tg_client.send_message.call_args.kwargs['text'], 'Goal save')
+
+    @override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+    def test_goals_pinned_to_primary_after_create(self) -> None:
+        handler = UpdateHandler(mock.Mock(), DatabaseConversationStore())
+        user_id = TgUser.objects.get(chat_id=10).user_id
+        self.assertEqual(handler.pins.get_read_alias(user_id), 'replica')
+
+        for text in ['/create', str(self.category.id), 'Goal from bot']:
+            with self.captureOnCommitCallbacks(execute=True):
+                handler.handle_update(UpdateObj(update_id=1, message={'chat': {'id': 10}, 'text': text}))
+        self.assertEqual(handler.pins.get_read_alias(user_id), 'default')
+        # Other users still read from the replica
+        self.assertEqual(handler.pins.get_read_alias(user_id + 1), 'replica')
+        with mock.patch('todolist.db_router.time.monotonic', return_value=time.monotonic() + 11):
+            self.assertEqual(handler.pins.get_read_alias(user_id), 'replica')
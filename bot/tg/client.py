@@ -1,23 +1,54 @@
 import logging
+import time
+from functools import cache
 
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from pydantic import ValidationError
+from requests.adapters import HTTPAdapter
 
 from bot.tg.schemas import GetUpdatesResponse, SendMessageResponse
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_BACKOFF = 30.0
+
 
 class TgClient:
-    def __init__(self, token: str = settings.BOT_TOKEN):
-        self.token = token
+    """
+    Telegram Bot API client with a keep-alive connection pool. Share one instance,
+    see get_tg_client(); requests.Session connections are reused across threads.
+
+    Connection errors, 429 and 5xx responses are retried up to TG_MAX_RETRIES times,
+    after ``retry_after`` seconds when Telegram sends it and with exponential backoff
+    otherwise. Read timeouts are not retried, the message may have been sent.
+    """
+
+    def __init__(self, token: str | None = None, base_url: str | None = None) -> None:
+        self.token = token or settings.BOT_TOKEN
+        self.base_url = (base_url or settings.TG_API_URL).rstrip('/')
+        self.timeout = (settings.TG_CONNECT_TIMEOUT, settings.TG_READ_TIMEOUT)
+        self.max_retries = settings.TG_MAX_RETRIES
+        self.backoff = settings.TG_RETRY_BACKOFF
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.TG_POOL_SIZE, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self) -> None:
+        self.session.close()
 
     def get_url(self, method: str) -> str:
-        return f'https://api.telegram.org/bot{self.token}/{method}'
+        return f'{self.base_url}/bot{self.token}/{method}'
 
     def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
-        data = self._get(method='getUpdates', offset=offset, timeout=timeout)
+        # The long poll holds the response for up to ``timeout`` seconds
+        data = self._request(
+            method='getUpdates', read_timeout=self.timeout[1] + timeout, offset=offset, timeout=timeout
+        )
         try:
             return GetUpdatesResponse(**data)
         except ValidationError as e:
@@ -26,13 +57,79 @@ class TgClient:
             return GetUpdatesResponse(ok=False, result=[])
 
     def send_message(self, chat_id: int, text: str) -> SendMessageResponse:
-        data = self._get(method='sendMessage', chat_id=chat_id, text=text)
+        data = self._request(method='sendMessage', chat_id=chat_id, text=text)
         return SendMessageResponse(**data)
 
-    def _get(self, method: str, **params) -> dict:
+    def set_webhook(self, url: str, secret_token: str, drop_pending_updates: bool = False) -> bool:
+        data = self._request(
+            method='setWebhook',
+            url=url,
+            secret_token=secret_token,
+            allowed_updates=['message'],
+            drop_pending_updates=drop_pending_updates,
+        )
+        return data['result']
+
+    def delete_webhook(self, drop_pending_updates: bool = False) -> bool:
+        return self._request(method='deleteWebhook', drop_pending_updates=drop_pending_updates)['result']
+
+    def get_webhook_info(self) -> dict:
+        return self._request(method='getWebhookInfo')['result']
+
+    def _request(self, method: str, read_timeout: float | None = None, **params) -> dict:
         url: str = self.get_url(method)
-        response = requests.get(url, params=params)
-        if not response.ok:
-            logger.error(f'Status code: {response.status_code}. Body: {response.content}')
-            raise RuntimeError
-        return response.json()
+        timeout = (self.timeout[0], read_timeout or self.timeout[1])
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=params, timeout=timeout)
+            except requests.ConnectionError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.get_backoff(attempt)
+                logger.warning(f'{method}: {e}, retrying in {delay:.1f} s')
+            else:
+                if response.ok:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    logger.error(f'Status code: {response.status_code}. Body: {response.content}')
+                    raise RuntimeError
+                retry_after = self.get_retry_after(response)
+                delay = self.get_backoff(attempt) if retry_after is None else retry_after
+                logger.warning(f'{method}: status code {response.status_code}, retrying in {delay:.1f} s')
+            time.sleep(delay)
+
+    def get_backoff(self, attempt: int) -> float:
+        return min(self.backoff * 2**attempt, MAX_BACKOFF)
+
+    @staticmethod
+    def get_retry_after(response: requests.Response) -> float | None:
+        # Telegram sends {"parameters": {"retry_after": N}} with 429, proxies may send the header
+        try:
+            return float(response.json()['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return None
+
+
+class AsyncTgClient:
+    """
+    Awaitable TgClient methods for async code. The calls run in worker threads on
+    the wrapped client, so both share one connection pool.
+    """
+
+    def __init__(self, client: TgClient | None = None) -> None:
+        self.client = client or get_tg_client()
+
+    async def get_updates(self, offset: int = 0, timeout: int = 60) -> GetUpdatesResponse:
+        return await sync_to_async(self.client.get_updates, thread_sensitive=False)(offset=offset, timeout=timeout)
+
+    async def send_message(self, chat_id: int, text: str) -> SendMessageResponse:
+        return await sync_to_async(self.client.send_message, thread_sensitive=False)(chat_id=chat_id, text=text)
+
+
+@cache
+def get_tg_client() -> TgClient:
+    return TgClient()
@@ -12,7 +12,8 @@ class Message(BaseModel):
 
 class UpdateObj(BaseModel):
     update_id: int
-    message: Message
+    # Absent in updates of other types, e.g. edited_message
+    message: Message | None = None
 
 
 class GetUpdatesResponse(BaseModel):
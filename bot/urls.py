@@ -7,4 +7,5 @@ app_name = 'bot'
 urlpatterns = [
     # Bot
     path('verify', views.VerificationCodeView.as_view(), name='verify'),
+    path('webhook', views.WebhookView.as_view(), name='webhook'),
 ]
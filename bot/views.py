@@ -1,13 +1,18 @@
+import hmac
 from typing import Any
 
+import pydantic
+from django.conf import settings
 from rest_framework import generics, permissions
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied, ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from bot.models import TgUser
 from bot.serializers import TgUserSerializer
-from bot.tg.client import TgClient
+from bot.tasks import enqueue_update
+from bot.tg.client import get_tg_client
+from bot.tg.schemas import UpdateObj
 
 
 class VerificationCodeView(generics.GenericAPIView):
@@ -25,5 +30,30 @@ class VerificationCodeView(generics.GenericAPIView):
 
         tg_user.user = request.user
         tg_user.save()
-        TgClient().send_message(chat_id=tg_user.chat_id, text='Bot has been verified')
+        get_tg_client().send_message(chat_id=tg_user.chat_id, text='Bot has been verified')
         return Response(TgUserSerializer(tg_user).data)
+
+
+class WebhookView(generics.GenericAPIView):
+    """
+    Receives updates from Telegram in webhook mode and queues them for
+    `manage.py process_updates`. Disabled (404) while TG_WEBHOOK_SECRET is empty.
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        secret = settings.TG_WEBHOOK_SECRET
+        if not secret:
+            raise NotFound
+        if not hmac.compare_digest(request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), secret):
+            raise PermissionDenied
+
+        try:
+            update = UpdateObj.parse_obj(request.data)
+        except pydantic.ValidationError as e:
+            raise ValidationError(e.errors())
+
+        enqueue_update(update)
+        return Response()
@@ -11,6 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from core.models import User
 from core.serializers import CreateUserSerializer, ProfileSerializer, LoginSerializer, UpdatePasswordSerializer
+from todolist.metrics import SerializerTimingMixin
 
 
 class SignUpView(GenericAPIView):
@@ -41,7 +42,7 @@ class LoginView(GenericAPIView):
         return Response(ProfileSerializer(user).data)
 
 
-class ProfileView(RetrieveUpdateDestroyAPIView):
+class ProfileView(SerializerTimingMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ProfileSerializer
 
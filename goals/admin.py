@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.models import ArchiveTask, GoalCategory, Goal, GoalComment, Board, BoardParticipant
 
 
 class GoalCategoryAdmin(admin.ModelAdmin):
@@ -30,8 +30,14 @@ class BoardParticipantAdmin(admin.ModelAdmin):
     list_display = ('board', 'user', 'role', 'created', 'updated')
 
 
+class ArchiveTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'board', 'category', 'status', 'processed', 'total', 'created', 'updated')
+    list_filter = ('status',)
+
+
 admin.site.register(GoalCategory, GoalCategoryAdmin)
 admin.site.register(Goal, GoalAdmin)
 admin.site.register(GoalComment, GoalCommentAdmin)
 admin.site.register(Board, BoardAdmin)
 admin.site.register(BoardParticipant, BoardParticipantAdmin)
+admin.site.register(ArchiveTask, ArchiveTaskAdmin)
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponseBase
+from django.views import View
+from rest_framework import generics
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from goals import views
+from goals.cache import CachedListMixin
+from goals.conditional import set_validators
+from goals.lean import LeanSerializer, board_lean_serializer, goal_lean_serializer
+from todolist.db_router import use_primary
+
+
+@dataclass
+class PendingList:
+    view: generics.ListAPIView
+    queryset: QuerySet
+
+
+class AsyncListView(View):
+    """
+    Async counterpart of a DRF list view for the ASGI server, see SERVER_MODE.
+
+    Authentication, permissions, the conditional GET check, the response cache and
+    filtering run through ``view_class`` in a worker thread, the COUNT and page
+    queries run on the async ORM and rows are serialized with ``lean_serializer``.
+    Requests this path does not cover (other pagination modes, the browsable API)
+    are handled by ``view_class`` as a whole, so the responses are the same.
+    """
+
+    view_class: type[generics.ListAPIView] | None = None
+    lean_serializer: LeanSerializer | None = None
+
+    async def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        pending = await sync_to_async(self.prepare)(request, *args, **kwargs)
+        if isinstance(pending, HttpResponseBase):
+            return pending
+
+        view = pending.view
+        if isinstance(view, CachedListMixin):
+            # Same as CachedListMixin.list, a lagging replica would store stale rows under the new versions
+            with use_primary():
+                data = await self.fetch(pending)
+            await sync_to_async(view.cache_response_data)(data)
+        else:
+            data = await self.fetch(pending)
+
+        view.json_has_floats = self.lean_serializer.has_floats(pending.queryset)
+        response = view.finalize_response(view.request, set_validators(Response(data), *view.validators))
+        return response.render()
+
+    def prepare(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase | PendingList:
+        # The steps of APIView.dispatch up to the list() call
+        view = self.view_class()
+        view.setup(request, *args, **kwargs)
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        try:
+            view.initial(drf_request, *args, **kwargs)
+            if self.is_supported(view, drf_request):
+                response = self.prepare_list(view, drf_request)
+                if isinstance(response, PendingList):
+                    return response
+            else:
+                response = view.get(drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        response = view.finalize_response(drf_request, response, *args, **kwargs)
+        return response.render() if hasattr(response, 'render') else response
+
+    @staticmethod
+    def is_supported(view: generics.ListAPIView, request: Request) -> bool:
+        mode_query_param = getattr(view.paginator, 'mode_query_param', None)
+        return request.accepted_renderer.format == 'json' and mode_query_param not in request.query_params
+
+    def prepare_list(self, view: generics.ListAPIView, request: Request) -> HttpResponseBase | PendingList:
+        # ConditionalListMixin.list and CachedListMixin.list up to the queries
+        not_modified = view.get_not_modified_response(request)
+        if not_modified is not None:
+            return not_modified
+
+        if isinstance(view, CachedListMixin):
+            cached = view.get_cached_response(request)
+            if cached is not None:
+                return set_validators(cached, *view.validators)
+
+        return PendingList(view, view.filter_queryset(view.get_queryset()))
+
+    async def fetch(self, pending: PendingList) -> Any:
+        view, queryset = pending.view, pending.queryset
+        rows = self.lean_serializer.values(queryset)
+        paginator = view.paginator
+        limit = paginator.get_limit(view.request) if paginator is not None else None
+        if limit is None:
+            return self.lean_serializer.to_representation([row async for row in rows], queryset)
+
+        # LimitOffsetPagination.paginate_queryset on the async ORM
+        paginator.request = view.request
+        paginator.limit = limit
+        paginator.offset = paginator.get_offset(view.request)
+        paginator.count = await rows.acount()
+        page = []
+        if paginator.count and paginator.offset <= paginator.count:
+            page = [row async for row in rows[paginator.offset : paginator.offset + paginator.limit]]
+        return paginator.get_paginated_response(self.lean_serializer.to_representation(page, queryset)).data
+
+
+board_list_view = AsyncListView.as_view(view_class=views.BoardListView, lean_serializer=board_lean_serializer)
+goal_list_view = AsyncListView.as_view(view_class=views.GoalListView, lean_serializer=goal_lean_serializer)
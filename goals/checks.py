@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs) -> list[Error]:
+    # Board roles are invalidated through the default cache, see goals.membership. A process-local cache
+    # only reaches the worker that handled the write, the others keep serving the old roles.
+    if settings.GUNICORN_WORKERS <= 1:
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f'{backend} is not shared between the {settings.GUNICORN_WORKERS} worker processes.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as '
+            'django.core.cache.backends.redis.RedisCache, or run a single worker.',
+            id='goals.E001',
+        )
+    ]
@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Iterable
+
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from goals.membership import get_board_ids, get_board_roles
+from goals.models import BoardVersion
+from todolist.metrics import serializer_timer
+
+Validators = tuple[str, datetime | None]
+
+
+def get_board_validators(request: Request, board_ids: Iterable[int]) -> Validators:
+    """
+    ETag from the versions of the boards and the user's roles on them, so adding, removing or re-roling
+    the user changes it too. There is no Last-Modified: after the user leaves a board the newest change
+    of the remaining boards can be older than the response the client holds, If-Modified-Since would
+    answer 304. Clients revalidate with the weak ETag only.
+    """
+    board_ids = sorted(board_ids)
+    roles = get_board_roles(request)
+    versions = dict(BoardVersion.objects.filter(board_id__in=board_ids).values_list('board_id', 'version'))
+    etag = make_etag(
+        request.get_full_path(),
+        *((board_id, roles.get(board_id), versions.get(board_id)) for board_id in board_ids),
+    )
+    return etag, None
+
+
+def get_object_validators(request: Request, instance: Any, board_id: int) -> Validators:
+    """
+    Validators of a detail response from the object's ``updated`` and its board's version. The response
+    embeds related rows and user profiles that change without touching the object, their writes bump the
+    board version (migrations 0012 and 0014). Last-Modified is the later of both times.
+    """
+    board_version = BoardVersion.objects.filter(board_id=board_id).values_list('version', 'updated').first()
+    version, board_updated = board_version or (None, None)
+    etag = make_etag(request.get_full_path(), instance.updated.isoformat(), board_id, version)
+    return etag, max(instance.updated, board_updated) if board_updated else instance.updated
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get_not_modified_response(request: Request, etag: str, last_modified: datetime | None) -> HttpResponseBase | None:
+    response = set_validators(HttpResponse(), etag, last_modified)
+    conditional_response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+        response=response,
+    )
+    if conditional_response is response:
+        return None
+    return conditional_response
+
+
+def set_validators(response: HttpResponseBase, etag: str, last_modified: datetime | None) -> HttpResponseBase:
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Without no-cache browsers would apply heuristic freshness to Last-Modified and skip polls entirely
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Answers If-None-Match on list endpoints with 304 before filtering and serialization.
+    The ETag comes from the versions of the boards the user participates in and the user's roles on them.
+    """
+
+    validators: Validators | None = None
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        not_modified = self.get_not_modified_response(request)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(super().list(request, *args, **kwargs), *self.validators)
+
+    def get_not_modified_response(self, request: Request) -> HttpResponseBase | None:
+        self.validators = get_board_validators(request, get_board_ids(request))
+        return get_not_modified_response(request, *self.validators)
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answers If-None-Match/If-Modified-Since on detail endpoints with 304 before serialization.
+    """
+
+    def get_validators(self, instance: Any) -> Validators:
+        return get_object_validators(self.request, instance, instance.board_id)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        instance = self.get_object()
+        etag, last_modified = self.get_validators(instance)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        with serializer_timer():
+            data = self.get_serializer(instance).data
+        return set_validators(Response(data), etag, last_modified)
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from typing import Iterator
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from goals.lean import (
+    LeanSerializer,
+    goal_category_lean_serializer,
+    goal_comment_lean_serializer,
+    goal_lean_serializer,
+)
+from goals.models import Board, Goal, GoalCategory, GoalComment
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+CONTENT_TYPES = {NDJSON: 'application/x-ndjson', CSV: 'text/csv; charset=utf-8'}
+ENTITIES = ('categories', 'goals', 'comments')
+
+CHUNK_SIZE = 2000
+
+
+def get_entities(board: Board) -> dict[str, tuple[QuerySet, LeanSerializer]]:
+    # Same rows as the list views show for the board
+    return {
+        'categories': (
+            GoalCategory.objects.filter(board=board, is_deleted=False).order_by('id'),
+            goal_category_lean_serializer,
+        ),
+        'goals': (
+            Goal.objects.filter(board=board, category__is_deleted=False)
+            .exclude(status=Goal.Status.archived)
+            .order_by('id'),
+            goal_lean_serializer,
+        ),
+        'comments': (
+            GoalComment.objects.filter(board=board, goal__category__is_deleted=False)
+            .exclude(goal__status=Goal.Status.archived)
+            .order_by('id'),
+            goal_comment_lean_serializer,
+        ),
+    }
+
+
+def iter_export(board: Board, export_type: str, entities: tuple[str, ...] = ENTITIES) -> Iterator[bytes]:
+    """
+    Yields the board's rows as NDJSON (one object per line with a ``type`` key) or as
+    CSV, which holds a single entity per export. Rows are read with server-side
+    cursors inside one read-only REPEATABLE READ transaction, so memory stays flat
+    and the export is a consistent snapshot of the board.
+    """
+    if export_type == CSV and len(entities) != 1:
+        raise ValueError('CSV export takes exactly one entity')
+
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+        for entity, (queryset, serializer) in get_entities(board).items():
+            if entity not in entities:
+                continue
+            rows = serializer.iter_representation(serializer.values(queryset).iterator(CHUNK_SIZE), queryset)
+            if export_type == CSV:
+                yield from iter_csv(rows, serializer, queryset)
+            else:
+                yield from iter_ndjson(rows, entity)
+
+
+def iter_ndjson(items: Iterator[dict], entity: str) -> Iterator[bytes]:
+    lines = []
+    for item in items:
+        lines.append(json.dumps({'type': entity, **item}, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) == CHUNK_SIZE:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def iter_csv(items: Iterator[dict], serializer: LeanSerializer, queryset: QuerySet) -> Iterator[bytes]:
+    # Nested objects are flattened: user -> user_id, user_username, ...
+    columns = []
+    for name, _ in serializer.get_fields(queryset):
+        if name in serializer.nested:
+            columns.extend((name, related) for related in serializer.nested[name])
+        else:
+            columns.append((name, None))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([f'{name}_{related}' if related else name for name, related in columns])
+    for count, item in enumerate(items, 1):
+        writer.writerow([item[name][related] if related else item[name] for name, related in columns])
+        if count % CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
@@ -1,6 +1,11 @@
 import django_filters
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
 from django.db import models
+from django.db.models import F, QuerySet, Value
+from django.db.models.functions import Replace
 from django_filters import rest_framework
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.request import Request
 
 from goals.models import Goal
 
@@ -19,3 +24,39 @@ class GoalDateFilter(rest_framework.FilterSet):
         models.DateTimeField: {'filter_class': django_filters.IsoDateTimeFilter},
         models.DateField: {'filter_class': django_filters.IsoDateTimeFilter},
     }
+
+
+# Escaped like django.utils.html.escape, '&' first
+HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
+
+
+def escape_html(field: str) -> Replace:
+    expression = F(field)
+    for char, entity in HTML_ESCAPES:
+        expression = Replace(expression, Value(char), Value(entity))
+    return expression
+
+
+class GoalFullTextSearchFilter(BaseFilterBackend):
+    """
+    ``?q=`` full-text search. ``headline`` and ``snippet`` are safe HTML: the title and
+    description are escaped and the matches wrapped in ``<b>``.
+    """
+
+    search_param = 'q'
+    search_config = 'russian'
+
+    def filter_queryset(self, request: Request, queryset: QuerySet[Goal], view) -> QuerySet[Goal]:
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+
+        query = SearchQuery(term, config=self.search_config, search_type='websearch')
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            headline=SearchHeadline(escape_html('title'), query, config=self.search_config, highlight_all=True),
+            snippet=SearchHeadline(escape_html('description'), query, config=self.search_config, max_fragments=2),
+        )
+        if OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by('-rank', '-id')
+        return queryset
@@ -0,0 +1,363 @@
+import codecs
+import csv
+import json
+from collections import defaultdict
+from typing import Any, Iterable, Iterator
+
+from django.db import DatabaseError, connection, transaction
+from rest_framework import serializers
+
+from core.models import User
+from goals.membership import WRITE_ROLES, get_user_board_roles, invalidate_board_roles
+from goals.models import Board, BoardParticipant, Goal, GoalCategory
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+TYPES = (NDJSON, CSV)
+
+# Parents come first, a record may reference rows of the previous entity imported earlier in the same file
+ENTITIES = ('boards', 'categories', 'goals', 'comments')
+PARENTS = {'categories': ('boards', 'board'), 'goals': ('categories', 'category'), 'comments': ('goals', 'goal')}
+
+CHUNK_SIZE = 5000
+MAX_CHUNK_ERRORS = 100
+
+
+class ImportBoardSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    title = serializers.CharField(max_length=255)
+
+
+class ImportCategorySerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    board = serializers.CharField()
+    title = serializers.CharField(max_length=255)
+
+
+class ImportGoalSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    category = serializers.CharField()
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Goal.Status.choices, default=Goal.Status.to_do)
+    priority = serializers.ChoiceField(choices=Goal.Priority.choices, default=Goal.Priority.medium)
+
+
+class ImportCommentSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    goal = serializers.CharField()
+    text = serializers.CharField()
+
+
+SERIALIZERS = {
+    'boards': ImportBoardSerializer,
+    'categories': ImportCategorySerializer,
+    'goals': ImportGoalSerializer,
+    'comments': ImportCommentSerializer,
+}
+
+# Columns copied into the staging table and the INSERT ... SELECT that merges it into the model table
+STAGING = {
+    'boards': (
+        'goals_board',
+        'id bigint, title text',
+        '''
+        INSERT INTO goals_board (id, created, updated, title, is_deleted)
+        SELECT id, now(), now(), title, false FROM import_boards;
+        INSERT INTO goals_boardparticipant (created, updated, board_id, user_id, role)
+        SELECT now(), now(), id, %(user_id)s, %(owner)s FROM import_boards
+        ''',
+    ),
+    'categories': (
+        'goals_goalcategory',
+        'id bigint, board_id bigint, title text',
+        '''
+        INSERT INTO goals_goalcategory (id, created, updated, title, board_id, user_id, is_deleted)
+        SELECT id, now(), now(), title, board_id, %(user_id)s, false FROM import_categories
+        ''',
+    ),
+    'goals': (
+        'goals_goal',
+        'id bigint, board_id bigint, category_id bigint, title text, description text, due_date date, '
+        'status smallint, priority smallint',
+        '''
+        INSERT INTO goals_goal (
+            id, created, updated, user_id, title, description, due_date, status, priority, category_id, board_id
+        )
+        SELECT id, now(), now(), %(user_id)s, title, description, due_date, status, priority, category_id, board_id
+        FROM import_goals
+        ''',
+    ),
+    'comments': (
+        'goals_goalcomment',
+        'id bigint, board_id bigint, goal_id bigint, text text',
+        '''
+        INSERT INTO goals_goalcomment (id, created, updated, text, goal_id, user_id, board_id)
+        SELECT id, now(), now(), text, goal_id, %(user_id)s, board_id FROM import_comments
+        ''',
+    ),
+}
+
+
+def read_records(lines: Iterable[bytes], import_type: str, entity: str | None = None) -> Iterator[tuple[int, Any]]:
+    """
+    Yields ``(line number, record)``. NDJSON records carry their entity in ``type``
+    like the export does, CSV files hold a single ``entity``. Unparseable lines are
+    yielded as a ``ValueError``.
+    """
+    text = codecs.iterdecode(lines, 'utf-8')
+    if import_type == CSV:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # CSV has no null, empty cells are treated as missing
+            yield reader.line_num, {'type': entity, **{key: value for key, value in row.items() if value != ''}}
+        return
+
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, ValueError(f'Invalid JSON: {exc}')
+            continue
+        yield number, record if isinstance(record, dict) else ValueError('Expected a JSON object')
+
+
+class Importer:
+    """
+    Loads boards, categories, goals and comments for ``user`` in chunks.
+
+    Each chunk is validated with the import serializers, references to parents are
+    resolved against rows imported earlier (by their ``id`` in the file) or against
+    existing rows the user may write to, ids are allocated from the sequences in one
+    query, and every entity is COPYed into a temporary staging table and merged with
+    a single INSERT ... SELECT. A chunk is one transaction: it is either imported
+    without its invalid records or not at all.
+    """
+
+    def __init__(self, user: User, chunk_size: int = CHUNK_SIZE) -> None:
+        self.user = user
+        self.chunk_size = chunk_size
+        self.roles = get_user_board_roles(user.id)
+        # entity -> {id in the file: (id, board_id)}
+        self.imported: dict[str, dict[str, tuple[int, int]]] = {entity: {} for entity in ENTITIES}
+
+    def run(self, records: Iterable[tuple[int, Any]]) -> Iterator[dict]:
+        chunk = []
+        number = 0
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == self.chunk_size:
+                number += 1
+                yield self.import_chunk(number, chunk)
+                chunk = []
+        if chunk:
+            yield self.import_chunk(number + 1, chunk)
+
+    def import_chunk(self, number: int, records: list[tuple[int, Any]]) -> dict:
+        report = {
+            'chunk': number,
+            'first_line': records[0][0],
+            'last_line': records[-1][0],
+            'imported': dict.fromkeys(ENTITIES, 0),
+            'error_count': 0,
+            'errors': [],
+        }
+
+        def error(line: int, detail: Any) -> None:
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_CHUNK_ERRORS:
+                report['errors'].append({'line': line, 'errors': detail})
+
+        by_entity = defaultdict(list)
+        for line, record in records:
+            if isinstance(record, Exception):
+                error(line, [str(record)])
+            elif record.get('type') not in ENTITIES:
+                error(line, {'type': [f'Must be one of: {", ".join(ENTITIES)}']})
+            else:
+                by_entity[record['type']].append((line, record))
+
+        pending = {entity: {} for entity in ENTITIES}
+        rows = {}
+        for entity in ENTITIES:
+            if by_entity[entity]:
+                rows[entity] = self.prepare(entity, by_entity[entity], pending, error)
+
+        try:
+            with transaction.atomic():
+                self.load(rows)
+        except DatabaseError as exc:
+            error(report['first_line'], [f'Chunk not imported: {exc}'.strip()])
+            return report
+
+        for entity in ENTITIES:
+            self.imported[entity].update(pending[entity])
+            report['imported'][entity] = len(rows.get(entity, ()))
+        report['errors'].sort(key=lambda item: item['line'])
+        return report
+
+    def prepare(self, entity: str, records: list[tuple[int, dict]], pending: dict, error) -> list[tuple]:
+        # One serializer per chunk like ListSerializer does, instantiating one per record dominates the cost
+        serializer = SERIALIZERS[entity]()
+        validated, seen = [], set()
+        for line, record in records:
+            try:
+                data = serializer.run_validation(record)
+            except serializers.ValidationError as exc:
+                error(line, exc.detail)
+                continue
+            if data.get('id'):
+                if data['id'] in self.imported[entity] or data['id'] in seen:
+                    error(line, {'id': ['Duplicate id']})
+                    continue
+                seen.add(data['id'])
+            validated.append((line, data))
+
+        parents = self.resolve_parents(entity, [data for _, data in validated], pending)
+        resolved = []
+        for line, data in validated:
+            if entity == 'boards':
+                resolved.append((data, None))
+                continue
+            parent_field = PARENTS[entity][1]
+            parent = parents.get(data[parent_field])
+            if parent is None:
+                error(line, {parent_field: ['Not found or not writable']})
+                continue
+            resolved.append((data, parent))
+
+        ids = self.allocate_ids(STAGING[entity][0], len(resolved))
+        rows = []
+        for pk, (data, parent) in zip(ids, resolved):
+            board_id = pk if entity == 'boards' else parent[1]
+            if data.get('id'):
+                pending[entity][data['id']] = (pk, board_id)
+            rows.append(self.make_row(entity, pk, board_id, parent, data))
+        return rows
+
+    def resolve_parents(self, entity: str, items: list[dict], pending: dict) -> dict[str, tuple[int, int]]:
+        if entity == 'boards':
+            return {}
+
+        parent_entity, parent_field = PARENTS[entity]
+        parents, existing = {}, set()
+        for data in items:
+            ref = data[parent_field]
+            known = self.imported[parent_entity].get(ref) or pending[parent_entity].get(ref)
+            if known:
+                parents[ref] = known
+            elif ref.isdigit():
+                existing.add(int(ref))
+        if not existing:
+            return parents
+
+        # Existing rows follow the same visibility and write rules as the create endpoints
+        if parent_entity == 'boards':
+            found = Board.objects.filter(id__in=existing, is_deleted=False).values_list('id', 'id')
+        elif parent_entity == 'categories':
+            found = GoalCategory.objects.filter(id__in=existing, is_deleted=False).values_list('id', 'board_id')
+        else:
+            found = (
+                Goal.objects.filter(id__in=existing, category__is_deleted=False)
+                .exclude(status=Goal.Status.archived)
+                .values_list('id', 'board_id')
+            )
+        for pk, board_id in found:
+            if self.roles.get(board_id) in WRITE_ROLES:
+                parents[str(pk)] = (pk, board_id)
+        return parents
+
+    @staticmethod
+    def allocate_ids(table: str, count: int) -> list[int]:
+        if not count:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", [table, count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def make_row(entity: str, pk: int, board_id: int, parent: tuple[int, int] | None, data: dict) -> tuple:
+        if entity == 'boards':
+            return pk, data['title']
+        if entity == 'categories':
+            return pk, board_id, data['title']
+        if entity == 'goals':
+            return (
+                pk,
+                board_id,
+                parent[0],
+                data['title'],
+                data.get('description'),
+                data.get('due_date'),
+                data['status'],
+                data['priority'],
+            )
+        return pk, board_id, parent[0], data['text']
+
+    def load(self, rows: dict[str, list[tuple]]) -> None:
+        params = {'user_id': self.user.id, 'owner': BoardParticipant.Role.owner}
+        with connection.cursor() as cursor:
+            for entity, entity_rows in rows.items():
+                if not entity_rows:
+                    continue
+                _, columns, merge_sql = STAGING[entity]
+                cursor.execute(f'CREATE TEMPORARY TABLE import_{entity} ({columns}) ON COMMIT DROP')
+                cursor.copy_expert(f'COPY import_{entity} FROM STDIN WITH (FORMAT csv)', CopyBuffer(entity_rows))
+                cursor.execute(merge_sql, params)
+                # ON COMMIT DROP does not fire when the chunk runs in a savepoint of an outer transaction
+                cursor.execute(f'DROP TABLE import_{entity}')
+
+        if rows.get('boards'):
+            invalidate_board_roles(self.user.id)
+
+
+def summarize(reports: Iterable[dict]) -> Iterator[dict]:
+    """Passes chunk reports through and appends a ``summary`` record with the totals."""
+    imported, errors = dict.fromkeys(ENTITIES, 0), 0
+    for report in reports:
+        for entity, count in report['imported'].items():
+            imported[entity] += count
+        errors += report['error_count']
+        yield report
+    yield {'summary': {'imported': imported, 'error_count': errors}}
+
+
+class CopyBuffer:
+    """
+    File-like object that renders rows as COPY CSV on demand. ``None`` becomes an
+    unquoted empty field (NULL), strings are always quoted so an empty string stays
+    an empty string.
+    """
+
+    def __init__(self, rows: list[tuple]) -> None:
+        self.lines = (self.format_row(row) for row in rows)
+        self.buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            data, self.buffer = self.buffer, ''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    @staticmethod
+    def format_row(row: tuple) -> str:
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append('')
+            elif isinstance(value, int):
+                fields.append(str(value))
+            else:
+                fields.append('"' + str(value).replace('"', '""') + '"')
+        return ','.join(fields) + '\n'
@@ -0,0 +1,171 @@
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Iterator
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from goals.renderers import FastJSONRenderer
+from todolist.metrics import serializer_timer
+
+Mapper = Callable[[Any], Any] | None
+
+PROFILE_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email')
+
+
+def datetime_to_representation(value: datetime) -> str:
+    # Same output as serializers.DateTimeField with the default ISO 8601 format
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def date_to_representation(value: date) -> str:
+    return value.isoformat()
+
+
+class LeanSerializer:
+    """
+    Read-only counterpart of a model serializer that works on ``.values()`` rows.
+
+    ``fields`` lists ``(name, mapper)`` pairs in the order the model serializer
+    outputs them, ``None`` values are passed through like DRF does. ``optional``
+    fields are only output when the queryset has a matching annotation, like the
+    read-only search fields of ``GoalSerializer``. ``nested`` maps a field to the
+    related model fields it is rendered with (``ProfileSerializer`` for ``user``).
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[tuple[str, Mapper]],
+        optional: Iterable[str] = (),
+        nested: dict[str, tuple[str, ...]] | None = None,
+        sources: dict[str, str] | None = None,
+    ) -> None:
+        self.fields = tuple(fields)
+        self.optional = frozenset(optional)
+        self.nested = nested or {}
+        self.sources = sources or {}
+
+    def get_fields(self, queryset: QuerySet) -> list[tuple[str, Mapper]]:
+        annotations = queryset.query.annotations
+        return [(name, mapper) for name, mapper in self.fields if name not in self.optional or name in annotations]
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        lookups = []
+        for name, _ in self.get_fields(queryset):
+            if name in self.nested:
+                lookups.extend(f'{name}__{related}' for related in self.nested[name])
+            else:
+                lookups.append(self.sources.get(name, name))
+        return queryset.values(*lookups)
+
+    def to_representation(self, rows: Iterable[dict], queryset: QuerySet) -> list[dict]:
+        with serializer_timer():
+            return list(self.iter_representation(rows, queryset))
+
+    def iter_representation(self, rows: Iterable[dict], queryset: QuerySet) -> Iterator[dict]:
+        fields = []
+        for name, mapper in self.get_fields(queryset):
+            if name in self.nested:
+                fields.append((name, tuple((related, f'{name}__{related}') for related in self.nested[name]), None))
+            else:
+                fields.append((name, self.sources.get(name, name), mapper))
+
+        for row in rows:
+            item = {}
+            for name, source, mapper in fields:
+                if type(source) is tuple:
+                    item[name] = {related: row[lookup] for related, lookup in source}
+                    continue
+                value = row[source]
+                item[name] = value if mapper is None or value is None else mapper(value)
+            yield item
+
+    def has_floats(self, queryset: QuerySet) -> bool:
+        return any(mapper is float for _, mapper in self.get_fields(queryset))
+
+
+board_lean_serializer = LeanSerializer(
+    fields=(
+        ('id', None),
+        ('created', datetime_to_representation),
+        ('updated', datetime_to_representation),
+        ('title', None),
+        ('is_deleted', None),
+    )
+)
+
+goal_lean_serializer = LeanSerializer(
+    fields=(
+        ('id', None),
+        ('user', None),
+        ('rank', float),
+        ('headline', None),
+        ('snippet', None),
+        ('created', datetime_to_representation),
+        ('updated', datetime_to_representation),
+        ('title', None),
+        ('description', None),
+        ('due_date', date_to_representation),
+        ('status', None),
+        ('priority', None),
+        ('category', None),
+    ),
+    optional=('rank', 'headline', 'snippet'),
+    nested={'user': PROFILE_FIELDS},
+    sources={'category': 'category_id'},
+)
+
+goal_comment_lean_serializer = LeanSerializer(
+    fields=(
+        ('id', None),
+        ('user', None),
+        ('goal', None),
+        ('created', datetime_to_representation),
+        ('updated', datetime_to_representation),
+        ('text', None),
+    ),
+    nested={'user': PROFILE_FIELDS},
+    sources={'goal': 'goal_id'},
+)
+
+goal_category_lean_serializer = LeanSerializer(
+    fields=(
+        ('id', None),
+        ('user', None),
+        ('created', datetime_to_representation),
+        ('updated', datetime_to_representation),
+        ('title', None),
+        ('is_deleted', None),
+        ('board', None),
+    ),
+    nested={'user': PROFILE_FIELDS},
+    sources={'board': 'board_id'},
+)
+
+
+class LeanListMixin:
+    """
+    Serves list endpoints from ``.values()`` rows through ``lean_serializer``
+    instead of instantiating models and running the DRF serializer. The output is
+    the same as ``serializer_class`` produces for these rows.
+    """
+
+    lean_serializer: LeanSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # Set per request, read by FastJSONRenderer
+    json_has_floats = False
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        queryset = self.filter_queryset(self.get_queryset())
+        self.json_has_floats = self.lean_serializer.has_floats(queryset)
+        rows = self.lean_serializer.values(queryset)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.lean_serializer.to_representation(page, queryset))
+        return Response(self.lean_serializer.to_representation(rows, queryset))
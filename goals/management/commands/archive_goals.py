@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from goals.tasks import process_archive_chunk
+
+
+class Command(BaseCommand):
+    help = 'Archives goals of deleted boards and categories in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when there is nothing to do')
+        parser.add_argument('--once', action='store_true', help='Exit when there are no unfinished tasks')
+
+    def handle(self, *args, **options):
+        while True:
+            task = process_archive_chunk(options['chunk_size'])
+            if task is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+            elif task.status == task.Status.done:
+                self.stdout.write(f'Archive task {task.id} done: {task.processed} goals archived')
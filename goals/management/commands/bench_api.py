@@ -0,0 +1,487 @@
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import requests
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count, Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import User
+from goals.models import ArchiveTask, Board, BoardParticipant, Goal, GoalCategory, GoalComment, GoalCounter
+
+PASSWORD = 'bench-Password-1'
+CSRF_TOKEN = 'b' * 32
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    url: str
+    # Builds the request body from the request number, writes need unique titles and usernames
+    body: Callable[[int], Any] | None = None
+    # Sent by the scratch account instead of the user whose data is read
+    account: bool = False
+    anonymous: bool = False
+    multipart: bool = False
+    # The request logs the session out, each one gets a new session and they run one at a time
+    fresh_session: bool = False
+
+
+@dataclass
+class Fixtures:
+    user: User
+    account: User
+    board: Board
+    category: GoalCategory
+    goal: Goal
+    comment: GoalComment
+    scratch_board: Board
+    scratch_category: GoalCategory
+    scratch_goal: Goal
+    scratch_comment: GoalComment
+    archive_task: ArchiveTask
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs every endpoint of goals/urls.py and core/urls.py through the test client or against a running '
+        'server (--url) and reports throughput, p50/p95/p99 latency and SQL queries per request. Reads use the '
+        'data of --user, writes go to a scratch account created for the run. Seed data with seed_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose data is read (default: the user with most boards)')
+        parser.add_argument(
+            '--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000 (default: in-process)'
+        )
+        parser.add_argument('--concurrency', type=int, default=1, help='Clients sending requests with --url')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--scenarios', nargs='+', help='Run only these scenarios, see --list')
+        parser.add_argument('--list', action='store_true', help='Print the scenario names and exit')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+        parser.add_argument(
+            '--threshold', type=float, default=20, help='Percent of p95 growth reported as a regression with --compare'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for scenario in self.get_scenarios(None):
+                self.stdout.write(f'{scenario.name:<24} {scenario.method} {scenario.url}')
+            return
+
+        fixtures = self.create_fixtures(self.get_user(options['user']))
+        scenarios = self.get_scenarios(fixtures)
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['scenarios']]
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = result = self.run_scenario(scenario, fixtures, options)
+            self.report(scenario.name, result)
+
+        run = {
+            'meta': {
+                'commit': self.get_commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'mode': options['url'] or 'in-process',
+                'concurrency': options['concurrency'] if options['url'] else 1,
+                'requests': options['requests'],
+                'user': fixtures.user.username,
+                'python': platform.python_version(),
+                'dataset': self.get_dataset(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(run, file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), run, options['threshold'])
+
+    def get_scenarios(self, fixtures: Fixtures | None) -> list[Scenario]:
+        # With --list there are no fixtures, the URLs are built with placeholder ids
+        f = fixtures or Fixtures(*([None] * len(Fixtures.__dataclass_fields__)))
+
+        def pk(obj: Any) -> int:
+            return obj.pk if obj is not None else 0
+
+        def unique(prefix: str) -> Callable[[int], str]:
+            run = uuid.uuid4().hex[:8]
+            return lambda number: f'{prefix} {run}-{number}'
+
+        title = unique('Bench')
+        username = unique('bench-api')
+        return [
+            # core
+            Scenario(
+                'signup',
+                'post',
+                reverse('core:signup'),
+                lambda n: {
+                    'username': username(n).replace(' ', '-'),
+                    'password': PASSWORD,
+                    'password_repeat': PASSWORD,
+                },
+                anonymous=True,
+            ),
+            Scenario(
+                'login',
+                'post',
+                reverse('core:login'),
+                lambda n: {'username': f.account.username, 'password': PASSWORD},
+                anonymous=True,
+            ),
+            Scenario('profile', 'get', reverse('core:profile')),
+            Scenario(
+                'update_password',
+                'put',
+                reverse('core:update_password'),
+                lambda n: {'old_password': PASSWORD, 'new_password': PASSWORD},
+                account=True,
+                fresh_session=True,
+            ),
+            # Reads of the user's largest board
+            Scenario('board-list', 'get', reverse('goals:board-list') + '?limit=100'),
+            Scenario('board', 'get', reverse('goals:board', kwargs={'pk': pk(f.board)})),
+            Scenario('board-stats', 'get', reverse('goals:board-stats', kwargs={'pk': pk(f.board)})),
+            Scenario('board-export', 'get', reverse('goals:board-export', kwargs={'pk': pk(f.board)})),
+            Scenario('category-list', 'get', reverse('goals:category-list') + f'?board={pk(f.board)}&limit=100'),
+            Scenario('category', 'get', reverse('goals:category', kwargs={'pk': pk(f.category)})),
+            Scenario('goal-list', 'get', reverse('goals:goal-list') + '?limit=100'),
+            Scenario('goal-list-search', 'get', reverse('goals:goal-list') + '?limit=100&search=report'),
+            Scenario('goal', 'get', reverse('goals:goal', kwargs={'pk': pk(f.goal)})),
+            Scenario('goal-comment-list', 'get', reverse('goals:goal-comment-list') + f'?goal={pk(f.goal)}&limit=100'),
+            Scenario('goal-comment', 'get', reverse('goals:goal-comment', kwargs={'pk': pk(f.comment)})),
+            Scenario('sync', 'get', reverse('goals:sync') + '?limit=500'),
+            # The scratch account's archive task and writes to its board
+            Scenario(
+                'archive-task',
+                'get',
+                reverse('goals:archive-task', kwargs={'pk': pk(f.archive_task)}),
+                account=True,
+            ),
+            Scenario(
+                'board-create', 'post', reverse('goals:board-create'), lambda n: {'title': title(n)}, account=True
+            ),
+            Scenario(
+                'board-update',
+                'patch',
+                reverse('goals:board', kwargs={'pk': pk(f.scratch_board)}),
+                lambda n: {'title': title(n)},
+                account=True,
+            ),
+            Scenario(
+                'category-create',
+                'post',
+                reverse('goals:category-create'),
+                lambda n: {'board': pk(f.scratch_board), 'title': title(n)},
+                account=True,
+            ),
+            Scenario(
+                'category-update',
+                'patch',
+                reverse('goals:category', kwargs={'pk': pk(f.scratch_category)}),
+                lambda n: {'title': title(n)},
+                account=True,
+            ),
+            Scenario(
+                'goal-create',
+                'post',
+                reverse('goals:goal-create'),
+                lambda n: {'category': pk(f.scratch_category), 'title': title(n)},
+                account=True,
+            ),
+            Scenario(
+                'goal-update',
+                'patch',
+                reverse('goals:goal', kwargs={'pk': pk(f.scratch_goal)}),
+                lambda n: {'title': title(n), 'priority': n % 4 + 1},
+                account=True,
+            ),
+            Scenario(
+                'goal-batch',
+                'post',
+                reverse('goals:goal-batch'),
+                lambda n: {
+                    'operations': [
+                        {'op': 'create', 'category': pk(f.scratch_category), 'title': title(n)},
+                        {'op': 'update', 'id': pk(f.scratch_goal), 'title': title(n)},
+                        {'op': 'status', 'id': pk(f.scratch_goal), 'status': n % 3 + 1},
+                    ]
+                },
+                account=True,
+            ),
+            Scenario(
+                'goal-import',
+                'post',
+                reverse('goals:goal-import'),
+                lambda n: '\n'.join(
+                    json.dumps({'type': 'goals', 'category': str(pk(f.scratch_category)), 'title': f'{title(n)}-{i}'})
+                    for i in range(100)
+                ),
+                account=True,
+                multipart=True,
+            ),
+            Scenario(
+                'goal-comment-create',
+                'post',
+                reverse('goals:goal-comment-create'),
+                lambda n: {'goal': pk(f.scratch_goal), 'text': title(n)},
+                account=True,
+            ),
+            Scenario(
+                'goal-comment-update',
+                'patch',
+                reverse('goals:goal-comment', kwargs={'pk': pk(f.scratch_comment)}),
+                lambda n: {'text': title(n)},
+                account=True,
+            ),
+        ]
+
+    def run_scenario(self, scenario: Scenario, fixtures: Fixtures, options: dict) -> dict:
+        user = None if scenario.anonymous else fixtures.account if scenario.account else fixtures.user
+        send = (
+            self.http_sender(options['url'], scenario, user) if options['url'] else self.client_sender(scenario, user)
+        )
+        concurrency = 1 if scenario.fresh_session or not options['url'] else options['concurrency']
+
+        # The first request is not timed, it counts the SQL queries and warms up the caches
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            _, status = send(0)
+        queries = sum(len(capture) for capture in captures)
+        for number in range(1, options['warmup']):
+            send(number)
+
+        numbers = range(options['warmup'], options['warmup'] + options['requests'])
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                timings = list(executor.map(send, numbers))
+        else:
+            timings = [send(number) for number in numbers]
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, _ in timings]
+        percentiles = (
+            statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        )
+        return {
+            'method': scenario.method.upper(),
+            'url': scenario.url,
+            'status': status,
+            'requests': len(timings),
+            'errors': sum(status >= 400 for _, status in timings),
+            'rps': round(len(timings) / elapsed, 2),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+            'p50_ms': round(percentiles[49] * 1000, 3),
+            'p95_ms': round(percentiles[94] * 1000, 3),
+            'p99_ms': round(percentiles[98] * 1000, 3),
+            # In-process only, the queries of a server are not visible to the command
+            'queries': None if options['url'] else queries,
+        }
+
+    def client_sender(self, scenario: Scenario, user: User | None) -> Callable[[int], tuple[float, int]]:
+        client = Client()
+        if user is not None:
+            self.login(client, user)
+
+        def send(number: int) -> tuple[float, int]:
+            if user is None:
+                client.cookies.clear()
+            elif scenario.fresh_session:
+                self.login(client, user)
+            if scenario.multipart:
+                args, kwargs = ({'file': SimpleUploadedFile('goals.ndjson', scenario.body(number).encode())},), {}
+            elif scenario.body is not None:
+                args, kwargs = (json.dumps(scenario.body(number)),), {'content_type': 'application/json'}
+            else:
+                args, kwargs = (), {}
+
+            started = time.perf_counter()
+            response = getattr(client, scenario.method)(scenario.url, *args, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return time.perf_counter() - started, response.status_code
+
+        return send
+
+    def http_sender(self, base_url: str, scenario: Scenario, user: User | None) -> Callable[[int], tuple[float, int]]:
+        local = threading.local()
+        url = base_url.rstrip('/') + scenario.url
+
+        def login(session: requests.Session) -> None:
+            client = Client()
+            self.login(client, user)
+            session.cookies.set(settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+        def send(number: int) -> tuple[float, int]:
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.headers['X-CSRFToken'] = CSRF_TOKEN
+                if user is not None:
+                    login(local.session)
+            elif user is None:
+                # Every anonymous request starts without the session and CSRF cookie set by login
+                local.session.cookies.clear()
+            elif scenario.fresh_session:
+                login(local.session)
+            # DRF checks the CSRF token of session-authenticated writes, the cookie and header have to match
+            local.session.cookies.set(settings.CSRF_COOKIE_NAME, CSRF_TOKEN)
+            if scenario.multipart:
+                kwargs = {'files': {'file': ('goals.ndjson', scenario.body(number).encode())}}
+            elif scenario.body is not None:
+                kwargs = {'json': scenario.body(number)}
+            else:
+                kwargs = {}
+
+            started = time.perf_counter()
+            response = local.session.request(scenario.method, url, **kwargs)
+            return time.perf_counter() - started, response.status_code
+
+        return send
+
+    @staticmethod
+    def login(client: Client, user: User) -> None:
+        # The session stores a hash of the password, update_password changes it in the database
+        user.refresh_from_db(fields=['password'])
+        client.force_login(user)
+
+    def report(self, name: str, result: dict) -> None:
+        style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+        queries = '-' if result['queries'] is None else result['queries']
+        self.stdout.write(
+            style(
+                f'{name:<22} {result["rps"]:8.1f} req/s  p50 {result["p50_ms"]:8.1f} ms  '
+                f'p95 {result["p95_ms"]:8.1f} ms  p99 {result["p99_ms"]:8.1f} ms  '
+                f'queries {queries:>3}  errors {result["errors"]}'
+            )
+        )
+
+    def compare(self, baseline: dict, run: dict, threshold: float) -> None:
+        self.stdout.write(f'Compared with {baseline["meta"]["commit"]} ({baseline["meta"]["date"]}):')
+        regressions = []
+        for name, result in run['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            more_queries = None not in (result['queries'], before['queries']) and result['queries'] > before['queries']
+            regressed = change > threshold or more_queries or result['errors'] > before['errors']
+            if regressed:
+                regressions.append(name)
+            style = self.style.ERROR if regressed else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f'{name:<22} p95 {before["p95_ms"]:8.1f} -> {result["p95_ms"]:8.1f} ms ({change:+6.1f}%)  '
+                    f'queries {before["queries"]} -> {result["queries"]}'
+                )
+            )
+        if regressions:
+            raise CommandError(f'Regressions: {", ".join(regressions)}')
+
+    def create_fixtures(self, user: User) -> Fixtures:
+        board = self.get_largest_board(user)
+        category = GoalCategory.objects.filter(board=board, is_deleted=False).first()
+        goal = Goal.objects.filter(board=board).exclude(status=Goal.Status.archived).first()
+        comment = GoalComment.objects.filter(goal=goal).first()
+        if None in (category, goal, comment):
+            raise CommandError(f'Board "{board}" has no categories, goals or comments, seed the database first')
+
+        # Writes go to boards of a new user, so they do not change the data the reads measure
+        account = User.objects.create_user(username=f'bench-api-{uuid.uuid4().hex[:8]}', password=PASSWORD)
+        scratch_board = Board.objects.create(title='Bench scratch board')
+        BoardParticipant.objects.create(board=scratch_board, user=account, role=BoardParticipant.Role.owner)
+        scratch_category = GoalCategory.objects.create(board=scratch_board, user=account, title='Bench category')
+        scratch_goal = Goal.objects.create(category=scratch_category, user=account, title='Bench goal')
+        scratch_comment = GoalComment.objects.create(goal=scratch_goal, user=account, text='Bench comment')
+        archive_task = ArchiveTask.objects.create(
+            user=account, board=scratch_board, status=ArchiveTask.Status.done, total=0
+        )
+        return Fixtures(
+            user,
+            account,
+            board,
+            category,
+            goal,
+            comment,
+            scratch_board,
+            scratch_category,
+            scratch_goal,
+            scratch_comment,
+            archive_task,
+        )
+
+    @staticmethod
+    def get_largest_board(user: User) -> Board:
+        board_ids = BoardParticipant.objects.filter(user=user, board__is_deleted=False).values('board_id')
+        largest = (
+            GoalCounter.objects.filter(board_id__in=board_ids)
+            .values('board_id')
+            .annotate(goals=Sum('count'))
+            .order_by('-goals')
+            .first()
+        )
+        if largest is None:
+            raise CommandError(f'User "{user.username}" has no goals, seed the database first')
+        return Board.objects.get(pk=largest['board_id'])
+
+    @staticmethod
+    def get_dataset() -> dict[str, int]:
+        # Planner estimates, exact counts take seconds on seeded tables
+        models = {'users': User, 'boards': Board, 'goals': Goal, 'comments': GoalComment}
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)',
+                [[model._meta.db_table for model in models.values()]],
+            )
+            estimates = dict(cursor.fetchall())
+        return {name: estimates.get(model._meta.db_table, 0) for name, model in models.items()}
+
+    @staticmethod
+    def get_commit() -> str | None:
+        try:
+            return (
+                subprocess.run(
+                    ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True
+                ).stdout.strip()
+                or None
+            )
+        except OSError:
+            return None
+
+    @staticmethod
+    def get_user(username: str | None) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+
+        user = User.objects.annotate(boards=Count('participants')).order_by('-boards').first()
+        if user is None:
+            raise CommandError('No users found, seed the database first')
+        return user
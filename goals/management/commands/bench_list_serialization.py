@@ -0,0 +1,99 @@
+import statistics
+import time
+from typing import Callable
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import User
+from goals import views
+from goals.renderers import FastJSONRenderer
+
+LEAN_VIEWS = {
+    'goals:goal-list': views.GoalListView,
+    'goals:goal-comment-list': views.GoalCommentListView,
+    'goals:category-list': views.GoalCategoryListView,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compares per-item cost of DRF serializers + JSONRenderer with the lean read path on list views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to run the views as (default: the user with most boards)')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', default='', help='Extra query string passed to the views, e.g. "q=goal"')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        factory = APIRequestFactory()
+
+        for url_name, view_class in LEAN_VIEWS.items():
+            request = factory.get(f'{reverse(url_name)}?{options["query"]}')
+            force_authenticate(request, user)
+            view = view_class()
+            view.setup(request)
+            view.request = view.initialize_request(request)
+            view.format_kwarg = None
+            queryset = view.filter_queryset(view.get_queryset())
+            lean_serializer = view.lean_serializer
+            view.json_has_floats = lean_serializer.has_floats(queryset)
+            renderer_context = {'view': view, 'request': view.request}
+
+            for size in options['sizes']:
+                serializer_phases, expected = self.measure(
+                    lambda: list(queryset[:size]),
+                    lambda objects: JSONRenderer().render(
+                        view.get_serializer(objects, many=True).data, renderer_context=renderer_context
+                    ),
+                    options['repeat'],
+                )
+                lean_phases, content = self.measure(
+                    lambda: list(lean_serializer.values(queryset)[:size]),
+                    lambda rows: FastJSONRenderer().render(
+                        lean_serializer.to_representation(rows, queryset), renderer_context=renderer_context
+                    ),
+                    options['repeat'],
+                )
+                items = content.count(b'"created":')
+                if not items:
+                    self.stdout.write(self.style.WARNING(f'{url_name}: no rows, seed the database first'))
+                    break
+
+                style = self.style.SUCCESS if content == expected else self.style.ERROR
+                self.stdout.write(style(f'{url_name} size={size} items={items} identical={content == expected}'))
+                for name, (fetch, render) in (('serializer', serializer_phases), ('lean', lean_phases)):
+                    self.stdout.write(
+                        f'  {name:<10} fetch {fetch / items * 1e6:7.1f} us/item, '
+                        f'serialize+render {render / items * 1e6:7.1f} us/item'
+                    )
+                self.stdout.write(f'  serialize+render speedup x{serializer_phases[1] / lean_phases[1]:.1f}')
+
+    @staticmethod
+    def measure(fetch: Callable[[], list], render: Callable[[list], bytes], repeat: int) -> tuple[tuple, bytes]:
+        fetch_timings, render_timings = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = fetch()
+            fetched = time.perf_counter()
+            content = render(rows)
+            fetch_timings.append(fetched - started)
+            render_timings.append(time.perf_counter() - fetched)
+        return (statistics.median(fetch_timings), statistics.median(render_timings)), content
+
+    @staticmethod
+    def get_user(username: str | None) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+
+        user = User.objects.annotate(boards=Count('participants')).order_by('-boards').first()
+        if user is None:
+            raise CommandError('No users found, seed the database first')
+        return user
@@ -0,0 +1,135 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+
+from core.models import User
+
+DEFAULT_PATHS = ['/goals/goal/list?limit=100', '/goals/board/list?limit=100']
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts gunicorn in WSGI and ASGI mode (todolist/gunicorn.py) and compares requests per second and '
+        'latency percentiles of list endpoints under concurrent clients'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to send the requests as (default: the user with most boards)')
+        parser.add_argument('--modes', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per path and concurrency level')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        client = Client()
+        client.force_login(user)
+        session_cookie = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+
+        try:
+            for mode in options['modes']:
+                with self.server(mode, options['port'], options['workers']) as base_url:
+                    for path in options['paths']:
+                        for concurrency in options['concurrency']:
+                            self.report(
+                                mode,
+                                path,
+                                concurrency,
+                                *self.run_load(base_url + path, session_cookie, concurrency, options['requests']),
+                            )
+        finally:
+            client.logout()
+
+    def run_load(self, url: str, cookies: dict, concurrency: int, total: int) -> tuple[float, list[float], int]:
+        local = threading.local()
+        # Warm up connections and caches so every mode starts from the same state
+        with requests.Session() as session:
+            for _ in range(5):
+                session.get(url, cookies=cookies)
+
+        def fetch(_: int) -> tuple[float, bool]:
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.cookies.update(cookies)
+            started = time.perf_counter()
+            response = local.session.get(url)
+            return time.perf_counter() - started, response.status_code == 200
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+        return total / elapsed, [latency for latency, _ in results], sum(not ok for _, ok in results)
+
+    def report(self, mode: str, path: str, concurrency: int, rps: float, latencies: list[float], errors: int) -> None:
+        percentiles = statistics.quantiles(latencies, n=100)
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(
+            style(
+                f'{mode} {path} c={concurrency}: {rps:8.1f} req/s, '
+                f'p50 {percentiles[49] * 1000:7.1f} ms, p99 {percentiles[98] * 1000:7.1f} ms, {errors} errors'
+            )
+        )
+
+    @contextmanager
+    def server(self, mode: str, port: int, workers: int) -> Iterator[str]:
+        env = {
+            **os.environ,
+            'SERVER_MODE': mode,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(workers),
+        }
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'python:todolist.gunicorn'],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_port(port, process)
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    @staticmethod
+    def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'gunicorn did not start listening on port {port}')
+
+    @staticmethod
+    def get_user(username: str | None) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+
+        user = User.objects.annotate(boards=Count('participants')).order_by('-boards').first()
+        if user is None:
+            raise CommandError('No users found, seed the database first')
+        return user
@@ -0,0 +1,74 @@
+import json
+from urllib.parse import parse_qsl
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import User
+from goals import views
+
+LIST_VIEWS = {
+    'goals:board-list': views.BoardListView,
+    'goals:category-list': views.GoalCategoryListView,
+    'goals:goal-list': views.GoalListView,
+    'goals:goal-comment-list': views.GoalCommentListView,
+}
+
+INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the SQL generated by every list view and reports whether it uses indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to run the views as (default: the user with most boards)')
+        parser.add_argument('--query', default='', help='Extra query string, e.g. "ordering=-created&status=1"')
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (executes the queries)')
+        parser.add_argument('--verbose-plan', action='store_true', help='Print the full plan of every view')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        factory = APIRequestFactory()
+        params = {'limit': options['limit'], **dict(parse_qsl(options['query']))}
+
+        for url_name, view_class in LIST_VIEWS.items():
+            request = factory.get(reverse(url_name), params)
+            force_authenticate(request, user)
+            view = view_class()
+            view.setup(request)
+            view.request = view.initialize_request(request)
+            view.format_kwarg = None
+
+            queryset = view.filter_queryset(view.get_queryset())[: options['limit']]
+            plan = json.loads(queryset.explain(format='json', analyze=options['analyze']))[0]['Plan']
+            nodes = list(self.walk(plan))
+
+            index_scans = sorted({node['Index Name'] for node in nodes if node['Node Type'] in INDEX_NODES})
+            seq_scans = sorted({node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'})
+            style = self.style.SUCCESS if index_scans and not seq_scans else self.style.WARNING
+            self.stdout.write(style(f'{url_name}: cost={plan["Total Cost"]}'))
+            self.stdout.write(f'  indexes:   {", ".join(index_scans) or "-"}')
+            self.stdout.write(f'  seq scans: {", ".join(seq_scans) or "-"}')
+            if options['verbose_plan']:
+                self.stdout.write(queryset.explain(analyze=options['analyze']))
+
+    @staticmethod
+    def get_user(username: str | None) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+
+        user = User.objects.annotate(boards=Count('participants')).order_by('-boards').first()
+        if user is None:
+            raise CommandError('No users found, seed the database first')
+        return user
+
+    def walk(self, node: dict):
+        yield node
+        for child in node.get('Plans', []):
+            yield from self.walk(child)
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from goals.export import CONTENT_TYPES, CSV, ENTITIES, NDJSON, iter_export
+from goals.models import Board
+
+
+class Command(BaseCommand):
+    help = "Streams a board's categories, goals and comments as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('--type', choices=list(CONTENT_TYPES), default=NDJSON)
+        parser.add_argument('--entity', choices=ENTITIES, help='Export only one entity (CSV defaults to goals)')
+        parser.add_argument('--output', help='File to write to (default: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(id=options['board_id'], is_deleted=False)
+        except Board.DoesNotExist:
+            raise CommandError(f'Board {options["board_id"]} does not exist')
+
+        entity = options['entity'] or ('goals' if options['type'] == CSV else None)
+        chunks = iter_export(board, options['type'], (entity,) if entity else ENTITIES)
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.buffer.writelines(chunks)
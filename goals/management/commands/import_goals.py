@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+from goals import importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk imports boards, categories, goals and comments from NDJSON or CSV, see goals.importer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, "-" for stdin')
+        parser.add_argument('--user', required=True, help='Username the rows are imported for')
+        parser.add_argument('--type', choices=importer.TYPES, default=importer.NDJSON)
+        parser.add_argument('--entity', choices=importer.ENTITIES, help='Entity of a CSV file')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+        if options['type'] == importer.CSV and not options['entity']:
+            raise CommandError('--entity is required for CSV')
+
+        source = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        with source:
+            records = importer.read_records(source, options['type'], options['entity'])
+            for report in importer.summarize(importer.Importer(user, options['chunk_size']).run(records)):
+                if 'summary' in report:
+                    self.stdout.write(self.style.SUCCESS(json.dumps(report['summary'])))
+                    continue
+                style = self.style.WARNING if report['error_count'] else self.style.SUCCESS
+                self.stdout.write(
+                    style(
+                        f'chunk {report["chunk"]} (lines {report["first_line"]}-{report["last_line"]}): '
+                        f'{json.dumps(report["imported"])}, {report["error_count"]} errors'
+                    )
+                )
+                for error in report['errors']:
+                    self.stdout.write(f'  line {error["line"]}: {json.dumps(error["errors"], ensure_ascii=False)}')
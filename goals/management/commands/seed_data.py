@@ -0,0 +1,159 @@
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import User
+from goals.models import Board, BoardParticipant, Goal, GoalCategory, GoalComment
+
+WORDS = (
+    'report budget release review meeting plan design research deploy refactor invoice contract hiring '
+    'roadmap backlog migration audit training onboarding launch survey'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic users, boards, categories, goals and comments with bulk_create for benchmarks, '
+        'e.g. --users 100000 --boards 50000 --goals 5000000 --comments 20000000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--boards', type=int, default=500)
+        parser.add_argument('--goals', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--max-categories', type=int, default=5, help='Categories per board, 1 to this value')
+        parser.add_argument('--max-members', type=int, default=50, help='Participants per board besides the owner')
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the seeded users')
+        parser.add_argument('--password', default='bench-password', help='Password of every seeded user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same options give the same data')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['boards'] < 1:
+            raise CommandError('--users and --boards must be at least 1')
+        if User.objects.filter(username=f'{options["prefix"]}1').exists():
+            raise CommandError(f'Users "{options["prefix"]}N" already exist, pass another --prefix')
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'], options['prefix'], options['password'])
+        members = self.create_boards(user_ids, options['boards'], options['max_members'])
+        categories = self.create_categories(members, options['max_categories'])
+        self.create_goals_and_comments(members, categories, options['goals'], options['comments'])
+
+        with connection.cursor() as cursor:
+            for model in (User, Board, BoardParticipant, GoalCategory, Goal, GoalComment):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f} s'))
+
+    def create_users(self, count: int, prefix: str, password: str) -> list[int]:
+        # Hashing is the slow part of create_user, every seeded user shares one hash
+        password = make_password(password)
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            users = User.objects.bulk_create(
+                User(username=f'{prefix}{number}', password=password)
+                for number in range(start + 1, min(start + self.batch_size, count) + 1)
+            )
+            user_ids.extend(user.id for user in users)
+        self.stdout.write(f'{len(user_ids)} users')
+        return user_ids
+
+    def create_boards(self, user_ids: list[int], count: int, max_members: int) -> dict[int, list[int]]:
+        """Returns the owner and writers of every board, the first one is the owner."""
+        # A few users own and join most boards, like in real teams
+        user_weights = list(accumulate(self.random.paretovariate(1.5) for _ in user_ids))
+        writers: dict[int, list[int]] = {}
+        participants = 0
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                boards = Board.objects.bulk_create(
+                    Board(title=self.title('Board')) for _ in range(min(self.batch_size, count - start))
+                )
+                rows = []
+                for board in boards:
+                    size = min(int(self.random.paretovariate(1.2)), max_members + 1, len(user_ids))
+                    board_users: dict[int, None] = {}
+                    while len(board_users) < size:
+                        picked = self.random.choices(user_ids, cum_weights=user_weights, k=size - len(board_users))
+                        board_users.update(dict.fromkeys(picked))
+                    owner, *others = board_users
+                    writers[board.id] = [owner]
+                    rows.append(BoardParticipant(board=board, user_id=owner, role=BoardParticipant.Role.owner))
+                    for user_id in others:
+                        role = self.random.choice(BoardParticipant.editable_roles)[0]
+                        rows.append(BoardParticipant(board=board, user_id=user_id, role=role))
+                        if role == BoardParticipant.Role.writer:
+                            writers[board.id].append(user_id)
+                BoardParticipant.objects.bulk_create(rows, batch_size=self.batch_size)
+                participants += len(rows)
+        self.stdout.write(f'{len(writers)} boards, {participants} participants')
+        return writers
+
+    def create_categories(self, writers: dict[int, list[int]], max_categories: int) -> list[GoalCategory]:
+        categories = [
+            GoalCategory(board_id=board_id, user_id=self.random.choice(board_writers), title=self.title('Category'))
+            for board_id, board_writers in writers.items()
+            for _ in range(self.random.randint(1, max_categories))
+        ]
+        categories = GoalCategory.objects.bulk_create(categories, batch_size=self.batch_size)
+        self.stdout.write(f'{len(categories)} categories')
+        return categories
+
+    def create_goals_and_comments(
+        self, writers: dict[int, list[int]], categories: list[GoalCategory], goals: int, comments: int
+    ) -> None:
+        # Goals per board follow a long tail too, comments are spread over the goals of each batch
+        category_weights = list(accumulate(self.random.paretovariate(1.2) for _ in categories))
+        comments_per_goal = comments / goals if goals else 0
+        statuses, priorities = Goal.Status.values, Goal.Priority.values
+        today = date.today()
+        created_goals = created_comments = 0
+
+        for start in range(0, goals, self.batch_size):
+            size = min(self.batch_size, goals - start)
+            with transaction.atomic():
+                batch = Goal.objects.bulk_create(
+                    Goal(
+                        category_id=category.id,
+                        board_id=category.board_id,
+                        user_id=self.random.choice(writers[category.board_id]),
+                        title=self.title('Goal'),
+                        description=self.title('Description') if self.random.random() < 0.5 else None,
+                        due_date=today + timedelta(days=self.random.randint(-90, 180))
+                        if self.random.random() < 0.7
+                        else None,
+                        status=self.random.choices(statuses, weights=(40, 25, 30, 5))[0],
+                        priority=self.random.choice(priorities),
+                    )
+                    for category in self.random.choices(categories, cum_weights=category_weights, k=size)
+                )
+                # The last batch takes the rounding remainder
+                end = comments if start + size >= goals else round((start + size) * comments_per_goal)
+                comment_count = end - created_comments
+                GoalComment.objects.bulk_create(
+                    (
+                        GoalComment(
+                            goal_id=goal.id,
+                            board_id=goal.board_id,
+                            user_id=self.random.choice(writers[goal.board_id]),
+                            text=self.title('Comment'),
+                        )
+                        for goal in self.random.choices(batch, k=comment_count)
+                    ),
+                    batch_size=self.batch_size,
+                )
+            created_goals += len(batch)
+            created_comments += comment_count
+            self.stdout.write(f'{created_goals} goals, {created_comments} comments')
+
+    def title(self, prefix: str) -> str:
+        return f'{prefix} {" ".join(self.random.choices(WORDS, k=self.random.randint(1, 4)))}'
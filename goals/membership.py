@@ -0,0 +1,92 @@
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+
+from goals.models import BoardParticipant
+from todolist.db_router import use_primary
+
+ALL_ROLES = tuple(BoardParticipant.Role)
+WRITE_ROLES = (BoardParticipant.Role.owner, BoardParticipant.Role.writer)
+OWNER_ROLES = (BoardParticipant.Role.owner,)
+
+LOCAL_CACHE_SIZE = 1024
+
+_VERSION_KEY = 'goals:board-roles:version:{user_id}'
+_ROLES_KEY = 'goals:board-roles:{user_id}:{version}'
+
+# user_id -> (version, {board_id: role}); validated against the shared version on every lookup
+_local_cache: 'OrderedDict[int, tuple[str, dict[int, int]]]' = OrderedDict()
+_local_lock = Lock()
+
+
+def get_board_roles(request: Request) -> dict[int, int]:
+    roles = getattr(request, '_board_roles', None)
+    if roles is None:
+        roles = get_user_board_roles(request.user.id)
+        request._board_roles = roles
+    return roles
+
+
+def get_board_ids(request: Request) -> list[int]:
+    return list(get_board_roles(request))
+
+
+def has_board_role(request: Request, board_id: int, roles: Iterable[int] = ALL_ROLES) -> bool:
+    return get_board_roles(request).get(board_id) in roles
+
+
+def get_user_board_roles(user_id: int) -> dict[int, int]:
+    version = _get_version(user_id)
+
+    with _local_lock:
+        entry = _local_cache.get(user_id)
+        if entry is not None and entry[0] == version:
+            _local_cache.move_to_end(user_id)
+            return entry[1]
+
+    key = _ROLES_KEY.format(user_id=user_id, version=version)
+    roles = cache.get(key)
+    if roles is None:
+        # Read from the primary, roles loaded from a lagging replica would be cached under the new version
+        with use_primary():
+            roles = dict(BoardParticipant.objects.filter(user_id=user_id).values_list('board_id', 'role'))
+        cache.set(key, roles)
+
+    with _local_lock:
+        _local_cache[user_id] = (version, roles)
+        _local_cache.move_to_end(user_id)
+        while len(_local_cache) > LOCAL_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+    return roles
+
+
+def invalidate_board_roles(*user_ids: int) -> None:
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def _invalidate() -> None:
+        cache.set_many({_VERSION_KEY.format(user_id=user_id): _new_version() for user_id in user_ids}, timeout=None)
+        with _local_lock:
+            for user_id in user_ids:
+                _local_cache.pop(user_id, None)
+
+    transaction.on_commit(_invalidate)
+
+
+def _get_version(user_id: int) -> str:
+    key = _VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 19:39
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = '''
+CREATE FUNCTION goals_goal_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_search_vector
+BEFORE INSERT OR UPDATE OF title, description, search_vector ON goals_goal
+FOR EACH ROW EXECUTE FUNCTION goals_goal_search_vector_update();
+
+-- Backfill: the trigger recomputes the vector of every updated row
+UPDATE goals_goal SET search_vector = NULL;
+'''
+
+DROP_SEARCH_VECTOR_SQL = '''
+DROP TRIGGER goals_goal_search_vector ON goals_goal;
+DROP FUNCTION goals_goal_search_vector_update();
+'''
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('goals', '0006_alter_goalcategory_board'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Поисковый вектор'
+            ),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name='goal',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='goal_search_vector_idx'),
+        ),
+    ]
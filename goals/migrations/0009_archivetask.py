@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('goals', '0008_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата последнего обновления')),
+                (
+                    'status',
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, 'В очереди'), (2, 'Выполняется'), (3, 'Завершена')],
+                        default=1,
+                        verbose_name='Статус',
+                    ),
+                ),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Всего целей')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано целей')),
+                ('last_goal_id', models.BigIntegerField(default=0, verbose_name='Последняя обработанная цель')),
+                (
+                    'board',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+                (
+                    'category',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.goalcategory',
+                        verbose_name='Категория',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='archive_tasks',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='Автор',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Архивация целей',
+                'verbose_name_plural': 'Архивации целей',
+            },
+        ),
+    ]
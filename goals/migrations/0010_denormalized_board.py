@@ -0,0 +1,278 @@
+# Generated by Django 4.2 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+BATCH_SIZE = 10000
+
+BOARD_TRIGGERS_SQL = '''
+CREATE FUNCTION goals_goal_set_board() RETURNS trigger AS $$
+BEGIN
+    SELECT board_id INTO NEW.board_id FROM goals_goalcategory WHERE id = NEW.category_id;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_board
+BEFORE INSERT OR UPDATE OF category_id, board_id ON goals_goal
+FOR EACH ROW EXECUTE FUNCTION goals_goal_set_board();
+
+CREATE FUNCTION goals_goalcomment_set_board() RETURNS trigger AS $$
+BEGIN
+    SELECT board_id INTO NEW.board_id FROM goals_goal WHERE id = NEW.goal_id;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goalcomment_board
+BEFORE INSERT OR UPDATE OF goal_id, board_id ON goals_goalcomment
+FOR EACH ROW EXECUTE FUNCTION goals_goalcomment_set_board();
+
+CREATE FUNCTION goals_goalcategory_move_goals() RETURNS trigger AS $$
+BEGIN
+    UPDATE goals_goal SET board_id = NEW.board_id WHERE category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goalcategory_move_goals
+AFTER UPDATE ON goals_goalcategory
+FOR EACH ROW WHEN (OLD.board_id IS DISTINCT FROM NEW.board_id)
+EXECUTE FUNCTION goals_goalcategory_move_goals();
+
+CREATE FUNCTION goals_goal_move_comments() RETURNS trigger AS $$
+BEGIN
+    UPDATE goals_goalcomment SET board_id = NEW.board_id WHERE goal_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_move_comments
+AFTER UPDATE ON goals_goal
+FOR EACH ROW WHEN (OLD.board_id IS DISTINCT FROM NEW.board_id)
+EXECUTE FUNCTION goals_goal_move_comments();
+'''
+
+DROP_BOARD_TRIGGERS_SQL = '''
+DROP TRIGGER goals_goal_move_comments ON goals_goal;
+DROP FUNCTION goals_goal_move_comments();
+DROP TRIGGER goals_goalcategory_move_goals ON goals_goalcategory;
+DROP FUNCTION goals_goalcategory_move_goals();
+DROP TRIGGER goals_goalcomment_board ON goals_goalcomment;
+DROP FUNCTION goals_goalcomment_set_board();
+DROP TRIGGER goals_goal_board ON goals_goal;
+DROP FUNCTION goals_goal_set_board();
+'''
+
+
+def backfill_board(apps, schema_editor):
+    # Goals are updated one id range per transaction to keep row locks short.
+    # The goals_goal_move_comments trigger fills in the comments of every updated goal.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT coalesce(min(id), 0), coalesce(max(id), 0) FROM goals_goal')
+        first_id, last_id = cursor.fetchone()
+        for start in range(first_id, last_id + 1, BATCH_SIZE):
+            cursor.execute(
+                '''
+                UPDATE goals_goal SET board_id = goals_goalcategory.board_id
+                FROM goals_goalcategory
+                WHERE goals_goalcategory.id = goals_goal.category_id AND goals_goal.id >= %s AND goals_goal.id < %s
+                ''',
+                [start, start + BATCH_SIZE],
+            )
+
+        cursor.execute('SELECT coalesce(min(id), 0), coalesce(max(id), 0) FROM goals_goalcomment')
+        first_id, last_id = cursor.fetchone()
+        for start in range(first_id, last_id + 1, BATCH_SIZE):
+            cursor.execute(
+                '''
+                UPDATE goals_goalcomment SET board_id = goals_goal.board_id
+                FROM goals_goal
+                WHERE goals_goal.id = goals_goalcomment.goal_id AND goals_goalcomment.board_id IS NULL
+                    AND goals_goalcomment.id >= %s AND goals_goalcomment.id < %s
+                ''',
+                [start, start + BATCH_SIZE],
+            )
+
+
+def set_not_null_sql(table: str, column: str) -> list[str]:
+    """SET NOT NULL without scanning the table under ACCESS EXCLUSIVE.
+
+    The NOT VALID check is validated under SHARE UPDATE EXCLUSIVE, so writes go on, and SET NOT NULL then trusts
+    it instead of scanning. Each statement runs in its own transaction as the migration is not atomic.
+    """
+    constraint = f'{table}_{column}_not_null'
+    return [
+        f'ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID',
+        f'ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}',
+        f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL',
+        f'ALTER TABLE {table} DROP CONSTRAINT {constraint}',
+    ]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('goals', '0009_archivetask'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            # The board index is built concurrently below instead of under the table lock
+            database_operations=[
+                migrations.AddField(
+                    model_name='goal',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='goal',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            # The board index is built concurrently below instead of under the table lock
+            database_operations=[
+                migrations.AddField(
+                    model_name='goalcomment',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='goalcomment',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(BOARD_TRIGGERS_SQL, DROP_BOARD_TRIGGERS_SQL),
+        migrations.RunPython(backfill_board, migrations.RunPython.noop, atomic=False),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                AddIndexConcurrently(
+                    model_name='goal',
+                    index=models.Index(fields=['board'], name='goals_goal_board_id_a78cec0a'),
+                ),
+                migrations.RunSQL(
+                    set_not_null_sql('goals_goal', 'board_id'),
+                    'ALTER TABLE goals_goal ALTER COLUMN board_id DROP NOT NULL',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='goal',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                AddIndexConcurrently(
+                    model_name='goalcomment',
+                    index=models.Index(fields=['board'], name='goals_goalcomment_board_id_1688c0bb'),
+                ),
+                migrations.RunSQL(
+                    set_not_null_sql('goals_goalcomment', 'board_id'),
+                    'ALTER TABLE goals_goalcomment ALTER COLUMN board_id DROP NOT NULL',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='goalcomment',
+                    name='board',
+                    field=models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+        ),
+        RemoveIndexConcurrently(model_name='goal', name='goal_active_title_idx'),
+        RemoveIndexConcurrently(model_name='goal', name='goal_active_created_idx'),
+        RemoveIndexConcurrently(model_name='goal', name='goal_active_due_date_idx'),
+        RemoveIndexConcurrently(model_name='goal', name='goal_active_status_idx'),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(
+                condition=models.Q(('status', 4), _negated=True),
+                fields=['board', 'title'],
+                name='goal_active_title_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(
+                condition=models.Q(('status', 4), _negated=True),
+                fields=['board', '-created'],
+                name='goal_active_created_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(
+                condition=models.Q(('status', 4), _negated=True),
+                fields=['board', 'due_date'],
+                name='goal_active_due_date_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='goal',
+            index=models.Index(
+                condition=models.Q(('status', 4), _negated=True),
+                fields=['board', 'status', 'priority'],
+                name='goal_active_status_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='goalcomment',
+            index=models.Index(fields=['board', 'created'], name='comment_board_created_idx'),
+        ),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 4.2 on 2026-10-18 19:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+COUNTERS_SQL = '''
+CREATE FUNCTION goals_goal_update_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE goals_goalcounter SET count = count - 1
+        WHERE board_id = OLD.board_id AND category_id = OLD.category_id
+            AND status = OLD.status AND priority = OLD.priority;
+        IF OLD.due_date IS NOT NULL AND OLD.status IN (1, 2) THEN
+            UPDATE goals_goalduecounter SET count = count - 1
+            WHERE board_id = OLD.board_id AND category_id = OLD.category_id AND due_date = OLD.due_date;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO goals_goalcounter (board_id, category_id, status, priority, count)
+        VALUES (NEW.board_id, NEW.category_id, NEW.status, NEW.priority, 1)
+        ON CONFLICT (board_id, category_id, status, priority) DO UPDATE SET count = goals_goalcounter.count + 1;
+        IF NEW.due_date IS NOT NULL AND NEW.status IN (1, 2) THEN
+            INSERT INTO goals_goalduecounter (board_id, category_id, due_date, count)
+            VALUES (NEW.board_id, NEW.category_id, NEW.due_date, 1)
+            ON CONFLICT (board_id, category_id, due_date) DO UPDATE SET count = goals_goalduecounter.count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goals_goal_counters
+AFTER INSERT OR DELETE ON goals_goal
+FOR EACH ROW EXECUTE FUNCTION goals_goal_update_counters();
+
+CREATE TRIGGER goals_goal_counters_update
+AFTER UPDATE ON goals_goal
+FOR EACH ROW WHEN (
+    (OLD.board_id, OLD.category_id, OLD.status, OLD.priority, OLD.due_date)
+    IS DISTINCT FROM (NEW.board_id, NEW.category_id, NEW.status, NEW.priority, NEW.due_date)
+)
+EXECUTE FUNCTION goals_goal_update_counters();
+
+INSERT INTO goals_goalcounter (board_id, category_id, status, priority, count)
+SELECT board_id, category_id, status, priority, count(*) FROM goals_goal
+GROUP BY board_id, category_id, status, priority;
+
+INSERT INTO goals_goalduecounter (board_id, category_id, due_date, count)
+SELECT board_id, category_id, due_date, count(*) FROM goals_goal
+WHERE due_date IS NOT NULL AND status IN (1, 2)
+GROUP BY board_id, category_id, due_date;
+'''
+
+DROP_COUNTERS_SQL = '''
+DROP TRIGGER goals_goal_counters_update ON goals_goal;
+DROP TRIGGER goals_goal_counters ON goals_goal;
+DROP FUNCTION goals_goal_update_counters();
+'''
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('goals', '0010_denormalized_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalDueCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField(verbose_name='Дата выполнения')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                (
+                    'board',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+                (
+                    'category',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='goals.goalcategory',
+                        verbose_name='Категория',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Счётчик сроков',
+                'verbose_name_plural': 'Счётчики сроков',
+            },
+        ),
+        migrations.CreateModel(
+            name='GoalCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'status',
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, 'К выполнению'), (2, 'В процессе'), (3, 'Выполнено'), (4, 'Архив')],
+                        verbose_name='Статус',
+                    ),
+                ),
+                (
+                    'priority',
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, 'Низкий'), (2, 'Средний'), (3, 'Высокий'), (4, 'Критический')],
+                        verbose_name='Приоритет',
+                    ),
+                ),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                (
+                    'board',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+                (
+                    'category',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='goals.goalcategory',
+                        verbose_name='Категория',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Счётчик целей',
+                'verbose_name_plural': 'Счётчики целей',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='goalduecounter',
+            constraint=models.UniqueConstraint(
+                fields=('board', 'category', 'due_date'), name='goal_due_counter_unique'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='goalcounter',
+            constraint=models.UniqueConstraint(
+                fields=('board', 'category', 'status', 'priority'), name='goal_counter_unique'
+            ),
+        ),
+        migrations.RunSQL(COUNTERS_SQL, DROP_COUNTERS_SQL),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 4.2 on 2026-10-18 19:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BUMP_SQL = '''
+INSERT INTO goals_boardversion (board_id, version, updated)
+SELECT DISTINCT {column}, 1, now() FROM {rows}
+ON CONFLICT (board_id) DO UPDATE SET version = goals_boardversion.version + 1, updated = now();
+'''
+
+BOARD_VERSION_SQL = f'''
+CREATE FUNCTION goals_bump_board_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {BUMP_SQL.format(column='board_id', rows='new_rows')}
+    ELSIF TG_OP = 'DELETE' THEN
+        {BUMP_SQL.format(column='board_id', rows='old_rows')}
+    ELSE
+        {BUMP_SQL.format(column='board_id', rows='(SELECT board_id FROM new_rows UNION SELECT board_id FROM old_rows) AS rows')}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION goals_board_bump_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM goals_boardversion WHERE board_id IN (SELECT id FROM old_rows);
+    ELSE
+        {BUMP_SQL.format(column='id', rows='new_rows')}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+# Transition tables allow a single event per trigger, so every table gets one statement-level trigger per event.
+# A bulk write bumps each touched board once instead of once per row.
+TRIGGER_SQL = '''
+CREATE TRIGGER {table}_board_version_{event}
+AFTER {event} ON {table}
+REFERENCING {referencing}
+FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+'''
+
+DROP_TRIGGER_SQL = 'DROP TRIGGER {table}_board_version_{event} ON {table};'
+
+TABLES = {
+    'goals_board': 'goals_board_bump_version',
+    'goals_boardparticipant': 'goals_bump_board_version',
+    'goals_goalcategory': 'goals_bump_board_version',
+    'goals_goal': 'goals_bump_board_version',
+    'goals_goalcomment': 'goals_bump_board_version',
+}
+
+REFERENCING = {
+    'insert': 'NEW TABLE AS new_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+}
+
+TRIGGERS_SQL = BOARD_VERSION_SQL + ''.join(
+    TRIGGER_SQL.format(table=table, event=event, referencing=referencing, function=function)
+    for table, function in TABLES.items()
+    for event, referencing in REFERENCING.items()
+)
+
+DROP_TRIGGERS_SQL = (
+    ''.join(DROP_TRIGGER_SQL.format(table=table, event=event) for table in TABLES for event in REFERENCING)
+    + '''
+DROP FUNCTION goals_board_bump_version();
+DROP FUNCTION goals_bump_board_version();
+'''
+)
+
+BACKFILL_SQL = '''
+INSERT INTO goals_boardversion (board_id, version, updated)
+SELECT id, 1, now() FROM goals_board
+ON CONFLICT (board_id) DO NOTHING;
+'''
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('goals', '0011_goal_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardVersion',
+            fields=[
+                (
+                    'board',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='version',
+                        serialize=False,
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+                ('version', models.BigIntegerField(default=1, verbose_name='Версия')),
+                ('updated', models.DateTimeField(verbose_name='Дата последнего обновления')),
+            ],
+            options={
+                'verbose_name': 'Версия доски',
+                'verbose_name_plural': 'Версии досок',
+            },
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
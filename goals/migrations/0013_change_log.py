@@ -0,0 +1,126 @@
+# Generated by Django 4.2 on 2026-10-18 19:56
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+LOG_SQL = '''
+INSERT INTO goals_changelog (txid, kind, object_id, board_id, created)
+SELECT pg_current_xact_id()::text::bigint, {kind}, id, {board}, now() FROM {rows};
+'''
+
+# Rows moved to another board are also logged for the old board, so its other participants get a tombstone
+MOVED_ROWS = (
+    '(SELECT old_rows.* FROM old_rows JOIN new_rows USING (id) WHERE old_rows.board_id <> new_rows.board_id) AS moved'
+)
+
+FUNCTION_SQL = '''
+CREATE FUNCTION {table}_log_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        {log_old}
+    ELSE
+        {log_new}
+        {log_moved}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+# One statement-level trigger per event, transition tables allow a single event per trigger
+TRIGGER_SQL = '''
+CREATE TRIGGER {table}_log_changes_{event}
+AFTER {event} ON {table}
+REFERENCING {referencing}
+FOR EACH STATEMENT EXECUTE FUNCTION {table}_log_changes();
+'''
+
+TABLES = {
+    'goals_board': 1,
+    'goals_goalcategory': 2,
+    'goals_goal': 3,
+    'goals_goalcomment': 4,
+}
+
+REFERENCING = {
+    'insert': 'NEW TABLE AS new_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+}
+
+
+def log_changes_sql() -> str:
+    sql = []
+    for table, kind in TABLES.items():
+        board = 'id' if table == 'goals_board' else 'board_id'
+        sql.append(
+            FUNCTION_SQL.format(
+                table=table,
+                log_old=LOG_SQL.format(kind=kind, board=board, rows='old_rows'),
+                log_new=LOG_SQL.format(kind=kind, board=board, rows='new_rows'),
+                log_moved=''
+                if table == 'goals_board'
+                else (f"IF TG_OP = 'UPDATE' THEN {LOG_SQL.format(kind=kind, board=board, rows=MOVED_ROWS)} END IF;"),
+            )
+        )
+        sql.extend(
+            TRIGGER_SQL.format(table=table, event=event, referencing=referencing)
+            for event, referencing in REFERENCING.items()
+        )
+    return ''.join(sql)
+
+
+def drop_log_changes_sql() -> str:
+    sql = []
+    for table in TABLES:
+        sql.extend(f'DROP TRIGGER {table}_log_changes_{event} ON {table};' for event in REFERENCING)
+        sql.append(f'DROP FUNCTION {table}_log_changes();')
+    return '\n'.join(sql)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('goals', '0012_board_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField(verbose_name='Транзакция')),
+                (
+                    'kind',
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, 'Доска'), (2, 'Категория'), (3, 'Цель'), (4, 'Комментарий')], verbose_name='Тип'
+                    ),
+                ),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('created', models.DateTimeField(verbose_name='Дата создания')),
+                (
+                    'board',
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name='+',
+                        to='goals.board',
+                        verbose_name='Доска',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['board', 'txid', 'id'], name='changelog_board_txid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created'], name='changelog_created_brin'),
+        ),
+        migrations.RunSQL(log_changes_sql(), drop_log_changes_sql()),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Goals, categories, comments and participants embed their user's profile, so a profile change bumps the version
+# of every board holding rows of the user. last_login and password writes leave the profile alone and bump nothing.
+USER_BOARD_VERSION_SQL = '''
+CREATE FUNCTION goals_user_bump_board_version() RETURNS trigger AS $$
+BEGIN
+    WITH changed AS (
+        SELECT new_rows.id FROM new_rows JOIN old_rows USING (id)
+        WHERE (new_rows.username, new_rows.first_name, new_rows.last_name, new_rows.email)
+            IS DISTINCT FROM (old_rows.username, old_rows.first_name, old_rows.last_name, old_rows.email)
+    )
+    INSERT INTO goals_boardversion (board_id, version, updated)
+    SELECT DISTINCT board_id, 1, now() FROM (
+        SELECT board_id FROM goals_boardparticipant WHERE user_id IN (SELECT id FROM changed)
+        UNION SELECT board_id FROM goals_goalcategory WHERE user_id IN (SELECT id FROM changed)
+        UNION SELECT board_id FROM goals_goal WHERE user_id IN (SELECT id FROM changed)
+        UNION SELECT board_id FROM goals_goalcomment WHERE user_id IN (SELECT id FROM changed)
+    ) AS boards
+    ON CONFLICT (board_id) DO UPDATE SET version = goals_boardversion.version + 1, updated = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_user_board_version_update
+AFTER UPDATE ON core_user
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION goals_user_bump_board_version();
+'''
+
+DROP_USER_BOARD_VERSION_SQL = '''
+DROP TRIGGER core_user_board_version_update ON core_user;
+DROP FUNCTION goals_user_bump_board_version();
+'''
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0001_custom_user_model'),
+        ('goals', '0013_change_log'),
+    ]
+
+    operations = [
+        migrations.RunSQL(USER_BOARD_VERSION_SQL, DROP_USER_BOARD_VERSION_SQL),
+    ]
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Q
 
 from core.models import User
 
@@ -28,6 +31,7 @@ class BoardParticipant(BaseModel):
         unique_together = ('board', 'user')
         verbose_name = 'Участник'
         verbose_name_plural = 'Участники'
+        indexes = [models.Index(fields=['user', 'board', 'role'], name='participant_user_board_idx')]
 
     class Role(models.IntegerChoices):
         owner = 1, 'Владелец'
@@ -48,6 +52,12 @@ class GoalCategory(BaseModel):
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        indexes = [
+            models.Index(fields=['board', 'title'], condition=Q(is_deleted=False), name='category_active_title_idx'),
+            models.Index(
+                fields=['board', 'created'], condition=Q(is_deleted=False), name='category_active_created_idx'
+            ),
+        ]
 
     board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='categories')
 
@@ -81,20 +91,150 @@ class Goal(BaseModel):
         verbose_name='Приоритет', choices=Priority.choices, default=Priority.medium
     )
     category = models.ForeignKey(GoalCategory, verbose_name='Категория', on_delete=models.PROTECT, related_name='goals')
+    # Copy of category.board_id, maintained by the goals_goal_board trigger, see migration 0010
+    board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='+', editable=False)
+    # Maintained by the goals_goal_search_vector trigger, see migration 0007
+    search_vector = SearchVectorField(verbose_name='Поисковый вектор', null=True, editable=False)
 
     class Meta:
         verbose_name = 'Цель'
         verbose_name_plural = 'Цели'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='goal_search_vector_idx'),
+            # Partial indexes for non-archived goals (status 4 is Status.archived)
+            models.Index(fields=['board', 'title'], condition=~Q(status=4), name='goal_active_title_idx'),
+            models.Index(fields=['board', '-created'], condition=~Q(status=4), name='goal_active_created_idx'),
+            models.Index(fields=['board', 'due_date'], condition=~Q(status=4), name='goal_active_due_date_idx'),
+            models.Index(fields=['board', 'status', 'priority'], condition=~Q(status=4), name='goal_active_status_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs) -> None:
+        if self.category_id:
+            self.board_id = self.category.board_id
+        super().save(*args, **kwargs)
+
 
 class GoalComment(BaseModel):
     text = models.TextField(verbose_name='Текст')
     goal = models.ForeignKey(Goal, verbose_name='Цель', on_delete=models.CASCADE)
     user = models.ForeignKey(User, verbose_name='Автор', on_delete=models.CASCADE, related_name='comments')
+    # Copy of goal.board_id, maintained by the goals_goalcomment_board trigger, see migration 0010
+    board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.PROTECT, related_name='+', editable=False)
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['goal', 'created'], name='comment_goal_created_idx'),
+            models.Index(fields=['board', 'created'], name='comment_board_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        if self.goal_id:
+            self.board_id = self.goal.board_id
+        super().save(*args, **kwargs)
+
+
+class ArchiveTask(BaseModel):
+    class Meta:
+        verbose_name = 'Архивация целей'
+        verbose_name_plural = 'Архивации целей'
+
+    class Status(models.IntegerChoices):
+        pending = 1, 'В очереди'
+        running = 2, 'Выполняется'
+        done = 3, 'Завершена'
+
+    user = models.ForeignKey(User, verbose_name='Автор', on_delete=models.PROTECT, related_name='archive_tasks')
+    board = models.ForeignKey(
+        Board, verbose_name='Доска', on_delete=models.PROTECT, null=True, blank=True, related_name='+'
+    )
+    category = models.ForeignKey(
+        GoalCategory, verbose_name='Категория', on_delete=models.PROTECT, null=True, blank=True, related_name='+'
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Status.choices, default=Status.pending)
+    total = models.PositiveIntegerField(verbose_name='Всего целей', null=True, blank=True)
+    processed = models.PositiveIntegerField(verbose_name='Обработано целей', default=0)
+    last_goal_id = models.BigIntegerField(verbose_name='Последняя обработанная цель', default=0)
+
+    def goals(self) -> models.QuerySet[Goal]:
+        if self.board_id:
+            return Goal.objects.filter(board_id=self.board_id)
+        return Goal.objects.filter(category_id=self.category_id)
+
+
+# Goals per (board, category, status, priority), maintained by the goals_goal_counters trigger, see migration 0011.
+# The trigger updates the counter row inside the writing transaction, so concurrent transactions that write goals
+# with the same category, status and priority queue on that row until the first one commits. Keep them short.
+class GoalCounter(models.Model):
+    class Meta:
+        verbose_name = 'Счётчик целей'
+        verbose_name_plural = 'Счётчики целей'
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'category', 'status', 'priority'], name='goal_counter_unique')
+        ]
+
+    board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(GoalCategory, verbose_name='Категория', on_delete=models.CASCADE, related_name='+')
+    status = models.PositiveSmallIntegerField(verbose_name='Статус', choices=Goal.Status.choices)
+    priority = models.PositiveSmallIntegerField(verbose_name='Приоритет', choices=Goal.Priority.choices)
+    count = models.IntegerField(verbose_name='Количество', default=0)
+
+
+# Open goals per (board, category, due_date), maintained by the goals_goal_counters trigger, see migration 0011
+class GoalDueCounter(models.Model):
+    class Meta:
+        verbose_name = 'Счётчик сроков'
+        verbose_name_plural = 'Счётчики сроков'
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'category', 'due_date'], name='goal_due_counter_unique')
+        ]
+
+    board = models.ForeignKey(Board, verbose_name='Доска', on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(GoalCategory, verbose_name='Категория', on_delete=models.CASCADE, related_name='+')
+    due_date = models.DateField(verbose_name='Дата выполнения')
+    count = models.IntegerField(verbose_name='Количество', default=0)
+
+
+# Bumped by the goals_*_board_version triggers on every write to a board's rows, see migration 0012. The bump
+# locks this row until the writing transaction commits, so concurrent writers on one board run one after another
+# from the bump on. Statement-level triggers bump once per statement, so a batch of rows (bulk_create,
+# bulk_update, the batch endpoint, imports) waits once; keep transactions that write to boards short.
+class BoardVersion(models.Model):
+    class Meta:
+        verbose_name = 'Версия доски'
+        verbose_name_plural = 'Версии досок'
+
+    board = models.OneToOneField(
+        Board, verbose_name='Доска', on_delete=models.CASCADE, primary_key=True, related_name='version'
+    )
+    version = models.BigIntegerField(verbose_name='Версия', default=1)
+    updated = models.DateTimeField(verbose_name='Дата последнего обновления')
+
+
+# Filled by the goals_*_log_changes triggers, see migration 0013 and goals.sync
+class ChangeLog(models.Model):
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['board', 'txid', 'id'], name='changelog_board_txid_idx'),
+            BrinIndex(fields=['created'], name='changelog_created_brin'),
+        ]
+
+    class Kind(models.IntegerChoices):
+        board = 1, 'Доска'
+        category = 2, 'Категория'
+        goal = 3, 'Цель'
+        comment = 4, 'Комментарий'
+
+    txid = models.BigIntegerField(verbose_name='Транзакция')
+    kind = models.PositiveSmallIntegerField(verbose_name='Тип', choices=Kind.choices)
+    object_id = models.BigIntegerField(verbose_name='Объект')
+    board = models.ForeignKey(
+        Board, verbose_name='Доска', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    created = models.DateTimeField(verbose_name='Дата создания')
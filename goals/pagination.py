@@ -0,0 +1,212 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Any
+
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class GoalPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset mode.
+
+    ``?pagination=cursor`` switches to keyset pagination: the page position is the
+    last row's ordering value plus its ``id`` as a unique tiebreaker, so deep pages
+    cost the same as the first one, no ``COUNT(*)`` is issued and concurrent inserts
+    do not shift rows between pages.
+
+    ``?pagination=nocount`` keeps limit/offset but skips ``COUNT(*)``: one extra row
+    is fetched to tell whether there is a next page (``has_next``).
+
+    ``?pagination=estimate`` works like ``nocount`` and adds a ``count`` that is the
+    planner's row estimate when it is above ``estimate_threshold`` and an exact count
+    otherwise (``count_estimated`` tells which). Counts are cached for
+    ``count_cache_timeout`` seconds.
+    """
+
+    mode_query_param = 'pagination'
+    mode = None
+    cursor_mode = 'cursor'
+    nocount_mode = 'nocount'
+    estimate_mode = 'estimate'
+    estimate_threshold = 10000
+    count_cache_timeout = 60
+    cursor_query_param = 'cursor'
+    page_default_limit = 100
+    page_max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> list | None:
+        self.mode = request.query_params.get(self.mode_query_param)
+        if self.mode == self.cursor_mode:
+            return self.paginate_keyset(queryset, request)
+        if self.mode in (self.nocount_mode, self.estimate_mode):
+            return self.paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: list) -> Response:
+        if self.mode == self.cursor_mode:
+            return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
+        if self.mode == self.nocount_mode:
+            return Response(
+                {
+                    'has_next': self.has_next,
+                    'next': self.get_next_link(),
+                    'previous': self.get_previous_link(),
+                    'results': data,
+                }
+            )
+        if self.mode == self.estimate_mode:
+            return Response(
+                {
+                    'count': self.count,
+                    'count_estimated': self.count_estimated,
+                    'has_next': self.has_next,
+                    'next': self.get_next_link(),
+                    'previous': self.get_previous_link(),
+                    'results': data,
+                }
+            )
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'][
+            'description'
+        ] = 'Omitted when pagination=cursor or nocount, may be an estimate when pagination=estimate'
+        response_schema['properties']['count_estimated'] = {
+            'type': 'boolean',
+            'description': 'Only when pagination=estimate',
+        }
+        response_schema['properties']['has_next'] = {
+            'type': 'boolean',
+            'description': 'Only when pagination=nocount or estimate',
+        }
+        return response_schema
+
+    # Limit/offset without COUNT(*)
+
+    def paginate_without_count(self, queryset: QuerySet, request: Request) -> list:
+        self.request = request
+        self.limit = self.get_page_limit(request)
+        self.offset = self.get_offset(request)
+
+        results = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        if self.mode == self.estimate_mode:
+            self.count, self.count_estimated = self.get_estimated_count(queryset)
+        return results[: self.limit]
+
+    def get_estimated_count(self, queryset: QuerySet) -> tuple[int, bool]:
+        queryset = queryset.order_by()
+        sql, params = queryset.query.sql_with_params()
+        key = 'goals:count:' + hashlib.md5(repr((sql, params)).encode(), usedforsecurity=False).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        if plan['Plan Rows'] > self.estimate_threshold:
+            result = plan['Plan Rows'], True
+        else:
+            result = queryset.count(), False
+        cache.set(key, result, self.count_cache_timeout)
+        return result
+
+    # Keyset mode
+
+    def paginate_keyset(self, queryset: QuerySet, request: Request) -> list:
+        self.request = request
+        self.limit = self.get_page_limit(request)
+        self.field, self.descending = self.get_keyset_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        descending = self.descending != reverse
+        if position is not None:
+            value, pk = position
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'id__{lookup}': pk})
+            )
+        prefix = '-' if descending else ''
+        results = list(queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')[: self.limit + 1])
+
+        has_more = len(results) > self.limit
+        results = results[: self.limit]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_page_limit(self, request: Request) -> int:
+        limit = self.get_limit(request) or self.page_default_limit
+        return min(limit, self.page_max_limit)
+
+    @staticmethod
+    def get_keyset_ordering(queryset: QuerySet) -> tuple[str, bool]:
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['id']
+        field = ordering[0]
+        descending = field.startswith('-')
+        field = field.lstrip('-')
+        if field == 'pk':
+            field = 'id'
+        return field, descending
+
+    def get_next_link(self) -> str | None:
+        if self.mode in (self.nocount_mode, self.estimate_mode):
+            if not self.has_next:
+                return None
+            url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+        if self.mode != self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if self.mode != self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, item: Any, reverse: bool) -> str:
+        value = self._item_value(item, self.field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        payload = {'p': [value, self._item_value(item, 'id')], 'r': reverse}
+        cursor = base64.urlsafe_b64encode(json.dumps(payload, ensure_ascii=False).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request: Request) -> tuple[list | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            value, pk = payload['p']
+            return [value, int(pk)], bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _item_value(item: Any, field: str) -> Any:
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
@@ -1,6 +1,8 @@
 from datetime import datetime
+from typing import Any
 
-from django.db import transaction
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError, PermissionDenied
@@ -8,7 +10,8 @@ from rest_framework.request import Request
 
 from core.models import User
 from core.serializers import ProfileSerializer
-from goals.models import GoalCategory, Goal, GoalComment, Board, BoardParticipant
+from goals.membership import OWNER_ROLES, WRITE_ROLES, get_board_ids, has_board_role, invalidate_board_roles
+from goals.models import ArchiveTask, GoalCategory, Goal, GoalComment, Board, BoardParticipant
 
 
 class BoardSerializer(serializers.ModelSerializer):
@@ -18,9 +21,32 @@ class BoardSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ParticipantUserField(serializers.SlugRelatedField):
+    """Looks usernames up in the users ``BoardParticipantListSerializer`` loaded in one query."""
+
+    def to_internal_value(self, data: Any) -> User:
+        users = self.context.get('participant_users')
+        if users is None:
+            return super().to_internal_value(data)
+        if not isinstance(data, str):
+            self.fail('invalid')
+        try:
+            return users[data]
+        except KeyError:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+
+
+class BoardParticipantListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data: Any) -> list[dict]:
+        if isinstance(data, list):
+            usernames = {item['user'] for item in data if isinstance(item, dict) and isinstance(item.get('user'), str)}
+            self.context['participant_users'] = User.objects.in_bulk(usernames, field_name='username')
+        return super().to_internal_value(data)
+
+
 class BoardParticipantSerializer(serializers.ModelSerializer):
     role = serializers.ChoiceField(required=True, choices=BoardParticipant.editable_roles)
-    user = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
+    user = ParticipantUserField(slug_field='username', queryset=User.objects.all())
 
     def validate_user(self, user: User) -> User:
         if self.context['request'].user == user:
@@ -31,21 +57,23 @@ class BoardParticipantSerializer(serializers.ModelSerializer):
         model = BoardParticipant
         fields = '__all__'
         read_only_fields = ('id', 'created', 'updated', 'board')
+        list_serializer_class = BoardParticipantListSerializer
 
 
 class BoardWithParticipantsSerializer(BoardSerializer):
     participants = BoardParticipantSerializer(many=True)
 
+    def to_representation(self, instance: Board) -> dict:
+        # UpdateModelMixin drops the prefetched participants after an update, reload them with their users
+        prefetch_related_objects(
+            [instance], Prefetch('participants', queryset=BoardParticipant.objects.select_related('user'))
+        )
+        return super().to_representation(instance)
+
     def update(self, instance: Board, validated_data: dict) -> Board:
-        request: Request = self.context['request']
         with transaction.atomic():
-            BoardParticipant.objects.filter(board=instance).exclude(user=request.user).delete()
-            new_participants = []
-            for participants in validated_data.get('participants', []):
-                new_participants.append(
-                    BoardParticipant(user=participants['user'], role=participants['role'], board=instance)
-                )
-            BoardParticipant.objects.bulk_create(new_participants, ignore_conflicts=True)
+            if 'participants' in validated_data:
+                self.sync_participants(instance, validated_data['participants'])
 
             if title := validated_data.get('title'):
                 instance.title = title
@@ -53,6 +81,49 @@ class BoardWithParticipantsSerializer(BoardSerializer):
 
         return instance
 
+    def sync_participants(self, board: Board, participants: list[dict]) -> None:
+        # Only rows whose role changed are written, untouched participants keep their id and created
+        request: Request = self.context['request']
+        roles = {participant['user'].id: participant['role'] for participant in participants}
+        existing = {
+            participant.user_id: participant
+            for participant in BoardParticipant.objects.filter(board=board).exclude(user=request.user)
+        }
+
+        created = [
+            BoardParticipant(board=board, user_id=user_id, role=role)
+            for user_id, role in roles.items()
+            if user_id not in existing
+        ]
+        updated = [
+            participant
+            for user_id, participant in existing.items()
+            if user_id in roles and participant.role != roles[user_id]
+        ]
+        deleted = [participant for user_id, participant in existing.items() if user_id not in roles]
+
+        if created:
+            BoardParticipant.objects.bulk_create(created, ignore_conflicts=True)
+        if updated:
+            now = timezone.now()
+            for participant in updated:
+                participant.role = roles[participant.user_id]
+                participant.updated = now
+            BoardParticipant.objects.bulk_update(updated, ['role', 'updated'])
+        if deleted:
+            BoardParticipant.objects.filter(id__in=[participant.id for participant in deleted]).delete()
+
+        changed = created + updated + deleted
+        if changed:
+            invalidate_board_roles(*(participant.user_id for participant in changed))
+
+
+class ArchiveTaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchiveTask
+        fields = ('id', 'board', 'category', 'status', 'total', 'processed', 'created', 'updated')
+        read_only_fields = fields
+
 
 class GoalCategoryCreateSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -65,11 +136,7 @@ class GoalCategoryCreateSerializer(serializers.ModelSerializer):
     def validate_board(self, board: Board) -> Board:
         if board.is_deleted:
             raise ValidationError('Board is deleted')
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=board.id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], board.id, WRITE_ROLES):
             raise PermissionDenied
         return board
 
@@ -84,16 +151,12 @@ class GoalCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Goal
         read_only_fields = ('id', 'created', 'updated', 'user')
-        fields = '__all__'
+        exclude = ('board', 'search_vector')
 
     def validate_category(self, value: GoalCategory) -> GoalCategory:
         if value.is_deleted:
             raise ValidationError('Category is deleted')
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=value.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], value.board_id, WRITE_ROLES):
             raise PermissionDenied
 
         return value
@@ -107,6 +170,10 @@ class GoalCreateSerializer(serializers.ModelSerializer):
 
 class GoalSerializer(GoalCreateSerializer):
     user = ProfileSerializer(read_only=True)
+    # Only present in full-text search results (?q=), headline and snippet are escaped HTML
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
 
     def validate_category(self, value: GoalCategory) -> GoalCategory:
         if value.is_deleted:
@@ -120,17 +187,13 @@ class GoalCommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = GoalComment
         read_only_fields = ('id', 'created', 'updated', 'user')
-        fields = '__all__'
+        exclude = ('board',)
 
     def validate_goal(self, value: Goal) -> Goal:
-        if value.status == Goal.Status.archived:
+        if value.status == Goal.Status.archived or value.category.is_deleted:
             raise ValidationError('not allowed in deleted goal')
 
-        if not BoardParticipant.objects.filter(
-            user_id=self.context['request'].user.id,
-            board_id=value.category.board_id,
-            role__in=[BoardParticipant.Role.owner, BoardParticipant.Role.writer],
-        ).exists():
+        if not has_board_role(self.context['request'], value.board_id, WRITE_ROLES):
             raise PermissionDenied
 
         return value
@@ -146,3 +209,132 @@ class GoalCommentSerializer(GoalCommentCreateSerializer):
         if self.context['request'].user.id != value.user_id:
             raise PermissionDenied
         return value
+
+
+class GoalBatchOperationSerializer(serializers.Serializer):
+    class Operation(models.TextChoices):
+        create = 'create'
+        update = 'update'
+        status = 'status'
+        move = 'move'
+        archive = 'archive'
+
+    op = serializers.ChoiceField(choices=Operation.choices)
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Goal.Status.choices, required=False)
+    priority = serializers.ChoiceField(choices=Goal.Priority.choices, required=False)
+    category = serializers.IntegerField(required=False)
+
+    required_fields: dict[str, tuple[str, ...]] = {
+        Operation.create: ('title', 'category'),
+        Operation.update: ('id',),
+        Operation.status: ('id', 'status'),
+        Operation.move: ('id', 'category'),
+        Operation.archive: ('id',),
+    }
+
+    def validate_due_date(self, value: datetime | None) -> datetime | None:
+        if value and value < timezone.now().date():
+            raise ValidationError('Date in past')
+        return value
+
+    def validate(self, attrs: dict) -> dict:
+        missing = {
+            field: ['This field is required.'] for field in self.required_fields[attrs['op']] if field not in attrs
+        }
+        if missing:
+            raise ValidationError(missing)
+        if attrs['op'] == self.Operation.create and 'id' in attrs:
+            raise ValidationError({'id': ['Not allowed for create']})
+        return attrs
+
+
+class GoalBatchSerializer(serializers.Serializer):
+    operations = GoalBatchOperationSerializer(many=True, allow_empty=False, max_length=1000)
+
+    update_fields = ('title', 'description', 'due_date', 'status', 'priority')
+
+    def validate_operations(self, operations: list[dict]) -> list[dict]:
+        request: Request = self.context['request']
+        Operation = GoalBatchOperationSerializer.Operation
+
+        goal_ids = {item['id'] for item in operations if 'id' in item}
+        category_ids = {item['category'] for item in operations if 'category' in item}
+        board_ids = get_board_ids(request)
+        self.goals = {
+            goal.id: goal
+            for goal in Goal.objects.select_for_update(of=('self',))
+            .select_related('user')
+            .defer('search_vector')
+            .filter(id__in=goal_ids, board_id__in=board_ids, category__is_deleted=False)
+            .exclude(status=Goal.Status.archived)
+        }
+        self.categories = {
+            category.id: category
+            for category in GoalCategory.objects.filter(id__in=category_ids, board_id__in=board_ids, is_deleted=False)
+        }
+
+        errors, has_errors = [], False
+        for item in operations:
+            item_errors = {}
+            goal = self.goals.get(item.get('id'))
+            category = self.categories.get(item.get('category'))
+
+            if 'id' in item:
+                if goal is None:
+                    item_errors['id'] = ['Goal not found']
+                elif not has_board_role(request, goal.board_id, OWNER_ROLES):
+                    item_errors['id'] = [PermissionDenied.default_detail]
+            if 'category' in item and item['op'] != Operation.archive:
+                if category is None:
+                    item_errors['category'] = ['Category not found']
+                elif not has_board_role(request, category.board_id, WRITE_ROLES):
+                    item_errors['category'] = [PermissionDenied.default_detail]
+
+            errors.append(item_errors)
+            has_errors = has_errors or bool(item_errors)
+
+        if has_errors:
+            raise ValidationError(errors)
+        return operations
+
+    def create(self, validated_data: dict) -> list[dict]:
+        request: Request = self.context['request']
+        Operation = GoalBatchOperationSerializer.Operation
+        now = timezone.now()
+
+        new_goals, changed_goals, changed_fields, results = [], {}, {'updated'}, []
+        for item in validated_data['operations']:
+            if item['op'] == Operation.create:
+                category = self.categories[item['category']]
+                goal = Goal(
+                    user=request.user,
+                    category=category,
+                    board_id=category.board_id,
+                    **{field: item[field] for field in self.update_fields if field in item},
+                )
+                new_goals.append(goal)
+            else:
+                goal = self.goals[item['id']]
+                if item['op'] == Operation.archive:
+                    values = {'status': Goal.Status.archived}
+                else:
+                    values = {field: item[field] for field in self.update_fields if field in item}
+                    if 'category' in item:
+                        goal.category = self.categories[item['category']]
+                        goal.board_id = goal.category.board_id
+                        changed_fields.update(('category', 'board'))
+                for field, value in values.items():
+                    setattr(goal, field, value)
+                goal.updated = now
+                changed_fields.update(values)
+                changed_goals[goal.id] = goal
+            results.append((item['op'], goal))
+
+        Goal.objects.bulk_create(new_goals)
+        Goal.objects.bulk_update(changed_goals.values(), fields=sorted(changed_fields), batch_size=500)
+
+        return [{'op': op, 'goal': GoalSerializer(goal, context=self.context).data} for op, goal in results]
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from goals.membership import invalidate_board_roles
+from goals.models import BoardParticipant
+
+
+@receiver(post_save, sender=BoardParticipant)
+@receiver(post_delete, sender=BoardParticipant)
+def board_participant_changed(sender, instance: BoardParticipant, **kwargs) -> None:
+    invalidate_board_roles(instance.user_id)
@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from goals.models import Board, Goal, GoalCounter, GoalDueCounter
+
+
+def _empty_stats() -> dict:
+    return {
+        'total': 0,
+        'overdue': 0,
+        'by_status': {status: 0 for status in Goal.Status.values},
+        'by_priority': {priority: 0 for priority in Goal.Priority.values},
+    }
+
+
+def get_board_stats(board: Board) -> dict:
+    board_stats = _empty_stats()
+    categories = defaultdict(_empty_stats)
+
+    counters = GoalCounter.objects.filter(board=board, category__is_deleted=False, count__gt=0).values_list(
+        'category_id', 'status', 'priority', 'count'
+    )
+    for category_id, status, priority, count in counters:
+        for stats in (board_stats, categories[category_id]):
+            stats['by_status'][status] += count
+            if status != Goal.Status.archived:
+                stats['total'] += count
+                stats['by_priority'][priority] += count
+
+    overdue = (
+        GoalDueCounter.objects.filter(
+            board=board, category__is_deleted=False, due_date__lt=timezone.now().date(), count__gt=0
+        )
+        .values_list('category_id')
+        .annotate(overdue=Sum('count'))
+    )
+    for category_id, count in overdue:
+        board_stats['overdue'] += count
+        categories[category_id]['overdue'] += count
+
+    board_stats['board'] = board.id
+    board_stats['categories'] = [
+        {'category': category_id, **stats} for category_id, stats in sorted(categories.items())
+    ]
+    return board_stats
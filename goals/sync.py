@@ -0,0 +1,140 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from goals.lean import goal_category_lean_serializer, goal_comment_lean_serializer, goal_lean_serializer
+from goals.membership import get_board_ids
+from goals.models import Board, ChangeLog, Goal, GoalCategory, GoalComment
+from goals.serializers import BoardSerializer
+
+# Sorts after every id logged by a transaction, see head position
+MAX_ID = 2**63 - 1
+
+SECTIONS = {
+    ChangeLog.Kind.board: 'boards',
+    ChangeLog.Kind.category: 'categories',
+    ChangeLog.Kind.goal: 'goals',
+    ChangeLog.Kind.comment: 'comments',
+}
+
+
+class Cursor:
+    """
+    Position in the change log: the (txid, id) of the last consumed entry, a hash of
+    the user's boards and the time the cursor was issued. The cursor is reset when
+    the boards change, because a newly shared board has no deltas for the user, and
+    when it is older than CHANGE_LOG_RETENTION_DAYS.
+    """
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, txid: int, entry_id: int, boards: str, issued: float) -> None:
+        self.txid = txid
+        self.entry_id = entry_id
+        self.boards = boards
+        self.issued = issued
+
+    @classmethod
+    def decode(cls, encoded: str) -> 'Cursor':
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            txid, entry_id = payload['p']
+            return cls(int(txid), int(entry_id), str(payload['b']), float(payload['s']))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(cls.invalid_cursor_message)
+
+    def encode(self) -> str:
+        payload = {'p': [self.txid, self.entry_id], 'b': self.boards, 's': self.issued}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def is_expired(self) -> bool:
+        retention = timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+        return self.issued < (timezone.now() - retention).timestamp()
+
+
+def get_snapshot_xmin() -> int:
+    # Every transaction below xmin has finished, so no entry with a smaller txid can appear later
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def get_boards_hash(board_ids: list[int]) -> str:
+    return hashlib.md5(repr(sorted(board_ids)).encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def get_changes(request: Request, encoded_cursor: str | None, limit: int) -> dict:
+    board_ids = get_board_ids(request)
+    boards_hash = get_boards_hash(board_ids)
+    xmin = get_snapshot_xmin()
+    head = Cursor(xmin - 1, MAX_ID, boards_hash, timezone.now().timestamp())
+
+    cursor = Cursor.decode(encoded_cursor) if encoded_cursor else None
+    if cursor is None or cursor.boards != boards_hash or cursor.is_expired():
+        # The client has to download the lists again, starting from the head position
+        return {'cursor': head.encode(), 'reset': True, 'has_more': False, **empty_changes()}
+
+    entries = list(
+        ChangeLog.objects.filter(board_id__in=board_ids, txid__lt=xmin)
+        .filter(Q(txid__gt=cursor.txid) | Q(txid=cursor.txid, id__gt=cursor.entry_id))
+        .order_by('txid', 'id')
+        .values_list('txid', 'id', 'kind', 'object_id')[: limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    if has_more:
+        txid, entry_id = entries[-1][:2]
+        next_cursor = Cursor(txid, entry_id, boards_hash, head.issued)
+    else:
+        next_cursor = head
+
+    object_ids = defaultdict(set)
+    for _, _, kind, object_id in entries:
+        object_ids[kind].add(object_id)
+
+    changes = empty_changes()
+    for kind, ids in object_ids.items():
+        upserted = load_visible(kind, ids, board_ids)
+        visible = {item['id'] for item in upserted}
+        changes[SECTIONS[kind]] = {'upserted': upserted, 'deleted': sorted(ids - visible)}
+
+    return {'cursor': next_cursor.encode(), 'reset': False, 'has_more': has_more, **changes}
+
+
+def empty_changes() -> dict:
+    return {section: {'upserted': [], 'deleted': []} for section in SECTIONS.values()}
+
+
+def load_visible(kind: int, ids: set[int], board_ids: list[int]) -> list[dict]:
+    # Same visibility rules as the list views: soft-deleted and archived rows come back as tombstones
+    if kind == ChangeLog.Kind.board:
+        boards = Board.objects.filter(id__in=ids).filter(id__in=board_ids, is_deleted=False).order_by('id')
+        return BoardSerializer(boards, many=True).data
+
+    if kind == ChangeLog.Kind.category:
+        queryset = GoalCategory.objects.filter(id__in=ids, board_id__in=board_ids, is_deleted=False)
+        serializer = goal_category_lean_serializer
+    elif kind == ChangeLog.Kind.goal:
+        queryset = Goal.objects.filter(id__in=ids, board_id__in=board_ids, category__is_deleted=False).exclude(
+            status=Goal.Status.archived
+        )
+        serializer = goal_lean_serializer
+    else:
+        queryset = GoalComment.objects.filter(
+            id__in=ids, board_id__in=board_ids, goal__category__is_deleted=False
+        ).exclude(goal__status=Goal.Status.archived)
+        serializer = goal_comment_lean_serializer
+
+    queryset: QuerySet = queryset.order_by('id')
+    return serializer.to_representation(serializer.values(queryset), queryset)
@@ -0,0 +1,45 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from goals.models import ArchiveTask, Goal
+
+logger = logging.getLogger(__name__)
+
+
+def process_archive_chunk(chunk_size: int) -> ArchiveTask | None:
+    """
+    Archives the next chunk of goals of the oldest unfinished task.
+
+    The chunk and the task progress are committed together, so a worker killed at any
+    point resumes from ``last_goal_id`` without redoing or skipping goals. Tasks locked
+    by another worker are skipped, so several workers can run at once.
+    """
+    with transaction.atomic():
+        task = (
+            ArchiveTask.objects.select_for_update(skip_locked=True)
+            .exclude(status=ArchiveTask.Status.done)
+            .order_by('id')
+            .first()
+        )
+        if task is None:
+            return None
+
+        goals = task.goals().exclude(status=Goal.Status.archived)
+        if task.total is None:
+            task.total = goals.count()
+
+        ids = list(goals.filter(id__gt=task.last_goal_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if ids:
+            task.processed += Goal.objects.filter(id__in=ids).update(
+                status=Goal.Status.archived, updated=timezone.now()
+            )
+            task.last_goal_id = ids[-1]
+            task.status = ArchiveTask.Status.running
+        else:
+            task.status = ArchiveTask.Status.done
+        task.save()
+
+    logger.info('Archive task %s: %s/%s goals', task.id, task.processed, task.total)
+    return task
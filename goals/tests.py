@@ -1,3 +1,1360 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections, models
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase, force_authenticate
+
+from core.models import User
+from goals import async_views, membership, views
+from goals.cache import RESPONSE_CACHE_ALIAS
+from goals.checks import check_shared_cache
+from goals.lean import LeanListMixin
+from goals.membership import get_user_board_roles
+from goals.models import (
+    ArchiveTask,
+    Board,
+    BoardParticipant,
+    Goal,
+    GoalCategory,
+    GoalComment,
+    GoalCounter,
+    GoalDueCounter,
+)
+from goals.pagination import GoalPagination
+from goals.tasks import process_archive_chunk
+from todolist.db_router import PINNED_COOKIE, ReplicaMiddleware, ReplicaRouter, use_primary, use_replica
+from todolist.metrics import registry
+
+
+@dataclass
+class QueryBudget:
+    url_name: str
+    budget: int
+    method: str = 'get'
+    kwargs: Callable[[Any], dict] | None = None
+    data: Callable[[Any], dict] | None = None
+    query: dict = field(default_factory=dict)
+    status_code: int = 200
+
+
+class GoalsQueryBudgetTest(APITestCase):
+    """
+    Checks that every endpoint stays within its query budget and that the number of queries does not grow
+    with the amount of data (no N+1). Caches are cleared before every request, so budgets are measured cold.
+    """
+
+    budgets = [
+        QueryBudget('goals:board-list', 4, query={'limit': 100}),
+        QueryBudget('goals:board', 4, kwargs=lambda self: {'pk': self.board.pk}),
+        QueryBudget('goals:board-stats', 4, kwargs=lambda self: {'pk': self.board.pk}),
+        QueryBudget('goals:category-list', 4, query={'limit': 100}),
+        # Roles, the object, its board's version for the ETag
+        QueryBudget('goals:category', 3, kwargs=lambda self: {'pk': self.category.pk}),
+        QueryBudget('goals:goal-list', 4, query={'limit': 100}),
+        QueryBudget('goals:goal-list', 3, query={'limit': 100, 'pagination': 'cursor'}),
+        QueryBudget('goals:goal-list', 4, query={'limit': 100, 'q': 'goal'}),
+        QueryBudget('goals:goal-list', 3, query={'limit': 100, 'pagination': 'nocount'}),
+        QueryBudget('goals:goal-list', 5, query={'limit': 100, 'pagination': 'estimate'}),
+        QueryBudget('goals:goal-comment-list', 3, query={'limit': 100, 'pagination': 'nocount'}),
+        # Roles, the object, its board's version for the ETag
+        QueryBudget('goals:goal', 3, kwargs=lambda self: {'pk': self.goal.pk}),
+        QueryBudget('goals:goal-comment-list', 4, query={'limit': 100}),
+        # Roles, the object, its board's version for the ETag
+        QueryBudget('goals:goal-comment', 3, kwargs=lambda self: {'pk': self.comment.pk}),
+        QueryBudget(
+            'goals:goal-create',
+            5,
+            method='post',
+            data=lambda self: {'title': 'New goal', 'category': self.category.pk},
+            status_code=201,
+        ),
+        QueryBudget(
+            'goals:goal-batch',
+            7,
+            method='post',
+            data=lambda self: {
+                'operations': [
+                    {'op': 'create', 'title': 'Batch goal', 'category': self.category.pk},
+                    {'op': 'status', 'id': self.goal.pk, 'status': Goal.Status.in_progress},
+                ]
+            },
+        ),
+        QueryBudget(
+            'goals:goal-comment-create',
+            5,
+            method='post',
+            data=lambda self: {'text': 'New comment', 'goal': self.goal.pk},
+            status_code=201,
+        ),
+    ]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        cls.goal = Goal.objects.create(category=cls.category, title='Goal', user=cls.user)
+        cls.comment = GoalComment.objects.create(goal=cls.goal, text='Comment', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def grow(self) -> None:
+        for i in range(10):
+            user = User.objects.create_user(username=f'user_{i}', password='password')
+            BoardParticipant.objects.create(board=self.board, user=user, role=BoardParticipant.Role.writer)
+            board = Board.objects.create(title=f'Board {i}')
+            BoardParticipant.objects.create(board=board, user=self.user)
+            category = GoalCategory.objects.create(board=self.board, title=f'Category {i}', user=user)
+            goal = Goal.objects.create(category=category, title=f'Goal {i}', user=user)
+            GoalComment.objects.create(goal=goal, text=f'Comment {i}', user=user)
+
+    def count_queries(self, budget: QueryBudget) -> tuple[int, list[str]]:
+        kwargs = budget.kwargs(self) if budget.kwargs else None
+        data = budget.data(self) if budget.data else None
+        if budget.method == 'get':
+            data = {**budget.query, **(data or {})}
+
+        for cache in caches.all():
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, budget.method)(reverse(budget.url_name, kwargs=kwargs), data, format='json')
+
+        self.assertEqual(response.status_code, budget.status_code, msg=f'{budget.url_name}: {response.content!r}')
+        return len(context), [query['sql'] for query in context.captured_queries]
+
+    def test_query_budgets(self) -> None:
+        small = []
+        for budget in self.budgets:
+            with self.subTest(endpoint=budget.url_name, method=budget.method):
+                count, queries = self.count_queries(budget)
+                small.append(count)
+                self.assertLessEqual(
+                    count, budget.budget, msg=f'{budget.url_name} is over budget:\n' + '\n'.join(queries)
+                )
+
+        self.grow()
+
+        for budget, expected in zip(self.budgets, small):
+            if budget.method != 'get':
+                continue
+            with self.subTest(endpoint=budget.url_name, grown=True):
+                count, queries = self.count_queries(budget)
+                self.assertEqual(count, expected, msg=f'{budget.url_name} grows with data:\n' + '\n'.join(queries))
+
+
+class GoalsKeysetPaginationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=board, title='Category', user=cls.user)
+        # Three goals share every title, the id has to break the ties
+        cls.goals = [
+            Goal.objects.create(category=cls.category, title=f'Goal {i // 3}', user=cls.user) for i in range(10)
+        ]
+        cls.goal = cls.goals[0]
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url: str, query: dict | None = None) -> dict:
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        return response.json()
+
+    def walk(self, url: str, query: dict, link: str) -> list[list[int]]:
+        pages = []
+        page = self.get_page(url, query)
+        while True:
+            pages.append([item['id'] for item in page['results']])
+            if page[link] is None:
+                return pages
+            page = self.get_page(page[link])
+
+    def test_next_and_previous_pages(self) -> None:
+        expected = [goal.id for goal in sorted(self.goals, key=lambda goal: (goal.title, goal.id))]
+        url = reverse('goals:goal-list')
+
+        pages = self.walk(url, {'pagination': 'cursor', 'limit': 4}, 'next')
+        self.assertEqual(pages, [expected[:4], expected[4:8], expected[8:]])
+
+        last = self.get_page(url, {'pagination': 'cursor', 'limit': 4})
+        while last['next'] is not None:
+            last = self.get_page(last['next'])
+        previous = [[item['id'] for item in last['results']]]
+        while last['previous'] is not None:
+            last = self.get_page(last['previous'])
+            previous.append([item['id'] for item in last['results']])
+        self.assertEqual(previous, pages[::-1])
+
+    def test_descending_ties(self) -> None:
+        comments = [GoalComment.objects.create(goal=self.goal, text=f'Comment {i}', user=self.user) for i in range(5)]
+        GoalComment.objects.update(created=comments[0].created)
+
+        pages = self.walk(reverse('goals:goal-comment-list'), {'pagination': 'cursor', 'limit': 2}, 'next')
+        self.assertEqual(pages, [[comments[4].id, comments[3].id], [comments[2].id, comments[1].id], [comments[0].id]])
+
+    def test_insert_does_not_shift_pages(self) -> None:
+        url = reverse('goals:goal-list')
+        first = self.get_page(url, {'pagination': 'cursor', 'limit': 4})
+        Goal.objects.create(category=self.category, title='A goal sorted first', user=self.user)
+
+        second = self.get_page(first['next'])
+        self.assertEqual(second['results'][0]['id'], self.goals[4].id)
+
+    def test_invalid_cursor(self) -> None:
+        url = reverse('goals:goal-list')
+        for cursor in ('not a cursor', base64.urlsafe_b64encode(b'{"p": 1}').decode(), 'e30='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'pagination': 'cursor', 'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class GoalsCountlessPaginationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=board, title='Category', user=cls.user)
+        cls.goals = [Goal.objects.create(category=cls.category, title=f'Goal {i}', user=cls.user) for i in range(5)]
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+        caches['default'].clear()
+
+    def get_page(self, url: str, query: dict | None = None) -> dict:
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_nocount(self) -> None:
+        url = reverse('goals:goal-list')
+        page = self.get_page(url, {'pagination': 'nocount', 'limit': 2})
+        self.assertNotIn('count', page)
+        self.assertEqual((page['has_next'], page['previous']), (True, None))
+        self.assertEqual([goal['id'] for goal in page['results']], [goal.id for goal in self.goals[:2]])
+
+        pages = [page]
+        while page['next']:
+            page = self.get_page(page['next'])
+            pages.append(page)
+        self.assertEqual(
+            [[goal['id'] for goal in page['results']] for page in pages[1:]],
+            [[goal.id for goal in self.goals[2:4]], [self.goals[4].id]],
+        )
+        self.assertEqual([page['has_next'] for page in pages], [True, True, False])
+        self.assertIsNotNone(pages[-1]['previous'])
+
+        # A page that ends exactly at the last row has no next page
+        page = self.get_page(url, {'pagination': 'nocount', 'limit': 5})
+        self.assertEqual((page['has_next'], page['next'], len(page['results'])), (False, None, 5))
+
+    def test_estimate(self) -> None:
+        url = reverse('goals:goal-list')
+        page = self.get_page(url, {'pagination': 'estimate', 'limit': 2})
+        # Below the threshold the count is exact
+        self.assertEqual((page['count'], page['count_estimated'], page['has_next']), (5, False, True))
+
+        caches['default'].clear()
+        with mock.patch.object(GoalPagination, 'estimate_threshold', 0):
+            page = self.get_page(url, {'pagination': 'estimate', 'limit': 2})
+        self.assertTrue(page['count_estimated'])
+        self.assertIsInstance(page['count'], int)
+        self.assertGreater(page['count'], 0)
+
+    def test_estimate_cached(self) -> None:
+        url = reverse('goals:goal-list')
+        self.assertEqual(self.get_page(url, {'pagination': 'estimate', 'limit': 2})['count'], 5)
+        Goal.objects.create(category=self.category, title='New', user=self.user)
+
+        page = self.get_page(url, {'pagination': 'estimate', 'limit': 2, 'offset': 2})
+        self.assertEqual(page['count'], 5)
+        caches['default'].clear()
+        self.assertEqual(self.get_page(url, {'pagination': 'estimate', 'limit': 2})['count'], 6)
+
+
+class GoalsFullTextSearchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=cls.user)
+        category = GoalCategory.objects.create(board=board, title='Category', user=cls.user)
+        cls.in_title = Goal.objects.create(category=category, title='Купить хлеб', user=cls.user)
+        cls.in_description = Goal.objects.create(
+            category=category, title='Сходить в магазин', description='Купить молоко и свежий хлеб', user=cls.user
+        )
+        Goal.objects.create(category=category, title='Починить кран', user=cls.user)
+        Goal.objects.create(category=category, title='Хлеб', user=cls.user, status=Goal.Status.archived)
+
+        other_board = Board.objects.create(title='Other')
+        other_category = GoalCategory.objects.create(board=other_board, title='Category', user=cls.user)
+        Goal.objects.create(category=other_category, title='Хлеб на чужой доске', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def search(self, **query: str) -> list[dict]:
+        response = self.client.get(reverse('goals:goal-list'), query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_matches(self) -> None:
+        cases = [
+            ({'q': 'хлеба'}, [self.in_title.id, self.in_description.id]),
+            ({'q': '"свежий хлеб"'}, [self.in_description.id]),
+            ({'q': 'хлеб -молоко'}, [self.in_title.id]),
+            ({'q': 'молоко OR кран'}, [self.in_description.id, Goal.objects.get(title='Починить кран').id]),
+            ({'q': 'самолёт'}, []),
+        ]
+        for query, expected in cases:
+            with self.subTest(**query):
+                self.assertCountEqual([goal['id'] for goal in self.search(**query)], expected)
+
+    def test_ranking(self) -> None:
+        # Title words weigh more than description words
+        results = self.search(q='хлеб')
+        self.assertEqual([goal['id'] for goal in results], [self.in_title.id, self.in_description.id])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+        # An explicit ordering replaces the ranking
+        results = self.search(q='хлеб', ordering='-title')
+        self.assertEqual([goal['id'] for goal in results], [self.in_description.id, self.in_title.id])
+
+    def test_headline(self) -> None:
+        title_match, description_match = self.search(q='хлеб')
+        self.assertEqual(title_match['headline'], 'Купить <b>хлеб</b>')
+        self.assertEqual(description_match['headline'], 'Сходить в магазин')
+        self.assertIn('<b>хлеб</b>', description_match['snippet'])
+
+        self.assertNotIn('headline', self.search()[0])
+
+    def test_search_vector_not_loaded(self) -> None:
+        urls = [
+            reverse('goals:goal-list') + '?q=хлеб',
+            reverse('goals:goal-list') + '?pagination=nocount&limit=1',
+            reverse('goals:goal', kwargs={'pk': self.in_title.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+                # The ranking reads it in the database, the column itself is not selected
+                selects = [
+                    query['sql'].split(' FROM ')[0].replace('ts_rank("goals_goal"."search_vector"', '')
+                    for query in queries
+                ]
+                self.assertFalse([select for select in selects if 'search_vector' in select])
+
+    def test_headline_escaped(self) -> None:
+        goal = Goal.objects.create(
+            category=self.in_title.category, title='<img src=x onerror="alert(1)"> хлеб & масло', user=self.user
+        )
+        match = next(result for result in self.search(q='масло') if result['id'] == goal.id)
+        self.assertEqual(match['headline'], '&lt;img src=x onerror=&quot;alert(1)&quot;&gt; хлеб &amp; <b>масло</b>')
+        self.assertEqual(match['title'], goal.title)
+
+
+class GoalsBatchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.other = User.objects.create_user(username='other', password='password')
+        cls.categories = {}
+        for role in BoardParticipant.Role:
+            board = Board.objects.create(title=role.label)
+            BoardParticipant.objects.create(board=board, user=cls.user, role=role)
+            cls.categories[role] = GoalCategory.objects.create(board=board, title=role.label, user=cls.user)
+        cls.categories['second'] = GoalCategory.objects.create(
+            board=Board.objects.create(title='Second'), title='Second', user=cls.user
+        )
+        BoardParticipant.objects.create(board=cls.categories['second'].board, user=cls.user)
+        cls.categories['foreign'] = GoalCategory.objects.create(
+            board=Board.objects.create(title='Foreign'), title='Foreign', user=cls.other
+        )
+        cls.goals = {
+            key: Goal.objects.create(category=category, title=f'Goal {key}', user=cls.user)
+            for key, category in cls.categories.items()
+        }
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *operations: dict, status_code: int = status.HTTP_200_OK) -> Any:
+        response = self.client.post(reverse('goals:goal-batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status_code, msg=response.content)
+        return response.json()
+
+    def test_operations(self) -> None:
+        owner = BoardParticipant.Role.owner
+        goal, moved, archived = (
+            self.goals[owner],
+            self.goals['second'],
+            Goal.objects.create(category=self.categories[owner], title='To archive', user=self.user),
+        )
+        data = self.batch(
+            {'op': 'create', 'title': 'Created', 'category': self.categories[owner].id, 'priority': 4},
+            {'op': 'update', 'id': goal.id, 'title': 'Updated', 'description': 'Text'},
+            {'op': 'status', 'id': goal.id, 'status': Goal.Status.done},
+            {'op': 'move', 'id': moved.id, 'category': self.categories[owner].id},
+            {'op': 'archive', 'id': archived.id},
+        )
+
+        self.assertEqual(
+            [result['op'] for result in data['results']], ['create', 'update', 'status', 'move', 'archive']
+        )
+        created = Goal.objects.get(id=data['results'][0]['goal']['id'])
+        self.assertEqual((created.title, created.priority, created.board_id), ('Created', 4, goal.board_id))
+        goal.refresh_from_db()
+        self.assertEqual((goal.title, goal.description, goal.status), ('Updated', 'Text', Goal.Status.done))
+        moved.refresh_from_db()
+        self.assertEqual((moved.category_id, moved.board_id), (self.categories[owner].id, goal.board_id))
+        self.assertEqual(data['results'][3]['goal']['category'], self.categories[owner].id)
+        archived.refresh_from_db()
+        self.assertEqual(archived.status, Goal.Status.archived)
+
+    def test_partial_failure(self) -> None:
+        owner = BoardParticipant.Role.owner
+        goal = self.goals[owner]
+        valid = {'op': 'status', 'id': goal.id, 'status': Goal.Status.done}
+        # Malformed operations are reported first, at the position of the operation
+        data = self.batch(
+            valid,
+            {'op': 'status', 'id': goal.id},
+            {'op': 'create', 'id': goal.id, 'title': 'With id', 'category': self.categories[owner].id},
+            {'op': 'create', 'title': 'Past', 'category': self.categories[owner].id, 'due_date': '2000-01-01'},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            data['operations'],
+            [
+                {},
+                {'status': ['This field is required.']},
+                {'id': ['Not allowed for create']},
+                {'due_date': ['Date in past']},
+            ],
+        )
+
+        data = self.batch(
+            valid,
+            {'op': 'update', 'id': 0, 'title': 'Missing'},
+            {'op': 'create', 'title': 'Created', 'category': self.categories[owner].id},
+            {'op': 'move', 'id': goal.id, 'category': 0},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(data['operations'], [{}, {'id': ['Goal not found']}, {}, {'category': ['Category not found']}])
+
+        # Nothing is applied when any operation fails
+        goal.refresh_from_db()
+        self.assertEqual(goal.status, Goal.Status.to_do)
+        self.assertFalse(Goal.objects.filter(title__in=['Past', 'Created']).exists())
+
+    def test_permission_denied_per_item(self) -> None:
+        Role = BoardParticipant.Role
+        denied = PermissionDenied.default_detail
+        data = self.batch(
+            {'op': 'status', 'id': self.goals[Role.reader].id, 'status': Goal.Status.done},
+            {'op': 'archive', 'id': self.goals[Role.writer].id},
+            {'op': 'create', 'title': 'Reader', 'category': self.categories[Role.reader].id},
+            {'op': 'create', 'title': 'Writer', 'category': self.categories[Role.writer].id},
+            {'op': 'move', 'id': self.goals[Role.owner].id, 'category': self.categories[Role.reader].id},
+            {'op': 'update', 'id': self.goals['foreign'].id, 'title': 'Foreign'},
+            {'op': 'create', 'title': 'Foreign', 'category': self.categories['foreign'].id},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+        self.assertEqual(
+            data['operations'],
+            [
+                {'id': [denied]},
+                {'id': [denied]},
+                {'category': [denied]},
+                {},
+                {'category': [denied]},
+                {'id': ['Goal not found']},
+                {'category': ['Category not found']},
+            ],
+        )
+        self.assertFalse(Goal.objects.filter(title__in=['Reader', 'Writer', 'Foreign']).exists())
+
+    def test_limits(self) -> None:
+        data = self.batch(status_code=status.HTTP_400_BAD_REQUEST)
+        self.assertIn('operations', data)
+        operation = {'op': 'archive', 'id': self.goals[BoardParticipant.Role.owner].id}
+        data = self.batch(*[operation] * 1001, status_code=status.HTTP_400_BAD_REQUEST)
+        self.assertIn('operations', data)
+
+
+class GoalsArchiveTaskTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        other_category = GoalCategory.objects.create(board=cls.board, title='Other', user=cls.user)
+        cls.goals = [Goal.objects.create(category=cls.category, title=f'Goal {i}', user=cls.user) for i in range(5)]
+        Goal.objects.create(category=cls.category, title='Archived', user=cls.user, status=Goal.Status.archived)
+        cls.kept = Goal.objects.create(category=other_category, title='Kept', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def delete_category(self) -> str:
+        response = self.client.delete(reverse('goals:category', kwargs={'pk': self.category.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        return response['Location']
+
+    def get_task(self, location: str) -> dict:
+        response = self.client.get(location)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_chunks(self) -> None:
+        location = self.delete_category()
+        task = self.get_task(location)
+        self.assertEqual(location, reverse('goals:archive-task', kwargs={'pk': task['id']}))
+        self.assertEqual(
+            (task['category'], task['status'], task['total'], task['processed']),
+            (self.category.id, ArchiveTask.Status.pending, None, 0),
+        )
+
+        progress = []
+        while (task := process_archive_chunk(2)) is not None:
+            progress.append((task.status, task.processed))
+        self.assertEqual(
+            progress,
+            [
+                (ArchiveTask.Status.running, 2),
+                (ArchiveTask.Status.running, 4),
+                (ArchiveTask.Status.running, 5),
+                (ArchiveTask.Status.done, 5),
+            ],
+        )
+        task = self.get_task(location)
+        self.assertEqual((task['status'], task['total'], task['processed']), (ArchiveTask.Status.done, 5, 5))
+        self.assertFalse(Goal.objects.filter(category=self.category).exclude(status=Goal.Status.archived).exists())
+        self.kept.refresh_from_db()
+        self.assertEqual(self.kept.status, Goal.Status.to_do)
+
+    def test_resume_after_interruption(self) -> None:
+        task_id = self.get_task(self.delete_category())['id']
+        process_archive_chunk(2)
+
+        # The worker dies after archiving the second chunk but before it records the progress
+        with mock.patch.object(ArchiveTask, 'save', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            process_archive_chunk(2)
+        task = ArchiveTask.objects.get(id=task_id)
+        self.assertEqual((task.processed, task.last_goal_id), (2, self.goals[1].id))
+        self.assertEqual(Goal.objects.filter(category=self.category, status=Goal.Status.archived).count(), 3)
+
+        call_command('archive_goals', chunk_size=2, once=True, stdout=io.StringIO())
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.total, task.processed), (ArchiveTask.Status.done, 5, 5))
+
+    def test_board_delete(self) -> None:
+        response = self.client.delete(reverse('goals:board', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        call_command('archive_goals', once=True, stdout=io.StringIO())
+        self.assertEqual(self.get_task(response['Location'])['processed'], 6)
+        self.assertFalse(Goal.objects.filter(board=self.board).exclude(status=Goal.Status.archived).exists())
+
+    def test_other_users_task(self) -> None:
+        location = self.delete_category()
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+        self.assertEqual(self.client.get(location).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GoalsDenormalizedBoardTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board, cls.target = Board.objects.create(title='Board'), Board.objects.create(title='Target')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        BoardParticipant.objects.create(board=cls.target, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        cls.target_category = GoalCategory.objects.create(board=cls.target, title='Target', user=cls.user)
+        cls.goal = Goal.objects.create(category=cls.category, title='Goal', user=cls.user)
+        cls.comment = GoalComment.objects.create(goal=cls.goal, text='Comment', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def assertBoards(self, board: Board) -> None:
+        self.assertEqual(Goal.objects.get(id=self.goal.id).board_id, board.id)
+        self.assertEqual(GoalComment.objects.get(id=self.comment.id).board_id, board.id)
+        self.assertFalse(Goal.objects.exclude(board_id=models.F('category__board_id')).exists())
+        self.assertFalse(GoalComment.objects.exclude(board_id=models.F('goal__board_id')).exists())
+
+    def test_goal_moved_through_api(self) -> None:
+        response = self.client.patch(
+            reverse('goals:goal', kwargs={'pk': self.goal.pk}), {'category': self.target_category.pk}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertBoards(self.target)
+
+        response = self.client.get(reverse('goals:goal-comment-list'), {'goal': self.goal.pk})
+        self.assertEqual([comment['id'] for comment in response.json()], [self.comment.id])
+
+    def test_goal_moved_by_queryset_update(self) -> None:
+        # No save(), the triggers have to follow
+        Goal.objects.filter(id=self.goal.id).update(category=self.target_category)
+        self.assertBoards(self.target)
+
+    def test_category_moved(self) -> None:
+        self.category.board = self.target
+        self.category.save()
+        self.assertBoards(self.target)
+
+        GoalCategory.objects.filter(id=self.category.id).update(board=self.board)
+        self.assertBoards(self.board)
+
+    def test_board_id_cannot_diverge(self) -> None:
+        Goal.objects.filter(id=self.goal.id).update(board=self.target)
+        GoalComment.objects.filter(id=self.comment.id).update(board=self.target)
+        self.assertBoards(self.board)
+
+
+class GoalsCountersTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board, cls.target = Board.objects.create(title='Board'), Board.objects.create(title='Target')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        BoardParticipant.objects.create(board=cls.target, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        cls.target_category = GoalCategory.objects.create(board=cls.target, title='Target', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def create_goal(self, **fields: Any) -> Goal:
+        return Goal.objects.create(category=self.category, title='Goal', user=self.user, **fields)
+
+    def get_stats(self, board: Board) -> dict:
+        response = self.client.get(reverse('goals:board-stats', kwargs={'pk': board.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def assertCountersMatch(self) -> None:
+        # The counters equal a recount from the goals table
+        counted = {
+            (row['board_id'], row['category_id'], row['status'], row['priority']): row['count']
+            for row in Goal.objects.values('board_id', 'category_id', 'status', 'priority').annotate(
+                count=models.Count('id')
+            )
+        }
+        counters = {
+            (counter.board_id, counter.category_id, counter.status, counter.priority): counter.count
+            for counter in GoalCounter.objects.exclude(count=0)
+        }
+        self.assertEqual(counters, counted)
+        due_counted = {
+            (row['board_id'], row['category_id'], row['due_date']): row['count']
+            for row in Goal.objects.filter(
+                due_date__isnull=False, status__in=[Goal.Status.to_do, Goal.Status.in_progress]
+            )
+            .values('board_id', 'category_id', 'due_date')
+            .annotate(count=models.Count('id'))
+        }
+        due_counters = {
+            (counter.board_id, counter.category_id, counter.due_date): counter.count
+            for counter in GoalDueCounter.objects.exclude(count=0)
+        }
+        self.assertEqual(due_counters, due_counted)
+
+    def test_create(self) -> None:
+        self.create_goal(priority=Goal.Priority.high)
+        self.create_goal(priority=Goal.Priority.high, due_date=date(2000, 1, 1))
+        self.create_goal(status=Goal.Status.done, due_date=date(2000, 1, 1))
+
+        stats = self.get_stats(self.board)
+        self.assertEqual((stats['total'], stats['overdue']), (3, 1))
+        self.assertEqual(stats['by_priority'][str(Goal.Priority.high)], 2)
+        self.assertEqual(stats['by_status'][str(Goal.Status.done)], 1)
+        self.assertCountersMatch()
+
+    def test_status_change(self) -> None:
+        goal = self.create_goal(due_date=date(2000, 1, 1))
+        goal.status = Goal.Status.in_progress
+        goal.save()
+        self.assertEqual(self.get_stats(self.board)['overdue'], 1)
+
+        Goal.objects.filter(id=goal.id).update(status=Goal.Status.done, priority=Goal.Priority.critical)
+        stats = self.get_stats(self.board)
+        self.assertEqual(stats['overdue'], 0)
+        self.assertEqual(stats['by_status'][str(Goal.Status.done)], 1)
+        self.assertEqual(stats['by_status'][str(Goal.Status.in_progress)], 0)
+        self.assertEqual(stats['by_priority'][str(Goal.Priority.critical)], 1)
+        self.assertCountersMatch()
+
+    def test_move_between_boards(self) -> None:
+        goal = self.create_goal(due_date=date(2000, 1, 1))
+        self.create_goal()
+        goal.category = self.target_category
+        goal.save()
+        self.assertEqual((self.get_stats(self.board)['total'], self.get_stats(self.target)['total']), (1, 1))
+        self.assertEqual(self.get_stats(self.target)['overdue'], 1)
+        self.assertCountersMatch()
+
+        # Moving the category carries its goals along
+        self.category.board = self.target
+        self.category.save()
+        self.assertEqual((self.get_stats(self.board)['total'], self.get_stats(self.target)['total']), (0, 2))
+        self.assertCountersMatch()
+
+    def test_archive(self) -> None:
+        goal = self.create_goal(due_date=date(2000, 1, 1))
+        self.create_goal()
+        response = self.client.delete(reverse('goals:goal', kwargs={'pk': goal.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        stats = self.get_stats(self.board)
+        self.assertEqual((stats['total'], stats['overdue']), (1, 0))
+        self.assertEqual(stats['by_status'][str(Goal.Status.archived)], 1)
+        self.assertCountersMatch()
+
+    def test_delete(self) -> None:
+        goals = [self.create_goal(due_date=date(2000, 1, 1)) for _ in range(3)]
+        goals[0].delete()
+        Goal.objects.filter(id=goals[1].id).delete()
+
+        stats = self.get_stats(self.board)
+        self.assertEqual((stats['total'], stats['overdue']), (1, 1))
+        self.assertCountersMatch()
+
+
+class GoalsBoardParticipantsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def add_participants(self, count: int) -> list[User]:
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(username=f'participant_{self.board.participants.count()}_{i}')
+            BoardParticipant.objects.create(board=self.board, user=user, role=BoardParticipant.Role.writer)
+            users.append(user)
+        return users
+
+    def put(self, participants: list[dict]) -> list[str]:
+        url = reverse('goals:board', kwargs={'pk': self.board.pk})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(url, {'title': 'Board', 'participants': participants}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_only_changed_rows_are_written(self) -> None:
+        kept, changed, removed = self.add_participants(3)
+        added = User.objects.create_user(username='added')
+        before = {participant.user_id: participant for participant in BoardParticipant.objects.filter(board=self.board)}
+
+        self.put(
+            [
+                {'user': kept.username, 'role': BoardParticipant.Role.writer},
+                {'user': changed.username, 'role': BoardParticipant.Role.reader},
+                {'user': added.username, 'role': BoardParticipant.Role.reader},
+            ]
+        )
+
+        after = {participant.user_id: participant for participant in BoardParticipant.objects.filter(board=self.board)}
+        self.assertEqual(set(after), {self.user.id, kept.id, changed.id, added.id})
+        self.assertEqual(after[kept.id].updated, before[kept.id].updated)
+        self.assertEqual(
+            (after[changed.id].id, after[changed.id].created), (before[changed.id].id, before[changed.id].created)
+        )
+        self.assertEqual(after[changed.id].role, BoardParticipant.Role.reader)
+        self.assertNotIn(removed.id, after)
+
+    def test_query_count_does_not_grow(self) -> None:
+        counts = []
+        for size in (2, 20):
+            users = self.add_participants(size * 2)
+            # Every kind of change: one role update, one new participant, half kept and the rest deleted
+            participants = [{'user': user.username, 'role': BoardParticipant.Role.writer} for user in users[:size]]
+            participants[0]['role'] = BoardParticipant.Role.reader
+            participants.append({'user': User.objects.create_user(username=f'new_{size}').username, 'role': 2})
+            counts.append(len(self.put(participants)))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_roles_invalidated(self) -> None:
+        changed, removed = self.add_participants(2)
+        self.assertEqual(get_user_board_roles(changed.id), {self.board.id: BoardParticipant.Role.writer})
+        self.assertEqual(get_user_board_roles(removed.id), {self.board.id: BoardParticipant.Role.writer})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put([{'user': changed.username, 'role': BoardParticipant.Role.reader}])
+
+        self.assertEqual(get_user_board_roles(changed.id), {self.board.id: BoardParticipant.Role.reader})
+        self.assertEqual(get_user_board_roles(removed.id), {})
+        url = reverse('goals:board', kwargs={'pk': self.board.pk})
+        self.client.force_authenticate(changed)
+        response = self.client.put(url, {'title': 'Renamed', 'participants': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(removed)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_roles_invalidated_in_other_workers(self) -> None:
+        # Another worker only shares the default cache, its process-local copy is checked against the version there
+        user = self.add_participants(1)[0]
+        get_user_board_roles(user.id)
+        local_copy = dict(membership._local_cache)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put([])
+
+        with mock.patch.object(membership, '_local_cache', OrderedDict(local_copy)):
+            self.assertEqual(get_user_board_roles(user.id), {})
+
+    @override_settings(GUNICORN_WORKERS=4)
+    def test_shared_cache_check(self) -> None:
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['goals.E001'])
+            with override_settings(GUNICORN_WORKERS=1):
+                self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_unknown_user(self) -> None:
+        url = reverse('goals:board', kwargs={'pk': self.board.pk})
+        response = self.client.put(
+            url, {'title': 'Board', 'participants': [{'user': 'missing', 'role': 2}]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['participants'][0]['user'][0].code, 'does_not_exist')
+
+
+class GoalsConditionalGetTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        cls.goal = Goal.objects.create(category=cls.category, title='Goal', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified_until_board_changes(self) -> None:
+        url = reverse('goals:goal-list')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        GoalComment.objects.create(goal=self.goal, text='Comment', user=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_changes_with_membership(self) -> None:
+        shared = Board.objects.create(title='Shared')
+        participant = BoardParticipant.objects.create(board=shared, user=self.user, role=BoardParticipant.Role.writer)
+        url = reverse('goals:goal-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participant.role = BoardParticipant.Role.reader
+            participant.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Leaving a board does not make the remaining boards newer, only the ETag can tell
+        with self.captureOnCommitCallbacks(execute=True):
+            participant.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_if_modified_since(self) -> None:
+        url = reverse('goals:goal', kwargs={'pk': self.goal.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.goal.updated = self.goal.updated.replace(year=self.goal.updated.year + 1)
+        Goal.objects.filter(pk=self.goal.pk).update(updated=self.goal.updated)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_changes_with_nested_user(self) -> None:
+        url = reverse('goals:goal', kwargs={'pk': self.goal.pk})
+        etag = self.client.get(url)['ETag']
+
+        # A login does not touch the profile in the response
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        User.objects.filter(pk=self.user.pk).update(first_name='Renamed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['first_name'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class GoalsResponseCacheTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+        for cache in caches.all():
+            cache.clear()
+
+    def test_category_list_cached_until_category_written(self) -> None:
+        url = reverse('goals:category-list')
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+
+        self.client.post(reverse('goals:category-create'), {'title': 'New', 'board': self.board.pk})
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 2)
+
+    def test_write_without_signals(self) -> None:
+        # Another worker, a trigger or a queryset update: the version lives in the database, not in a cache
+        url = reverse('goals:category-list')
+        self.client.get(url)
+        GoalCategory.objects.filter(board=self.board).update(title='Renamed')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]['title'], 'Renamed')
+
+
+class GoalsLeanListTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='владелец', password='password', email='owner@example.com')
+        board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=board, user=cls.user)
+        category = GoalCategory.objects.create(board=board, title='Категория', user=cls.user)
+        goal = Goal.objects.create(
+            category=category,
+            title='Купить хлеб',
+            description='Line\u2028separator',
+            user=cls.user,
+            due_date=date(2030, 1, 1),
+        )
+        Goal.objects.create(category=category, title='Goal "quoted"', user=cls.user, priority=Goal.Priority.high)
+        GoalComment.objects.create(goal=goal, text='Комментарий\u2029', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def get_content(self, url: str, query: dict) -> bytes:
+        for cache in caches.all():
+            cache.clear()
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content
+
+    def test_lean_output_matches_serializers(self) -> None:
+        cases = [
+            ('goals:goal-list', {}),
+            ('goals:goal-list', {'limit': 1, 'offset': 1, 'ordering': '-created'}),
+            ('goals:goal-list', {'pagination': 'cursor', 'limit': 1}),
+            ('goals:goal-list', {'q': 'хлеб'}),
+            ('goals:goal-comment-list', {'limit': 10}),
+            ('goals:category-list', {'limit': 10}),
+        ]
+        for url_name, query in cases:
+            with self.subTest(endpoint=url_name, query=query):
+                url = reverse(url_name)
+                lean = self.get_content(url, query)
+                with mock.patch.object(LeanListMixin, 'list', generics.ListAPIView.list), mock.patch.object(
+                    LeanListMixin, 'renderer_classes', [JSONRenderer]
+                ):
+                    expected = self.get_content(url, query)
+                self.assertEqual(lean, expected)
+
+
+class GoalsSyncTest(APITransactionTestCase):
+    # Change log entries only become visible once their transaction has finished, so no TestCase here
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=self.board, user=self.user)
+        self.category = GoalCategory.objects.create(board=self.board, title='Category', user=self.user)
+        self.goal = Goal.objects.create(category=self.category, title='Goal', user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor: str | None = None) -> dict:
+        response = self.client.get(reverse('goals:sync'), {'cursor': cursor} if cursor else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_changes_since_cursor(self) -> None:
+        data = self.sync()
+        self.assertTrue(data['reset'])
+
+        created = Goal.objects.create(category=self.category, title='New goal', user=self.user)
+        comment = GoalComment.objects.create(goal=created, text='Comment', user=self.user)
+        self.goal.status = Goal.Status.archived
+        self.goal.save()
+
+        data = self.sync(data['cursor'])
+        self.assertFalse(data['reset'])
+        self.assertEqual([goal['id'] for goal in data['goals']['upserted']], [created.id])
+        self.assertEqual(data['goals']['deleted'], [self.goal.id])
+        self.assertEqual([item['id'] for item in data['comments']['upserted']], [comment.id])
+
+        data = self.sync(data['cursor'])
+        self.assertEqual(data['goals'], {'upserted': [], 'deleted': []})
+
+    def test_reset_when_boards_change(self) -> None:
+        cursor = self.sync()['cursor']
+        board = Board.objects.create(title='Shared')
+        BoardParticipant.objects.create(board=board, user=self.user, role=BoardParticipant.Role.reader)
+
+        self.assertTrue(self.sync(cursor)['reset'])
+
+
+class GoalsExportTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+        goal = Goal.objects.create(category=category, title='Goal, "quoted"', user=cls.user)
+        Goal.objects.create(category=category, title='Archived', user=cls.user, status=Goal.Status.archived)
+        GoalComment.objects.create(goal=goal, text='Comment', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def export(self, **query: str) -> bytes:
+        response = self.client.get(reverse('goals:board-export', kwargs={'pk': self.board.pk}), query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson(self) -> None:
+        lines = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([line['type'] for line in lines], ['categories', 'goals', 'comments'])
+        self.assertEqual(lines[1]['title'], 'Goal, "quoted"')
+
+    def test_csv(self) -> None:
+        rows = list(csv.DictReader(io.StringIO(self.export(type='csv', entity='goals').decode())))
+        self.assertEqual([row['title'] for row in rows], ['Goal, "quoted"'])
+        self.assertEqual(rows[0]['user_username'], 'owner')
+
+    def test_not_participant(self) -> None:
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+        response = self.client.get(reverse('goals:board-export', kwargs={'pk': self.board.pk}))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_streams_under_asgi(self) -> None:
+        request = AsyncRequestFactory().get(reverse('goals:board-export', kwargs={'pk': self.board.pk}))
+        force_authenticate(request, self.user)
+        response = views.BoardExportView.as_view()(request, pk=self.board.pk)
+        # An async iterator, Django would read a sync one in full before sending the first chunk
+        self.assertTrue(response.is_async)
+
+        async def read() -> list[bytes]:
+            return [chunk async for chunk in response.streaming_content]
+
+        chunks = async_to_sync(read)()
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks), self.export())
+
+
+class GoalsImportTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+        cls.category = GoalCategory.objects.create(board=cls.board, title='Category', user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content: str, **query: str) -> list[dict]:
+        file = io.BytesIO(content.encode())
+        file.name = 'import'
+        url = reverse('goals:goal-import')
+        if query:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in query.items())
+        response = self.client.post(url, {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_ndjson(self) -> None:
+        lines = [
+            {'type': 'boards', 'id': 'b1', 'title': 'Imported'},
+            {'type': 'categories', 'id': 'c1', 'board': 'b1', 'title': 'Imported category'},
+            {'type': 'goals', 'id': 'g1', 'category': 'c1', 'title': 'Imported goal', 'due_date': '2020-01-01'},
+            {'type': 'goals', 'category': str(self.category.id), 'title': 'Existing category', 'priority': 4},
+            {'type': 'comments', 'goal': 'g1', 'text': 'Imported comment'},
+            {'type': 'goals', 'category': 'missing', 'title': 'Orphan'},
+            {'type': 'goals', 'category': 'c1'},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'
+        report, summary = self.upload(content)
+
+        self.assertEqual(summary['summary']['imported'], {'boards': 1, 'categories': 1, 'goals': 2, 'comments': 1})
+        self.assertEqual([error['line'] for error in report['errors']], [6, 7, 8])
+        board = Board.objects.get(title='Imported')
+        self.assertTrue(
+            BoardParticipant.objects.filter(board=board, user=self.user, role=BoardParticipant.Role.owner).exists()
+        )
+        goal = Goal.objects.get(title='Imported goal')
+        self.assertEqual((goal.board_id, goal.user, str(goal.due_date)), (board.id, self.user, '2020-01-01'))
+        self.assertEqual(GoalComment.objects.get(goal=goal).text, 'Imported comment')
+        self.assertEqual(Goal.objects.get(title='Existing category').board_id, self.board.id)
+
+    def test_csv(self) -> None:
+        content = f'category,title,description\n{self.category.id},"Goal, quoted",\n{self.category.id},Second,Text\n'
+        report, summary = self.upload(content, type='csv', entity='goals')
+        self.assertEqual(summary['summary'], {'imported': {**report['imported'], 'goals': 2}, 'error_count': 0})
+        self.assertIsNone(Goal.objects.get(title='Goal, quoted').description)
+
+    def test_not_writable(self) -> None:
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+        report, _ = self.upload(json.dumps({'type': 'goals', 'category': str(self.category.id), 'title': 'Goal'}))
+        self.assertEqual(report['errors'], [{'line': 1, 'errors': {'category': ['Not found or not writable']}}])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class GoalsReplicaRoutingTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+        self.cookies = {}
+        # The test transaction would keep every read on the primary
+        patcher = mock.patch.object(connections['default'], 'in_atomic_block', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, method: str, write: bool = False) -> str:
+        def get_response(request: HttpRequest) -> HttpResponse:
+            if write:
+                ReplicaRouter().db_for_write(Goal)
+            # None falls back to the default database
+            return HttpResponse(ReplicaRouter().db_for_read(Goal) or 'default')
+
+        request = getattr(self.factory, method)(reverse('goals:goal-list'))
+        request.user = self.user
+        request.COOKIES = dict(self.cookies)
+        response = ReplicaMiddleware(get_response)(request)
+        self.cookies.update({name: morsel.value for name, morsel in response.cookies.items()})
+        return response.content.decode()
+
+    def test_reads_go_to_replica_until_client_writes(self) -> None:
+        self.assertEqual(self.route('get'), 'replica')
+        self.assertEqual(self.route('post'), 'default')
+        self.assertEqual(self.route('get'), 'default')
+
+        # Another client, or the same one after the pin expired
+        self.cookies.clear()
+        self.assertEqual(self.route('get'), 'replica')
+        self.assertEqual(self.route('get', write=True), 'default')
+        self.assertEqual(self.route('get'), 'default')
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 11):
+            self.assertEqual(self.route('get'), 'replica')
+
+    def test_forged_pin(self) -> None:
+        self.cookies[PINNED_COOKIE] = '1'
+        self.assertEqual(self.route('get'), 'replica')
+
+    def test_use_primary(self) -> None:
+        with use_replica('replica'):
+            self.assertEqual(ReplicaRouter().db_for_read(Goal), 'replica')
+            with use_primary():
+                self.assertEqual(ReplicaRouter().db_for_read(Goal), 'default')
+
+
+class GoalsAsyncListTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        for i in range(3):
+            board = Board.objects.create(title=f'Board {i}')
+            BoardParticipant.objects.create(board=board, user=cls.user)
+            category = GoalCategory.objects.create(board=board, title='Category', user=cls.user)
+            Goal.objects.create(category=category, title=f'Goal {i}', user=cls.user, due_date=date(2030, 1, i + 1))
+
+    def get(self, view: Any, url_name: str, query: str = '', **headers: str) -> HttpResponseBase:
+        request = APIRequestFactory().get(f'{reverse(url_name)}?{query}', **headers)
+        force_authenticate(request, self.user)
+        response = async_to_sync(view)(request) if asyncio.iscoroutinefunction(view) else view(request)
+        return response.render() if hasattr(response, 'render') else response
+
+    def test_same_response_as_sync_view(self) -> None:
+        cases = [
+            (async_views.goal_list_view, views.GoalListView.as_view(), 'goals:goal-list'),
+            (async_views.board_list_view, views.BoardListView.as_view(), 'goals:board-list'),
+        ]
+        for async_view, sync_view, url_name in cases:
+            for query in ('', 'limit=2', 'limit=2&offset=1&ordering=-created', 'limit=1&pagination=nocount'):
+                with self.subTest(url_name=url_name, query=query):
+                    caches[RESPONSE_CACHE_ALIAS].clear()
+                    expected = self.get(sync_view, url_name, query)
+                    caches[RESPONSE_CACHE_ALIAS].clear()
+                    response = self.get(async_view, url_name, query)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(response.content, expected.content)
+                    self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_response_cache_shared_with_sync_view(self) -> None:
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        expected = self.get(async_views.board_list_view, 'goals:board-list', 'limit=2')
+        # Only the board versions, the page comes from the entry the async view stored
+        with self.assertNumQueries(1):
+            response = self.get(views.BoardListView.as_view(), 'goals:board-list', 'limit=2')
+        self.assertEqual(response.content, expected.content)
+
+    def test_not_modified(self) -> None:
+        etag = self.get(async_views.goal_list_view, 'goals:goal-list')['ETag']
+        response = self.get(async_views.goal_list_view, 'goals:goal-list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class GoalsMetricsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username='owner', password='password')
+        cls.board = Board.objects.create(title='Board')
+        BoardParticipant.objects.create(board=cls.board, user=cls.user)
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(self.user)
+
+    def get_sample(self, name: str) -> float:
+        content = self.client.get(reverse('metrics')).content.decode()
+        for line in content.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0
+
+    def test_request_is_recorded(self) -> None:
+        name = 'http_request_db_queries_count{view="goals:board-list"}'
+        before = self.get_sample(name)
+        self.client.get(reverse('goals:board-list'))
+        self.assertEqual(self.get_sample(name), before + 1)
+        self.assertGreater(self.get_sample('http_request_db_queries_sum{view="goals:board-list"}'), 0)
+
+    def test_serializer_and_render_time(self) -> None:
+        names = [f'http_request_{kind}_duration_seconds_sum{{view="goals:board"}}' for kind in ('serializer', 'render')]
+        before = [self.get_sample(name) for name in names]
+        self.assertEqual(
+            self.client.get(reverse('goals:board', kwargs={'pk': self.board.pk})).status_code, status.HTTP_200_OK
+        )
+        for name, value in zip(names, before):
+            with self.subTest(name=name):
+                self.assertGreater(self.get_sample(name), value)
+
+    def test_files_of_exited_workers_removed(self) -> None:
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            name = 'http_request_db_queries_count{view="goals:board-list"}'
+            self.client.get(reverse('goals:board-list'))
+            count = self.get_sample(name)
+            for pid in (2**31 - 1, 2**31 - 2):
+                shutil.copy(os.path.join(directory, f'{os.getpid()}.json'), os.path.join(directory, f'{pid}.json'))
+
+            # The process of the first file is gone, the second one is removed as if its worker exited
+            registry.remove(2**31 - 2)
+            self.assertEqual(self.get_sample(name), count)
+            self.assertEqual(os.listdir(directory), [f'{os.getpid()}.json'])
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='token')
+    def test_access(self) -> None:
+        cases = [
+            ({'REMOTE_ADDR': '127.0.0.1'}, status.HTTP_403_FORBIDDEN),
+            ({'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_FORWARDED_FOR': '10.0.0.2'}, status.HTTP_403_FORBIDDEN),
+            ({'REMOTE_ADDR': '127.0.0.1', 'HTTP_AUTHORIZATION': 'Bearer wrong'}, status.HTTP_403_FORBIDDEN),
+            ({'REMOTE_ADDR': '127.0.0.1', 'HTTP_AUTHORIZATION': 'Bearer token'}, status.HTTP_200_OK),
+            ({'REMOTE_ADDR': '10.1.2.3'}, status.HTTP_200_OK),
+        ]
+        for headers, expected in cases:
+            with self.subTest(headers=headers):
+                self.assertEqual(self.client.get(reverse('metrics'), **headers).status_code, expected)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=1)
+    def test_slow_request_log(self) -> None:
+        with self.assertLogs('todolist.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('goals:goal-list'), {'q': 'goal'})
+        self.assertIn('goals:goal-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class GoalsBenchmarkCommandsTest(APITestCase):
+    def test_seed_and_bench(self) -> None:
+        call_command('seed_data', users=20, boards=10, goals=200, comments=500, batch_size=64, stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='bench').count(), 20)
+        self.assertEqual(BoardParticipant.objects.filter(role=BoardParticipant.Role.owner).count(), 10)
+        self.assertEqual(Goal.objects.count(), 200)
+        self.assertEqual(GoalComment.objects.count(), 500)
+        self.assertFalse(GoalComment.objects.exclude(board_id=models.F('goal__board_id')).exists())
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_api',
+                scenarios=['goal-list', 'goal-create', 'update_password', 'login'],
+                requests=3,
+                output=output,
+                stdout=io.StringIO(),
+            )
+            with open(output) as file:
+                results = json.load(file)['results']
+        self.assertEqual(list(results), ['login', 'update_password', 'goal-list', 'goal-create'])
+        for result in results.values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 3)
+        self.assertGreater(results['goal-list']['queries'], 0)
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 
-from goals import views
+from goals import async_views, views
 
 app_name = 'goals'
 
@@ -8,18 +9,34 @@ urlpatterns = [
 
     # Boards
     path('board/create', views.BoardCreateView.as_view(), name='board-create'),
-    path('board/list', views.BoardListView.as_view(), name='board-list'),
+    path(
+        'board/list',
+        async_views.board_list_view if settings.ASYNC_LIST_VIEWS else views.BoardListView.as_view(),
+        name='board-list',
+    ),
     path('board/<int:pk>', views.BoardDetailView.as_view(), name='board'),
+    path('board/<int:pk>/stats', views.BoardStatsView.as_view(), name='board-stats'),
+    path('board/<int:pk>/export', views.BoardExportView.as_view(), name='board-export'),
     # Goal categories
     path('goal_category/create', views.GoalCategoryCreateView.as_view(), name='category-create'),
     path('goal_category/list', views.GoalCategoryListView.as_view(), name='category-list'),
     path('goal_category/<int:pk>', views.GoalCategoryView.as_view(), name='category'),
     # Goals
     path('goal/create', views.GoalCreateView.as_view(), name='goal-create'),
-    path('goal/list', views.GoalListView.as_view(), name='goal-list'),
+    path(
+        'goal/list',
+        async_views.goal_list_view if settings.ASYNC_LIST_VIEWS else views.GoalListView.as_view(),
+        name='goal-list',
+    ),
+    path('goal/batch', views.GoalBatchView.as_view(), name='goal-batch'),
+    path('goal/import', views.GoalImportView.as_view(), name='goal-import'),
     path('goal/<int:pk>', views.GoalView.as_view(), name='goal'),
     # Goals comments
     path('goal_comment/create', views.GoalCommentCreateView.as_view(), name='goal-comment-create'),
     path('goal_comment/list', views.GoalCommentListView.as_view(), name='goal-comment-list'),
     path('goal_comment/<int:pk>', views.GoalCommentView.as_view(), name='goal-comment'),
+    # Changes since a cursor
+    path('sync', views.SyncView.as_view(), name='sync'),
+    # Background archiving of deleted boards and categories
+    path('archive_task/<int:pk>', views.ArchiveTaskView.as_view(), name='archive-task'),
 ]
@@ -1,25 +1,55 @@
+import json
+from typing import Any
+
 from django.db import transaction
 
-from django.db.models import QuerySet
+from django.db.models import Prefetch, QuerySet
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.pagination import LimitOffsetPagination
-
-from goals.filters import GoalDateFilter
-
-from goals.models import GoalCategory, Goal, GoalComment, BoardParticipant, Board
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from goals import importer
+from goals.cache import CachedListMixin
+from goals.conditional import ConditionalListMixin, ConditionalRetrieveMixin, Validators, get_board_validators
+from goals.export import CONTENT_TYPES, CSV, ENTITIES, NDJSON, iter_export
+from goals.filters import GoalDateFilter, GoalFullTextSearchFilter
+
+from goals.lean import (
+    LeanListMixin,
+    goal_category_lean_serializer,
+    goal_comment_lean_serializer,
+    goal_lean_serializer,
+)
+from goals.membership import get_board_ids
+from goals.models import ArchiveTask, GoalCategory, Goal, GoalComment, BoardParticipant, Board
+from goals.pagination import GoalPagination
 from goals.permissions import BoardPermission, GoalCategoryPermission, GoalPermission, GoalCommentPermission
+from goals.renderers import FastJSONRenderer
+from goals.stats import get_board_stats
+from goals.sync import get_changes
+from todolist.db_router import use_primary
+from todolist.metrics import SerializerTimingMixin
+from todolist.streaming import streaming_content
 
 from goals.serializers import (
     GoalCategoryCreateSerializer,
     GoalCategorySerializer,
     GoalCreateSerializer,
     GoalSerializer,
+    GoalBatchSerializer,
     GoalCommentCreateSerializer,
     GoalCommentSerializer,
     BoardSerializer,
     BoardWithParticipantsSerializer,
+    ArchiveTaskSerializer,
 )
 
 
@@ -33,7 +63,7 @@ class BoardCreateView(generics.CreateAPIView):
             BoardParticipant.objects.create(user=self.request.user, board=board)
 
 
-class BoardListView(generics.ListAPIView):
+class BoardListView(ConditionalListMixin, CachedListMixin, SerializerTimingMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = BoardSerializer
     pagination_class = LimitOffsetPagination
@@ -41,21 +71,72 @@ class BoardListView(generics.ListAPIView):
     ordering = ['title']
 
     def get_queryset(self) -> QuerySet[Board]:
-        return Board.objects.filter(participants__user_id=self.request.user.id).exclude(is_deleted=True)
+        return Board.objects.filter(id__in=get_board_ids(self.request)).exclude(is_deleted=True)
 
 
-class BoardDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BoardDetailView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [BoardPermission]
     serializer_class = BoardWithParticipantsSerializer
 
     def get_queryset(self) -> QuerySet[Board]:
-        return Board.objects.prefetch_related('participants__user').exclude(is_deleted=True)
+        return Board.objects.prefetch_related(
+            Prefetch('participants', queryset=BoardParticipant.objects.select_related('user'))
+        ).exclude(is_deleted=True)
+
+    def get_validators(self, instance: Board) -> Validators:
+        # Participants are part of the response, their writes bump the board version too
+        return get_board_validators(self.request, [instance.id])
+
+    def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        response = super().destroy(request, *args, **kwargs)
+        response['Location'] = reverse('goals:archive-task', kwargs={'pk': self.archive_task.pk})
+        return response
 
     def perform_destroy(self, instance: Board) -> None:
         with transaction.atomic():
             Board.objects.filter(id=instance.id).update(is_deleted=True)
             instance.categories.update(is_deleted=True)
-            Goal.objects.filter(category__board=instance).update(status=Goal.Status.archived)
+            self.archive_task = ArchiveTask.objects.create(user=self.request.user, board=instance)
+
+
+class BoardStatsView(generics.RetrieveAPIView):
+    permission_classes = [BoardPermission]
+
+    def get_queryset(self) -> QuerySet[Board]:
+        return Board.objects.exclude(is_deleted=True)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return Response(get_board_stats(self.get_object()))
+
+
+class BoardExportView(generics.RetrieveAPIView):
+    """
+    Streams the board's categories, goals and comments: ``?type=ndjson`` (default) or
+    ``?type=csv``, optionally limited with ``?entity=categories|goals|comments``.
+    CSV holds one entity per export and defaults to goals.
+    """
+
+    permission_classes = [BoardPermission]
+
+    def get_queryset(self) -> QuerySet[Board]:
+        return Board.objects.exclude(is_deleted=True)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> StreamingHttpResponse:
+        export_type = request.query_params.get('type', NDJSON)
+        if export_type not in CONTENT_TYPES:
+            raise ValidationError({'type': f'Must be one of: {", ".join(CONTENT_TYPES)}'})
+        entity = request.query_params.get('entity') or ('goals' if export_type == CSV else None)
+        if entity is not None and entity not in ENTITIES:
+            raise ValidationError({'entity': f'Must be one of: {", ".join(ENTITIES)}'})
+
+        board = self.get_object()
+        rows = iter_export(board, export_type, (entity,) if entity else ENTITIES)
+        response = StreamingHttpResponse(
+            streaming_content(request._request, rows), content_type=CONTENT_TYPES[export_type]
+        )
+        filename = f'board-{board.id}{"-" + entity if entity else ""}.{export_type}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class GoalCategoryCreateView(generics.CreateAPIView):
@@ -64,9 +145,10 @@ class GoalCategoryCreateView(generics.CreateAPIView):
     serializer_class = GoalCategoryCreateSerializer
 
 
-class GoalCategoryListView(generics.ListAPIView):
+class GoalCategoryListView(ConditionalListMixin, CachedListMixin, LeanListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalCategorySerializer
+    lean_serializer = goal_category_lean_serializer
     pagination_class = LimitOffsetPagination
     filter_backends = [
         DjangoFilterBackend,
@@ -80,21 +162,30 @@ class GoalCategoryListView(generics.ListAPIView):
     search_fields = ['title']
 
     def get_queryset(self):
-        return GoalCategory.objects.filter(board__participants__user=self.request.user, is_deleted=False)
+        return GoalCategory.objects.select_related('user').filter(
+            board_id__in=get_board_ids(self.request), is_deleted=False
+        )
 
 
-class GoalCategoryView(generics.RetrieveUpdateDestroyAPIView):
+class GoalCategoryView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [GoalCategoryPermission]
     serializer_class = GoalCategorySerializer
 
     def get_queryset(self):
-        return GoalCategory.objects.filter(board__participants__user=self.request.user, is_deleted=False)
+        return GoalCategory.objects.select_related('user').filter(
+            board_id__in=get_board_ids(self.request), is_deleted=False
+        )
+
+    def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        response = super().destroy(request, *args, **kwargs)
+        response['Location'] = reverse('goals:archive-task', kwargs={'pk': self.archive_task.pk})
+        return response
 
     def perform_destroy(self, instance: GoalCategory) -> None:
         with transaction.atomic():
             instance.is_deleted = True
             instance.save(update_fields=('is_deleted',))
-            instance.goals.update(status=Goal.Status.archived)
+            self.archive_task = ArchiveTask.objects.create(user=self.request.user, category=instance)
 
 
 class GoalCreateView(generics.CreateAPIView):
@@ -103,14 +194,56 @@ class GoalCreateView(generics.CreateAPIView):
     serializer_class = GoalCreateSerializer
 
 
-class GoalListView(generics.ListAPIView):
+class GoalBatchView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = GoalBatchSerializer
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer: GoalBatchSerializer = self.get_serializer(data=request.data)
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            results = serializer.save()
+        return Response({'results': results})
+
+
+class GoalImportView(generics.GenericAPIView):
+    """
+    Bulk import of boards, categories, goals and comments from an uploaded ``file``:
+    NDJSON with a ``type`` per line (``?type=ndjson``, default) or CSV of a single
+    ``entity`` (``?type=csv&entity=goals``). Streams one NDJSON report per chunk and a
+    final summary, see goals.importer.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> StreamingHttpResponse:
+        import_type = request.query_params.get('type', importer.NDJSON)
+        if import_type not in importer.TYPES:
+            raise ValidationError({'type': f'Must be one of: {", ".join(importer.TYPES)}'})
+        entity = request.query_params.get('entity')
+        if import_type == importer.CSV and entity not in importer.ENTITIES:
+            raise ValidationError({'entity': f'Must be one of: {", ".join(importer.ENTITIES)}'})
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'This field is required.'})
+
+        records = importer.read_records(upload, import_type, entity)
+        reports = importer.summarize(importer.Importer(request.user).run(records))
+        lines = (json.dumps(report, ensure_ascii=False) + '\n' for report in reports)
+        return StreamingHttpResponse(streaming_content(request._request, lines), content_type='application/x-ndjson')
+
+
+class GoalListView(ConditionalListMixin, LeanListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalSerializer
-    pagination_class = LimitOffsetPagination
+    lean_serializer = goal_lean_serializer
+    pagination_class = GoalPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
         filters.SearchFilter,
+        GoalFullTextSearchFilter,
     ]
     filterset_class = GoalDateFilter
     ordering_fields = ['title', 'created']
@@ -118,19 +251,25 @@ class GoalListView(generics.ListAPIView):
     search_fields = ['title', 'description']
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            category__is_deleted=False, category__board__participants__user_id=self.request.user.id
-        ).exclude(status=Goal.Status.archived)
+        return (
+            Goal.objects.select_related('user')
+            .defer('search_vector')
+            .filter(board_id__in=get_board_ids(self.request), category__is_deleted=False)
+            .exclude(status=Goal.Status.archived)
+        )
 
 
-class GoalView(generics.RetrieveUpdateDestroyAPIView):
+class GoalView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [GoalPermission]
     serializer_class = GoalSerializer
 
     def get_queryset(self):
-        return Goal.objects.filter(
-            category__is_deleted=False, category__board__participants__user_id=self.request.user.id
-        ).exclude(status=Goal.Status.archived)
+        return (
+            Goal.objects.select_related('user')
+            .defer('search_vector')
+            .filter(board_id__in=get_board_ids(self.request), category__is_deleted=False)
+            .exclude(status=Goal.Status.archived)
+        )
 
     def perform_destroy(self, instance: Goal):
         instance.status = Goal.Status.archived
@@ -143,10 +282,11 @@ class GoalCommentCreateView(generics.CreateAPIView):
     serializer_class = GoalCommentCreateSerializer
 
 
-class GoalCommentListView(generics.ListAPIView):
+class GoalCommentListView(ConditionalListMixin, LeanListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GoalCommentSerializer
-    pagination_class = LimitOffsetPagination
+    lean_serializer = goal_comment_lean_serializer
+    pagination_class = GoalPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -156,16 +296,54 @@ class GoalCommentListView(generics.ListAPIView):
     ordering = ['-created']
 
     def get_queryset(self):
-        return GoalComment.objects.filter(goal__category__board__participants__user_id=self.request.user.id).exclude(
-            goal__status=Goal.Status.archived
+        return (
+            GoalComment.objects.select_related('user')
+            .filter(board_id__in=get_board_ids(self.request), goal__category__is_deleted=False)
+            .exclude(goal__status=Goal.Status.archived)
         )
 
 
-class GoalCommentView(generics.RetrieveUpdateDestroyAPIView):
+class GoalCommentView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [GoalCommentPermission]
     serializer_class = GoalCommentSerializer
 
     def get_queryset(self):
-        return GoalComment.objects.filter(goal__category__board__participants__user_id=self.request.user.id).exclude(
-            goal__status=Goal.Status.archived
+        return (
+            GoalComment.objects.select_related('user')
+            .filter(board_id__in=get_board_ids(self.request), goal__category__is_deleted=False)
+            .exclude(goal__status=Goal.Status.archived)
         )
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Changes of boards, categories, goals and comments visible to the user since ``?cursor=``.
+
+    Without a cursor (or when it can no longer be served) the response has ``reset: true``:
+    the client downloads the lists and continues from the returned cursor. Fetch the cursor
+    before downloading, replaying a few changes twice is harmless. Rows that are no longer
+    visible come back in ``deleted``; children of a deleted board, category or goal are
+    removed with it.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    default_limit = 500
+    max_limit = 1000
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        # The change log is read below the primary's snapshot xmin, a replica may not have those entries yet
+        with use_primary():
+            return Response(get_changes(request, request.query_params.get('cursor'), max(limit, 1)))
+
+
+class ArchiveTaskView(SerializerTimingMixin, generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ArchiveTaskSerializer
+
+    def get_queryset(self) -> QuerySet[ArchiveTask]:
+        return ArchiveTask.objects.filter(user=self.request.user)
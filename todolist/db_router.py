@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model
+from django.http import HttpRequest, HttpResponse
+from rest_framework.permissions import SAFE_METHODS
+
+# Signed cookie carrying read-your-writes stickiness, so any worker can honour it without shared state
+PINNED_COOKIE = 'db_pinned'
+_PINNED_SALT = 'todolist.db_router.pinned'
+
+
+@dataclass
+class RoutingState:
+    replica: str | None = None
+    primary: bool = False
+    wrote: bool = False
+
+
+_state: ContextVar[RoutingState | None] = ContextVar('db_routing_state', default=None)
+
+
+def get_replica() -> str | None:
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+def pin_to_primary(response: HttpResponse) -> None:
+    """Sends the client's reads to the primary for REPLICA_STICKY_SECONDS, so it sees its own writes."""
+    if settings.REPLICA_STICKY_SECONDS:
+        response.set_signed_cookie(
+            PINNED_COOKIE,
+            '1',
+            salt=_PINNED_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+
+
+def is_pinned(request: HttpRequest) -> bool:
+    # The signature's timestamp is checked too, an edited or replayed cookie does not extend the pin
+    value = request.get_signed_cookie(
+        PINNED_COOKIE, default=None, salt=_PINNED_SALT, max_age=settings.REPLICA_STICKY_SECONDS
+    )
+    return value is not None
+
+
+class PrimaryPins:
+    """
+    Read-your-writes stickiness for code outside requests, e.g. the bot: ``pin`` keeps
+    the reads of a key (a user id) on the primary for REPLICA_STICKY_SECONDS. The pins
+    live in the process, reads of another process are not held back.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.until: dict[int, float] = {}
+
+    def pin(self, key: int) -> None:
+        if not settings.DATABASE_REPLICAS or not settings.REPLICA_STICKY_SECONDS:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.until = {other: until for other, until in self.until.items() if until > now}
+            self.until[key] = now + settings.REPLICA_STICKY_SECONDS
+
+    def is_pinned(self, key: int) -> bool:
+        with self.lock:
+            return self.until.get(key, 0) > time.monotonic()
+
+    def get_read_alias(self, key: int) -> str:
+        """Database for reads of ``key``, for QuerySet.using() where the router is not in effect."""
+        replica = None if self.is_pinned(key) else get_replica()
+        return replica or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replica(alias: str | None) -> Iterator[None]:
+    token = _state.set(RoutingState(replica=alias))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """Reads inside the block go to the primary, for results that must not lag behind writes."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous, state.primary = state.primary, True
+    try:
+        yield
+    finally:
+        state.primary = previous
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request by ReplicaMiddleware
+    and everything else to the primary. Once the request writes, or inside a
+    transaction on the primary, its reads stay on the primary.
+    """
+
+    def db_for_read(self, model: type[Model], **hints) -> str | None:
+        state = _state.get()
+        if state is None or state.replica is None:
+            return None
+        if state.primary or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model: type[Model], **hints) -> str:
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints) -> bool:
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str | None = None, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Routes safe-method requests to a read replica unless the client wrote within the
+    last REPLICA_STICKY_SECONDS. Requests that write, and unsafe requests, pin the
+    client to the primary with a signed cookie. Clients that drop cookies (e.g. Basic
+    auth scripts) get no read-your-writes guarantee across requests.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        with use_replica(self.choose_replica(request)):
+            response = self.get_response(request)
+            wrote = _state.get().wrote
+        self.finish(request, response, wrote)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        with use_replica(self.choose_replica(request)):
+            response = await self.get_response(request)
+            wrote = _state.get().wrote
+        self.finish(request, response, wrote)
+        return response
+
+    @staticmethod
+    def choose_replica(request: HttpRequest) -> str | None:
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            return get_replica()
+        return None
+
+    @staticmethod
+    def finish(request: HttpRequest, response: HttpResponse, wrote: bool) -> None:
+        if wrote or request.method not in SAFE_METHODS:
+            pin_to_primary(response)
@@ -0,0 +1,45 @@
+"""
+Gunicorn settings, ``gunicorn -c python:todolist.gunicorn``.
+
+SERVER_MODE=wsgi runs todolist.wsgi on sync workers, SERVER_MODE=asgi runs
+todolist.asgi on uvicorn workers, which serve the async list views.
+"""
+from envparse import env
+
+server_mode = env.str('SERVER_MODE', default='wsgi')
+
+bind = env.str('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = env.int('GUNICORN_WORKERS', default=4)
+timeout = env.int('GUNICORN_TIMEOUT', default=120)
+keepalive = env.int('GUNICORN_KEEPALIVE', default=5)
+# Restart workers now and then so memory fragmentation does not accumulate
+max_requests = env.int('GUNICORN_MAX_REQUESTS', default=10000)
+max_requests_jitter = max_requests // 10
+
+if server_mode == 'asgi':
+    wsgi_app = 'todolist.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'todolist.wsgi:application'
+    worker_class = 'sync'
+
+
+def on_starting(server) -> None:
+    # Deploy checks of the caches, several workers on a process-local cache would serve stale board roles
+    import os
+
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todolist.settings')
+    # The worker count given on the command line wins over the environment
+    os.environ['GUNICORN_WORKERS'] = str(server.cfg.workers)
+    django.setup()
+    call_command('check', deploy=True, tags=['caches'], fail_level='ERROR')
+
+
+def child_exit(server, worker) -> None:
+    # The metrics of a replaced worker leave the /metrics sums, see todolist.metrics
+    from todolist.metrics import registry
+
+    registry.remove(worker.pid)
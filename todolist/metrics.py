@@ -0,0 +1,501 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+MetricsMiddleware records latency, the number and time of database queries,
+serializer time, render time and response size of every request, labelled with the
+view name. Serializer time covers the blocks in serializer_timer(): the DRF list and
+detail handlers (SerializerTimingMixin, ConditionalRetrieveMixin) and the lean
+serializers, without the queries they run. Render time is the response renderers
+(TimedRendererMixin).
+The registry lives in the worker process; with METRICS_DIR set every worker
+writes it to a file there and /metrics serves the sum over all workers, like
+the multiprocess mode of prometheus_client. The file of a worker is removed when it
+exits (see todolist/gunicorn.py) or when its process is gone. The endpoint only answers clients in
+METRICS_ALLOWED_IPS or with METRICS_TOKEN as a bearer token.
+
+With SLOW_REQUEST_THRESHOLD_MS set, requests slower than that are logged with
+their SQL and a stack sample of the worker thread taken while the request was
+still running. When it is 0 no SQL is kept and no sampler thread runs.
+"""
+import bisect
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse, HttpResponseBase, HttpResponseForbidden
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger('todolist.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+MAX_SLOW_QUERIES = 50
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        # label values -> list of numbers, see size
+        self.values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def size(self) -> int:
+        return 1
+
+    def add(self, label_values: tuple[str, ...], index: int, value: float) -> None:
+        with self._lock:
+            values = self.values.get(label_values)
+            if values is None:
+                values = self.values[label_values] = [0] * self.size()
+            values[index] += value
+
+    def samples(self, values: dict[tuple[str, ...], list[float]]) -> Iterator[tuple[str, dict, float]]:
+        raise NotImplementedError
+
+    def expose(self, values: dict[tuple[str, ...], list[float]]) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for name, labels, value in self.samples(values):
+            formatted = ','.join(f'{key}="{escape(str(label))}"' for key, label in labels.items())
+            value = int(value) if float(value).is_integer() else value
+            lines.append(f'{name}{{{formatted}}} {value}' if formatted else f'{name} {value}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values: str, value: float = 1) -> None:
+        self.add(label_values, 0, value)
+
+    def samples(self, values: dict[tuple[str, ...], list[float]]) -> Iterator[tuple[str, dict, float]]:
+        for label_values, (value,) in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        super().__init__(name, documentation, labels)
+
+    def size(self) -> int:
+        # Non-cumulative bucket counts, the +Inf bucket, the sum
+        return len(self.buckets) + 2
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            values = self.values.get(label_values)
+            if values is None:
+                values = self.values[label_values] = [0] * self.size()
+            values[bisect.bisect_left(self.buckets, value)] += 1
+            values[-1] += value
+
+    def samples(self, values: dict[tuple[str, ...], list[float]]) -> Iterator[tuple[str, dict, float]]:
+        for label_values, counts in sorted(values.items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': bound}, cumulative
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.last_flush = 0.0
+
+    def register(self, metric: Metric) -> None:
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> dict[str, dict[tuple[str, ...], list[float]]]:
+        snapshot = {}
+        for name, metric in self.metrics.items():
+            with metric._lock:
+                snapshot[name] = {labels: list(values) for labels, values in metric.values.items()}
+        return snapshot
+
+    def flush(self, force: bool = False) -> None:
+        """Writes the registry to METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds."""
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.last_flush = now
+        data = {
+            name: [[list(labels), values] for labels, values in metric.items()]
+            for name, metric in self.snapshot().items()
+        }
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        path = Path(directory, f'{os.getpid()}.json')
+        # Readers never see a partially written file
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(data))
+        temporary.replace(path)
+
+    def collect(self) -> dict[str, dict[tuple[str, ...], list[float]]]:
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+
+        self.flush(force=True)
+        merged: dict[str, dict[tuple[str, ...], list[float]]] = {name: {} for name in self.metrics}
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            # A worker killed without child_exit leaves its file behind. Prometheus takes the drop
+            # of the sums as a counter reset.
+            if path.stem.isdigit() and not is_alive(int(path.stem)):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name, entries in data.items():
+                if name not in merged:
+                    continue
+                for labels, values in entries:
+                    current = merged[name].setdefault(tuple(labels), [0] * len(values))
+                    for index, value in enumerate(values):
+                        current[index] += value
+        return merged
+
+    @staticmethod
+    def remove(pid: int) -> None:
+        """Removes the file of an exited worker."""
+        if settings.METRICS_DIR:
+            Path(settings.METRICS_DIR, f'{pid}.json').unlink(missing_ok=True)
+            Path(settings.METRICS_DIR, f'{pid}.tmp').unlink(missing_ok=True)
+
+    def expose(self) -> str:
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.extend(metric.expose(values[name]))
+        return '\n'.join(lines) + '\n'
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+registry = Registry()
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency', ('view', 'method', 'status'), LATENCY_BUCKETS
+)
+request_queries = Histogram('http_request_db_queries', 'Database queries per request', ('view',), QUERY_BUCKETS)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request', ('view',), LATENCY_BUCKETS
+)
+request_serializer_duration = Histogram(
+    'http_request_serializer_duration_seconds', 'Time spent in serializers per request', ('view',), LATENCY_BUCKETS
+)
+request_render_duration = Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering the response per request', ('view',), LATENCY_BUCKETS
+)
+response_size = Histogram('http_response_size_bytes', 'Response body size', ('view',), SIZE_BUCKETS)
+slow_requests = Counter('http_slow_requests_total', 'Requests over SLOW_REQUEST_THRESHOLD_MS', ('view',))
+
+
+@dataclass
+class RequestMetrics:
+    started: float
+    thread_id: int
+    queries: int = 0
+    db_time: float = 0.0
+    serializer_time: float = 0.0
+    serializer_depth: int = 0
+    render_time: float = 0.0
+    render_depth: int = 0
+    # (duration, sql) of every query, only kept when the slow-request log is on
+    sql: list[tuple[float, str]] | None = None
+    stack: str | None = None
+
+
+_request: ContextVar[RequestMetrics | None] = ContextVar('request_metrics', default=None)
+
+
+def _execute_wrapper(execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+    state = _request.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        state.queries += 1
+        state.db_time += duration
+        if state.sql is not None:
+            state.sql.append((duration, sql))
+
+
+def _install_execute_wrapper(sender: Any, connection: Any, **kwargs: Any) -> None:
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+@contextmanager
+def serializer_timer() -> Iterator[None]:
+    """
+    Adds the time spent in the block, less its queries, to the request's serializer time.
+    Nested blocks count once.
+    """
+    state = _request.get()
+    if state is None:
+        yield
+        return
+    state.serializer_depth += 1
+    started, db_time = time.perf_counter(), state.db_time
+    try:
+        yield
+    finally:
+        state.serializer_depth -= 1
+        if not state.serializer_depth:
+            state.serializer_time += time.perf_counter() - started - (state.db_time - db_time)
+
+
+@contextmanager
+def render_timer() -> Iterator[None]:
+    """Adds the time spent in the block to the request's render time, nested blocks count once."""
+    state = _request.get()
+    if state is None:
+        yield
+        return
+    state.render_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state.render_depth -= 1
+        if not state.render_depth:
+            state.render_time += time.perf_counter() - started
+
+
+class SerializerTimingMixin:
+    """
+    Counts DRF's list() and retrieve() as serializer time, the serializer's ``.data``
+    is evaluated there. Put it right before the generic view class, so the 304 and
+    cache hit shortcuts of the other mixins are not counted.
+    """
+
+    def list(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+        with serializer_timer():
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+        with serializer_timer():
+            return super().retrieve(request, *args, **kwargs)
+
+
+class TimedRendererMixin:
+    """Counts the time a renderer spends on the response body as render time."""
+
+    def render(self, data: Any, accepted_media_type: str | None = None, renderer_context: dict | None = None) -> Any:
+        with render_timer():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class TimedJSONRenderer(TimedRendererMixin, JSONRenderer):
+    pass
+
+
+class SlowRequestSampler(threading.Thread):
+    """Takes a stack sample of the worker thread of every request still running after the threshold."""
+
+    def __init__(self, threshold: float) -> None:
+        super().__init__(name='slow-request-sampler', daemon=True)
+        self.threshold = threshold
+        self.active: dict[int, RequestMetrics] = {}
+        self.lock = threading.Lock()
+
+    def add(self, state: RequestMetrics) -> None:
+        with self.lock:
+            self.active[id(state)] = state
+
+    def remove(self, state: RequestMetrics) -> None:
+        with self.lock:
+            self.active.pop(id(state), None)
+
+    def run(self) -> None:
+        interval = min(max(self.threshold / 4, 0.01), 1)
+        while True:
+            time.sleep(interval)
+            now = time.perf_counter()
+            with self.lock:
+                overdue = [
+                    state
+                    for state in self.active.values()
+                    if state.stack is None and now - state.started > self.threshold
+                ]
+            if not overdue:
+                continue
+            frames = sys._current_frames()
+            for state in overdue:
+                frame = frames.get(state.thread_id)
+                state.stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+
+
+_sampler: SlowRequestSampler | None = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> SlowRequestSampler | None:
+    global _sampler
+    threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+    if not threshold:
+        return None
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = SlowRequestSampler(threshold)
+                _sampler.start()
+    return _sampler
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics of every request, see the module docstring. Put it first
+    in MIDDLEWARE so the latency covers the other middleware as well. For async
+    views the stack sample shows the event loop thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        if settings.METRICS_ENABLED:
+            connection_created.connect(_install_execute_wrapper)
+            for connection in connections.all(initialized_only=True):
+                _install_execute_wrapper(None, connection)
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        state, sampler = self.start()
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+            if sampler is not None:
+                sampler.remove(state)
+        self.finish(request, response, state)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        state, sampler = self.start()
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+            if sampler is not None:
+                sampler.remove(state)
+        self.finish(request, response, state)
+        return response
+
+    @staticmethod
+    def start() -> tuple[RequestMetrics, SlowRequestSampler | None]:
+        state = RequestMetrics(started=time.perf_counter(), thread_id=threading.get_ident())
+        sampler = get_sampler()
+        if sampler is not None:
+            state.sql = []
+            sampler.add(state)
+        return state, sampler
+
+    @staticmethod
+    def finish(request: HttpRequest, response: HttpResponseBase, state: RequestMetrics) -> None:
+        duration = time.perf_counter() - state.started
+        match = request.resolver_match
+        # Unresolved paths share one label, so 404 scans do not blow up the number of series
+        view = match.view_name if match is not None else 'unresolved'
+
+        request_duration.observe(duration, view, request.method, str(response.status_code))
+        request_queries.observe(state.queries, view)
+        request_db_duration.observe(state.db_time, view)
+        request_serializer_duration.observe(state.serializer_time, view)
+        request_render_duration.observe(state.render_time, view)
+        if not response.streaming:
+            response_size.observe(len(response.content), view)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+        if threshold and duration > threshold:
+            slow_requests.inc(view)
+            log_slow_request(request, view, duration, state)
+        registry.flush()
+
+
+def log_slow_request(request: HttpRequest, view: str, duration: float, state: RequestMetrics) -> None:
+    queries = sorted(state.sql or [], reverse=True)[:MAX_SLOW_QUERIES]
+    logger.warning(
+        'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, serializers %.0f ms, rendering %.0f ms\n'
+        'Slowest queries:\n%s\nStack sample:\n%s',
+        request.method,
+        request.get_full_path(),
+        view,
+        duration * 1000,
+        state.queries,
+        state.db_time * 1000,
+        state.serializer_time * 1000,
+        state.render_time * 1000,
+        '\n'.join(f'  {query_duration * 1000:.1f} ms: {sql}' for query_duration, sql in queries),
+        state.stack or '  (finished before the sampler ran)',
+    )
+
+
+def is_metrics_client(request: HttpRequest) -> bool:
+    # REMOTE_ADDR is the peer of the api process, X-Forwarded-For is not trusted
+    address = ipaddress.ip_address(request.META.get('REMOTE_ADDR') or '0.0.0.0')
+    if any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_IPS):
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    if not is_metrics_client(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
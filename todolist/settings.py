@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third-party apps
     'rest_framework',
     'django_filters',
@@ -54,6 +55,7 @@ if DEBUG:
     ]
 
 MIDDLEWARE = [
+    'todolist.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
+    'todolist.db_router.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'todolist.urls'
@@ -84,6 +87,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'todolist.wsgi.application'
 
+# wsgi or asgi, read by todolist/gunicorn.py as well. The ASGI server serves the async list views.
+SERVER_MODE = env.str('SERVER_MODE', default='wsgi')
+ASYNC_LIST_VIEWS = SERVER_MODE == 'asgi'
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
@@ -95,7 +102,50 @@ DATABASES = {
         'PASSWORD': env('POSTGRES_PASSWORD'),
         'HOST': env('POSTGRES_HOST', default='127.0.0.1'),
         'PORT': env.int('POSTGRES_PORT', default=5432),
+        # Connections are kept per worker thread. Under ASGI every request runs in a new thread and closes its
+        # connection, the api service connects through PgBouncer (docker-compose.yaml) which keeps the server
+        # connections open. Session pooling, the export reads through a server-side cursor.
+        'CONN_MAX_AGE': env.int('POSTGRES_CONN_MAX_AGE', default=0 if ASYNC_LIST_VIEWS else 60),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas as a comma-separated list of host[:port], see todolist.db_router. Pointing a replica at the
+# primary itself works as a local stand-in.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(env.list('POSTGRES_REPLICAS', default=[]), 1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port) if port else DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['todolist.db_router.ReplicaRouter']
+
+# Reads of a client that wrote stay on the primary this long, carried in a signed cookie (todolist.db_router)
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=10)
+
+# API worker processes, see todolist/gunicorn.py. With more than one the default cache has to be shared by all of
+# them, `manage.py check --deploy` (run when gunicorn starts) refuses a process-local one.
+GUNICORN_WORKERS = env.int('GUNICORN_WORKERS', default=4)
+
+CACHES = {
+    # Board roles and their invalidation, see goals.membership. Use Redis in production:
+    # CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://redis:6379/0
+    'default': {
+        'BACKEND': env('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('CACHE_LOCATION', default='todolist'),
+    },
+    # Rendered list responses, see goals.cache. The in-memory default evicts least recently used entries.
+    'responses': {
+        'BACKEND': env('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('RESPONSE_CACHE_LOCATION', default='responses'),
+        'TIMEOUT': env.int('RESPONSE_CACHE_TIMEOUT', default=300),
+        'OPTIONS': {'MAX_ENTRIES': env.int('RESPONSE_CACHE_MAX_ENTRIES', default=1000)},
+    },
 }
 
 AUTH_USER_MODEL = 'core.User'
@@ -142,5 +192,43 @@ SOCIAL_AUTH_USER_MODEL = 'core.User'
 SOCIAL_AUTH_VK_OAUTH2_SCOPE = ['email']
 AUTHENTICATION_BACKENDS = ['social_core.backends.vk.VKOAuth2', 'django.contrib.auth.backends.ModelBackend']
 
-REST_FRAMEWORK = {'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination'}
+# Per-view request metrics served at /metrics, see todolist/metrics.py. With several worker processes set
+# METRICS_DIR to a directory they share, /metrics then serves the sum over all of them.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_DIR = env.str('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', default=5)
+# Requests slower than this are logged with their SQL and a stack sample, 0 turns the log off
+SLOW_REQUEST_THRESHOLD_MS = env.int('SLOW_REQUEST_THRESHOLD_MS', default=0)
+# /metrics answers these addresses or networks, and clients sending `Authorization: Bearer <METRICS_TOKEN>`
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+METRICS_TOKEN = env.str('METRICS_TOKEN', default='')
+
+# Entries older than this are removed by `manage.py prune_change_log`, older sync cursors are reset
+CHANGE_LOG_RETENTION_DAYS = env.int('CHANGE_LOG_RETENTION_DAYS', default=30)
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    # Rendering counts as serializer time in the request metrics
+    'DEFAULT_RENDERER_CLASSES': [
+        'todolist.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
 BOT_TOKEN = env.str('BOT_TOKEN')
+# Telegram Bot API, TG_API_URL may point at a local stand-in server
+TG_API_URL = env.str('TG_API_URL', default='https://api.telegram.org')
+TG_CONNECT_TIMEOUT = env.float('TG_CONNECT_TIMEOUT', default=5)
+TG_READ_TIMEOUT = env.float('TG_READ_TIMEOUT', default=10)
+TG_MAX_RETRIES = env.int('TG_MAX_RETRIES', default=3)
+TG_RETRY_BACKOFF = env.float('TG_RETRY_BACKOFF', default=0.5)
+TG_POOL_SIZE = env.int('TG_POOL_SIZE', default=10)
+# Webhook mode, see `manage.py bot_webhook`: Telegram sends the secret in X-Telegram-Bot-Api-Secret-Token
+TG_WEBHOOK_SECRET = env.str('TG_WEBHOOK_SECRET', default='')
+BOT_UPDATE_MAX_ATTEMPTS = env.int('BOT_UPDATE_MAX_ATTEMPTS', default=5)
+BOT_UPDATE_RETENTION_DAYS = env.int('BOT_UPDATE_RETENTION_DAYS', default=7)
+# Bot dialogue state, see bot.state. The database store is shared by all bot processes, the cache store needs
+# a cache shared by them as well.
+BOT_STATE_STORE = env.str('BOT_STATE_STORE', default='bot.state.DatabaseConversationStore')
+BOT_STATE_CACHE = env.str('BOT_STATE_CACHE', default='default')
+BOT_STATE_TTL = env.int('BOT_STATE_TTL', default=900)
+BOT_STATE_MAX_ENTRIES = env.int('BOT_STATE_MAX_ENTRIES', default=10000)
@@ -0,0 +1,33 @@
+from typing import AsyncIterator, Iterable, Iterator, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest
+
+T = TypeVar('T')
+
+_END = object()
+
+
+def streaming_content(request: HttpRequest, content: Iterable[T]) -> Iterable[T] | AsyncIterator[T]:
+    """
+    Content for a StreamingHttpResponse that streams under both servers.
+
+    Under ASGI Django buffers a synchronous iterator in full before sending anything, so
+    the iterator is advanced one chunk at a time in the request's thread instead. The
+    database connection, and with it any open server-side cursor, stays the same.
+    """
+    if isinstance(request, ASGIRequest):
+        return _iterate_in_thread(iter(content))
+    return content
+
+
+async def _iterate_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(iterator, _END)) is not _END:
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
+from todolist.metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,6 +11,7 @@ urlpatterns = [
     path('goals/', include('goals.urls', namespace='goals')),
     path('oauth/', include('social_django.urls', namespace='social')),
     path('bot/', include('bot.urls', namespace='bot')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG: